@@ -1,59 +1,57 @@
 from __future__ import annotations
 
 from pathlib import Path
-from collections import defaultdict
-import re
 
-from .parse import matches_any_known_pattern
-from .repository import fetch_normalized_lines, fetch_raw_log_sources
+from .db import get_conn
+from .repository import fetch_raw_log_sources
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 AUDIT_DIR = BASE_DIR / "output" / "audit"
 
-RE_NUM = re.compile(r"\d+")
-RE_WS = re.compile(r"\s+")
-
-
-def _signature(line: str) -> str:
-    s = (line or "").strip()
-    s = RE_WS.sub(" ", s)
-    s = RE_NUM.sub("<n>", s)
-    return s[:140]
-
 
 def audit_unparsed(limit_groups: int = 50, sample_per_group: int = 8):
     """
-    Collect lines from normalized_lines that do not match any known parser pattern.
-    Groups them by a simplified signature so new log types can be added incrementally.
+    Group the unparsed lines recorded by the parser (unparsed_lines) by their
+    simplified signature so new log types can be added incrementally.
     """
     AUDIT_DIR.mkdir(parents=True, exist_ok=True)
 
-    rows = fetch_normalized_lines()
     file_map = fetch_raw_log_sources()
 
-    groups = defaultdict(lambda: {"count": 0, "samples": []})
-
-    for r in rows:
-        line = (r["text"] or "").strip()
-        if not line:
-            continue
-        if matches_any_known_pattern(line):
-            continue
-
-        sig = _signature(line)
-        g = groups[sig]
-        g["count"] += 1
-        if len(g["samples"]) < sample_per_group:
-            ts = r["ts"] or ""
-            ts_raw = r["ts_raw"] or ""
-            ctx = ts if ts else (f"(ts: {ts_raw})" if ts_raw else "")
-            header = (
-                f"{ctx} | raw_log_id={r['raw_log_id']} line_no={r['line_no']} | "
-                f"file={file_map.get(r['raw_log_id'], '')}"
-            )
-            g["samples"].append(header + "\n" + line)
+    with get_conn(readonly=True) as conn:
+        top = conn.execute(
+            """
+            SELECT signature, COUNT(*) AS n
+            FROM unparsed_lines
+            GROUP BY signature
+            ORDER BY n DESC, signature ASC
+            LIMIT ?
+            """,
+            (int(limit_groups),),
+        ).fetchall()
 
-    sorted_groups = sorted(groups.items(), key=lambda kv: kv[1]["count"], reverse=True)[:limit_groups]
+        sorted_groups = []
+        for g in top:
+            samples = []
+            for r in conn.execute(
+                """
+                SELECT raw_log_id, line_no, ts, ts_raw, text
+                FROM unparsed_lines
+                WHERE signature=?
+                ORDER BY (ts IS NULL) ASC, ts ASC, raw_log_id ASC, line_no ASC
+                LIMIT ?
+                """,
+                (g["signature"], int(sample_per_group)),
+            ):
+                ts = r["ts"] or ""
+                ts_raw = r["ts_raw"] or ""
+                ctx = ts if ts else (f"(ts: {ts_raw})" if ts_raw else "")
+                header = (
+                    f"{ctx} | raw_log_id={r['raw_log_id']} line_no={r['line_no']} | "
+                    f"file={file_map.get(r['raw_log_id'], '')}"
+                )
+                samples.append(header + "\n" + r["text"])
+            sorted_groups.append((g["signature"], {"count": g["n"], "samples": samples}))
 
     out = AUDIT_DIR / "audit_unparsed.txt"
     with out.open("w", encoding="utf-8") as f:
@@ -1,13 +1,16 @@
 import json
 import sys
+from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
 
 from .db import init_db
 from .ingest import load_logs
-from .normalize import normalize_all
+from .watch import Watcher
+from .normalize import normalize_all, normalize_incremental
+from .pipeline import build as build_pipeline
 from .parse import parse_events
-from .identity import rebuild_identities, show_identity
+from .identity import rebuild_identities, show_alts, show_identity
 from .repository import search_events, count_search_events
 from .trace import trace
 from .flow import build_flow
@@ -18,6 +21,8 @@ from .export import export_tag
 from .hub import build_hub
 from .audit import audit_unparsed
 from .debug import make_debug_bundle
+from .compact import compact_raw_logs
+from .evidence import CODECS
 from .status import show_status
 from .ask import ask_dispatch
 from .storages import compute_storage_summary
@@ -42,27 +47,43 @@ Commands:
 help
   Show this help
 
-load <path>
-  Load .txt logs into database (raw evidence)
+load <path> [stream=1|0] [workers=N]
+  Load .txt logs into database (raw evidence); .zip and .txt.gz archives are read in place
+  Large files are streamed in chunks automatically; stream=1 forces it, stream=0 disables it.
+  workers=N reads/hashes files in N processes (one writer keeps raw_log ids deterministic).
 
-ingest <path>
+ingest <path> [stream=1|0] [workers=N]
   Alias for load
 
-normalize
+watch <dir> [interval=2] [once=1]
+  Keep ingesting new/grown .txt exports in <dir>: only new lines are stored,
+  normalized and parsed each cycle. Ctrl+C stops; once=1 runs a single cycle.
+
+normalize [--full]
   Normalize raw logs into clean lines with timestamps
+  Only new (or stale) raw logs are processed; --full rebuilds everything.
 
-parse
+parse [--full] [workers=N] [--adaptive]
   Parse normalized lines into structured events
+  Only lines not parsed yet are processed (event ids stay stable); --full, or a
+  change to the parser rules, reparses everything.
+  workers=N parses raw logs in N processes (one writer keeps event ids deterministic).
+  --adaptive tries the most frequent rules first (per-rule stats are shown by status).
 
-build
-  Shortcut: normalize + parse
+build [--full] [--no-lines] [workers=N]
+  Shortcut: normalize + parse (only new raw logs unless --full)
+  A full build streams raw logs straight into events in one pass;
+  --no-lines (implies --full) skips storing normalized_lines (used by audit/context only).
 
 identities
-  Rebuild identity observations (ID <-> name <-> IP)
+  Rebuild identity observations (ID <-> name <-> IP); parse keeps them current
 
 identity <id|name>
   Show identity info for one ID or one name
 
+alts <id|name|ip>
+  Show every ID, name and IP linked to it through connect/disconnect sightings
+
 search [filters]
   Examples:
     search id=633
@@ -104,7 +125,10 @@ audit
   Build unparsed-line audit clusters (output/audit/audit_unparsed.txt)
 
 status
-  Show parser/db coverage counts (raw logs, normalized lines, events by type)
+  Show parser/db coverage counts (raw logs, normalized lines, events by type, per-rule parser stats)
+
+compact [codec=lzma|zlib|none] [vacuum=1|0]
+  Recompress stored raw evidence in place (new loads use zlib); vacuum shrinks the db file
 
 web
   Start local web UI/API server (http://127.0.0.1:8000)
@@ -130,6 +154,23 @@ def _parse_kv_args(args: list[str]) -> dict:
     return out
 
 
+def _parse_bool_arg(value: str | None) -> bool | None:
+    if value is None:
+        return None
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _parse_workers_arg(value: str | None) -> int | None:
+    """workers=N as a positive int (default 1), or None if N is not one."""
+    if value is None:
+        return 1
+    try:
+        workers = int(value)
+    except ValueError:
+        return None
+    return workers if workers >= 1 else None
+
+
 def _has_kv(args: list[str]) -> bool:
     return any("=" in a for a in args)
 
@@ -244,15 +285,27 @@ def main(argv=None):
         print(json.dumps(response, ensure_ascii=False))
         return 1
 
+    def workers_error(command: str, usage: str) -> int:
+        message = "workers must be a positive integer"
+        if output_format == "json":
+            return emit_error(command, {}, message, hint=f"Usage: {usage}")
+        console.print(f"[red]Usage:[/red] {usage}  ({message})")
+        return 1
+
     if cmd == "load":
         if not args:
             if output_format == "json":
                 return emit_error("ingest", {}, "Usage: load <path>")
             console.print("[red]Usage:[/red] load <path>")
             return 1
+        kv = _parse_kv_args(args[1:])
+        stream = _parse_bool_arg(kv.get("stream"))
+        workers = _parse_workers_arg(kv.get("workers"))
+        if workers is None:
+            return workers_error("ingest", "load <path> [stream=1|0] [workers=N]")
         if output_format == "json":
-            return emit_response(run_command("ingest", {"path": args[0]}))
-        n = load_logs(args[0])
+            return emit_response(run_command("ingest", {"path": args[0], "stream": stream, "workers": workers}))
+        n = load_logs(args[0], stream=stream, workers=workers)
         console.print(Panel(f"Raw logs loaded: {n}", title="LOAD"))
         return 0
 
@@ -262,33 +315,82 @@ def main(argv=None):
                 return emit_error("ingest", {}, "Usage: ingest <path>")
             console.print("[red]Usage:[/red] ingest <path>")
             return 1
+        kv = _parse_kv_args(args[1:])
+        stream = _parse_bool_arg(kv.get("stream"))
+        workers = _parse_workers_arg(kv.get("workers"))
+        if workers is None:
+            return workers_error("ingest", "ingest <path> [stream=1|0] [workers=N]")
         if output_format == "json":
-            return emit_response(run_command("ingest", {"path": args[0]}))
-        n = load_logs(args[0])
+            return emit_response(run_command("ingest", {"path": args[0], "stream": stream, "workers": workers}))
+        n = load_logs(args[0], stream=stream, workers=workers)
         console.print(Panel(f"Raw logs loaded: {n}", title="LOAD"))
         return 0
 
+    if cmd == "watch":
+        if not args:
+            if output_format == "json":
+                return emit_error("watch", {}, "Usage: watch <dir>")
+            console.print("[red]Usage:[/red] watch <dir> [interval=2] [once=1]")
+            return 1
+        kv = _parse_kv_args(args[1:])
+        if output_format == "json" or _parse_bool_arg(kv.get("once")):
+            payload = run_command("watch", {"path": args[0]})
+            if output_format == "json":
+                return emit_response(payload)
+            if not payload.get("ok"):
+                console.print(f"[red]{payload['error']['message']}[/red] {args[0]}")
+                return 1
+            d = payload["data"]
+            console.print(
+                Panel(
+                    f"Raw logs loaded: {d['raw_logs']}\nNormalized lines: {d['normalized']}\nEvents parsed: {d['parsed']}",
+                    title="WATCH",
+                )
+            )
+            return 0
+        if not Path(args[0]).exists():
+            console.print(f"[red]Path not found:[/red] {args[0]}")
+            return 1
+        watcher = Watcher(args[0], interval=float(kv.get("interval", "2")))
+        console.print(f"[cyan]Watching[/cyan] {args[0]} every {watcher.interval:g}s (Ctrl+C to stop)")
+        try:
+            watcher.run()
+        except KeyboardInterrupt:
+            pass
+        console.print(Panel(f"Cycles: {watcher.cycles}", title="WATCH"))
+        return 0
+
     if cmd == "normalize":
+        full = "--full" in args
         if output_format == "json":
-            return emit_response(run_command("normalize", {}))
-        n = normalize_all()
+            return emit_response(run_command("normalize", {"full": full}))
+        n = normalize_all() if full else normalize_incremental()
         console.print(Panel(f"Normalized lines inserted: {n}", title="NORMALIZE"))
         return 0
 
     if cmd == "parse":
+        full = "--full" in args
+        kv = _parse_kv_args(args)
+        workers = _parse_workers_arg(kv.get("workers"))
+        if workers is None:
+            return workers_error("parse", "parse [--full] [workers=N] [--adaptive]")
+        adaptive = "--adaptive" in args
         if output_format == "json":
-            return emit_response(run_command("parse", {}))
-        n = parse_events()
+            return emit_response(run_command("parse", {"full": full, "workers": workers, "adaptive": adaptive}))
+        n = parse_events(full=full, workers=workers, adaptive=adaptive)
         console.print(Panel(f"Events parsed and inserted: {n}", title="PARSE"))
         return 0
 
     if cmd == "build":
+        full = "--full" in args
+        kv = _parse_kv_args(args)
+        keep_lines = "--no-lines" not in args
+        workers = _parse_workers_arg(kv.get("workers"))
+        if workers is None:
+            return workers_error("build", "build [--full] [--no-lines] [workers=N]")
         if output_format == "json":
-            return emit_response(run_command("build", {}))
-        n_norm = normalize_all()
-        n_parse = parse_events()
-        console.print(Panel(f"Normalized lines inserted: {n_norm}", title="NORMALIZE"))
-        console.print(Panel(f"Events parsed and inserted: {n_parse}", title="PARSE"))
+            return emit_response(run_command("build", {"full": full, "keep_lines": keep_lines, "workers": workers}))
+        build_pipeline(full=full, keep_lines=keep_lines, workers=workers)
         return 0
 
     if cmd == "identities":
@@ -310,6 +412,18 @@ def main(argv=None):
         show_identity(query)
         return 0
 
+    if cmd == "alts":
+        if not args:
+            if output_format == "json":
+                return emit_error("alts", {}, "Usage: alts <id|name|ip>")
+            console.print("[red]Usage:[/red] alts <id|name|ip>")
+            return 1
+        query = " ".join(args)
+        if output_format == "json":
+            return emit_response(run_command("alts", {"query": query}))
+        show_alts(query)
+        return 0
+
     if cmd == "search":
         # Supports both legacy key=value syntax and shortcut syntax.
         kv = _parse_kv_args(args)
@@ -570,6 +684,18 @@ def main(argv=None):
         show_status()
         return 0
 
+    if cmd == "compact":
+        kv = _parse_kv_args(args)
+        codec = kv.get("codec", "lzma")
+        vacuum = _parse_bool_arg(kv.get("vacuum")) is not False
+        if output_format == "json":
+            return emit_response(run_command("compact", {"codec": codec, "vacuum": vacuum}))
+        if codec not in CODECS:
+            console.print(f"[red]Unknown codec:[/red] {codec} (use {'|'.join(CODECS)})")
+            return 1
+        compact_raw_logs(codec=codec, vacuum=vacuum)
+        return 0
+
     if cmd == "debug":
         if output_format == "json":
             return emit_response(run_command("debug", {}))
@@ -0,0 +1,82 @@
+from rich.console import Console
+from rich.panel import Panel
+
+from .db import get_conn
+from .evidence import CODECS, decode_text, encode_text
+
+console = Console()
+
+# Rows recompressed per transaction (bounds memory and lock time).
+COMPACT_BATCH_SIZE = 100
+
+
+def _stored_bytes(cur) -> int:
+    row = cur.execute(
+        """
+        SELECT
+            (SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM raw_logs)
+          + (SELECT COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM raw_log_chunks) AS n
+        """
+    ).fetchone()
+    return int(row["n"])
+
+
+def _recode(conn, table: str, key_cols: str, codec: str) -> int:
+    """Re-encode every non-empty content value of one table that is not stored with codec."""
+    cur = conn.cursor()
+    keys = cur.execute(
+        f"SELECT {key_cols} FROM {table} WHERE codec != ? AND LENGTH(content) > 0 ORDER BY {key_cols}",
+        (codec,),
+    ).fetchall()
+    where = " AND ".join(f"{c.strip()}=?" for c in key_cols.split(","))
+
+    done = 0
+    for k in keys:
+        r = cur.execute(f"SELECT content, codec FROM {table} WHERE {where}", tuple(k)).fetchone()
+        text = decode_text(r["content"], r["codec"])
+        cur.execute(
+            f"UPDATE {table} SET content=?, codec=? WHERE {where}",
+            (encode_text(text, codec), codec, *tuple(k)),
+        )
+        done += 1
+        if done % COMPACT_BATCH_SIZE == 0:
+            conn.commit()
+    conn.commit()
+    return done
+
+
+def compact_raw_logs(codec: str = "lzma", vacuum: bool = True, silent: bool = False) -> dict:
+    """
+    Recompress stored raw evidence in place (raw_logs + raw_log_chunks).
+    Text and hashes are unchanged; only the stored encoding differs.
+    vacuum=True returns the freed pages to the filesystem afterwards.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown evidence codec: {codec} (expected one of {', '.join(CODECS)})")
+
+    with get_conn() as conn:
+        cur = conn.cursor()
+        before = _stored_bytes(cur)
+        rows = _recode(conn, "raw_logs", "id", codec)
+        chunks = _recode(conn, "raw_log_chunks", "raw_log_id, seq", codec)
+        after = _stored_bytes(cur)
+        if vacuum:
+            conn.execute("VACUUM")
+
+    stats = {
+        "codec": codec,
+        "raw_logs": rows,
+        "chunks": chunks,
+        "bytes_before": before,
+        "bytes_after": after,
+    }
+    if not silent:
+        ratio = f"{before / after:.1f}x" if after else "-"
+        console.print(
+            Panel(
+                f"Codec: {codec}\nRaw logs recompressed: {rows}\nChunks recompressed: {chunks}\n"
+                f"Evidence bytes: {before} -> {after} ({ratio})",
+                title="COMPACT",
+            )
+        )
+    return stats
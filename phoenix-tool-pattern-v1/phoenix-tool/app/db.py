@@ -1,8 +1,11 @@
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
 from pathlib import Path
 
+from .evidence import fingerprint_chunks, iter_raw_chunks
+
 BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -17,14 +20,264 @@ def _configure_conn(conn: sqlite3.Connection) -> None:
     conn.execute("PRAGMA synchronous=NORMAL")
 
 
+# Secondary indexes as (name, DDL). Full rebuilds drop them and build each
+# once after the bulk load instead of updating them per row.
+NORMALIZED_LINES_INDEXES = (
+    ("idx_norm_raw_line", "CREATE INDEX IF NOT EXISTS idx_norm_raw_line ON normalized_lines(raw_log_id, line_no)"),
+    ("idx_norm_raw", "CREATE INDEX IF NOT EXISTS idx_norm_raw ON normalized_lines(raw_log_id)"),
+    ("idx_norm_ts", "CREATE INDEX IF NOT EXISTS idx_norm_ts ON normalized_lines(ts)"),
+)
+EVENTS_INDEXES = (
+    ("idx_events_type", "CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)"),
+    ("idx_events_src", "CREATE INDEX IF NOT EXISTS idx_events_src ON events(src_id)"),
+    ("idx_events_dst", "CREATE INDEX IF NOT EXISTS idx_events_dst ON events(dst_id)"),
+    ("idx_events_item", "CREATE INDEX IF NOT EXISTS idx_events_item ON events(item)"),
+)
+IDENTITIES_INDEXES = (
+    # one row per observed (player_id, name, ip); NULL parts compare equal
+    (
+        "idx_identities_key",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_identities_key "
+        "ON identities(COALESCE(player_id,''), COALESCE(name,''), COALESCE(ip,''))",
+    ),
+    ("idx_identities_player", "CREATE INDEX IF NOT EXISTS idx_identities_player ON identities(player_id)"),
+)
+# event_participants.ts_key: ts, or this for untimed events, so (ts_key, event_id)
+# sorts like the readers' (ts IS NULL, ts, id)
+UNTIMED_TS_KEY = "~"
+# role: src, dst, or both (src_id = dst_id); event_type is copied so per-type
+# counts and filters are answered from the player's rows alone
+PARTICIPANTS_SQL = f"""
+    INSERT INTO event_participants(player_id, ts_key, event_id, role, event_type)
+    SELECT src_id, COALESCE(ts, '{UNTIMED_TS_KEY}'), id, CASE WHEN dst_id = src_id THEN 'both' ELSE 'src' END, event_type
+    FROM events WHERE id > ? AND src_id IS NOT NULL
+    UNION ALL
+    SELECT dst_id, COALESCE(ts, '{UNTIMED_TS_KEY}'), id, 'dst', event_type
+    FROM events WHERE id > ? AND dst_id IS NOT NULL AND dst_id IS NOT src_id
+"""
+# FTS5 trigram tables <table>_fts over these columns (rowid = <table>.id)
+TRIGRAM_INDEXES = (
+    ("entities", ("player_id", "name")),
+    ("identities", ("name",)),
+)
+
+# Bulk-load pragma profile (rebuild transactions only)
+BULK_WAL_AUTOCHECKPOINT = 100000   # pages; default is 1000
+BULK_CACHE_SIZE_KIB = 262144       # 256 MiB page cache while building indexes
+
+
+def drop_indexes(cur, indexes) -> None:
+    for name, _ddl in indexes:
+        cur.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def create_indexes(cur, indexes) -> None:
+    for _name, ddl in indexes:
+        cur.execute(ddl)
+
+
 @contextmanager
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
-    _configure_conn(conn)
+def bulk_load(conn: sqlite3.Connection):
+    """
+    Pragma profile for one rebuild transaction: synchronous=OFF, a large WAL
+    autocheckpoint and page cache, in-memory temp store (index sorts). The
+    normal profile is restored, and the WAL checkpointed, when the block exits.
+    A crash mid-rebuild can at worst lose the rebuild itself, which is re-run.
+    """
+    cache_size = conn.execute("PRAGMA cache_size").fetchone()[0]
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"PRAGMA wal_autocheckpoint={BULK_WAL_AUTOCHECKPOINT}")
+    conn.execute(f"PRAGMA cache_size=-{BULK_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     try:
         yield conn
     finally:
-        conn.close()
+        if conn.in_transaction:
+            conn.rollback()
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA wal_autocheckpoint=1000")
+        conn.execute(f"PRAGMA cache_size={cache_size}")
+        conn.execute("PRAGMA temp_store=DEFAULT")
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+# Rows pulled per fetchmany() by streaming readers.
+FETCH_SIZE = 5000
+
+
+def iter_fetchmany(cursor, size: int | None = None):
+    """Yield the rows of an executed cursor in fetchmany(size) slices (flat memory)."""
+    size = size or FETCH_SIZE
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+_HAS_TRIGRAM: bool | None = None
+
+
+def has_trigram() -> bool:
+    """Whether this SQLite build has FTS5 with the trigram tokenizer (3.34+); probed once."""
+    global _HAS_TRIGRAM
+    if _HAS_TRIGRAM is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE probe USING fts5(x, tokenize='trigram')")
+            _HAS_TRIGRAM = True
+        except sqlite3.OperationalError:
+            _HAS_TRIGRAM = False
+        finally:
+            conn.close()
+    return _HAS_TRIGRAM
+
+
+def trigram_phrase(query: str) -> str | None:
+    """
+    query as an FTS5 phrase for a *_fts MATCH, or None if it is too short for
+    trigrams (< 3 chars) or there are no *_fts tables (callers then use LIKE).
+    """
+    q = query.strip()
+    if len(q) < 3 or not has_trigram():
+        return None
+    return '"' + q.replace('"', '""') + '"'
+
+
+# Per-connection statement cache (sqlite3 default: 128); pooled connections keep theirs.
+CACHED_STATEMENTS = 512
+# Read-only connection profile
+READ_MMAP_SIZE = 268435456         # 256 MiB memory-mapped reads
+READ_CACHE_SIZE_KIB = 65536        # 64 MiB page cache
+
+
+def _connect(path, readonly: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, cached_statements=CACHED_STATEMENTS)
+    _configure_conn(conn)
+    if readonly:
+        conn.execute(f"PRAGMA mmap_size={READ_MMAP_SIZE}")
+        conn.execute(f"PRAGMA cache_size=-{READ_CACHE_SIZE_KIB}")
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+class ConnectionPool:
+    """
+    Open connections to one database file, reused across get_conn() calls.
+
+    size=None keeps a free list per thread (CLI, watcher thread): a thread
+    reuses its own connections and a nested get_conn() gets a second one.
+    size=N shares the free list across threads and hands out at most N
+    connections at once (API server); further callers wait up to timeout
+    seconds. A connection returned with an open transaction is rolled back,
+    as closing it would have done.
+    """
+
+    def __init__(self, path, readonly: bool = False, size: int | None = None, timeout: float = 30.0):
+        self.path = path
+        self.readonly = readonly
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conns: set = set()
+        self._busy: set = set()
+        self._shared: list = []
+        self._local = threading.local()
+        self._slots = threading.BoundedSemaphore(size) if size else None
+
+    def _idle(self) -> list:
+        if self._slots is not None:
+            return self._shared
+        idle = getattr(self._local, "idle", None)
+        if idle is None:
+            idle = self._local.idle = []
+        return idle
+
+    @contextmanager
+    def connection(self):
+        if self._slots is not None and not self._slots.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"no free database connection after {self.timeout}s (pool size {self.size})")
+        try:
+            idle = self._idle()
+            with self._lock:
+                conn = idle.pop() if idle else None
+            if conn is None:
+                conn = _connect(self.path, self.readonly)
+                with self._lock:
+                    self._conns.add(conn)
+            with self._lock:
+                self._busy.add(conn)
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                with self._lock:
+                    self._busy.discard(conn)
+                    kept = conn in self._conns
+                    if kept:
+                        idle.append(conn)
+                if not kept:
+                    conn.close()
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+    def close(self) -> None:
+        """Close the idle connections; ones still in use are closed when returned."""
+        with self._lock:
+            conns = self._conns - self._busy
+            self._conns.clear()
+            self._shared.clear()
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+
+# None: one free list per thread; the API server sets a bound (configure_pool).
+POOL_SIZE: int | None = None
+_POOLS: dict[tuple, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def configure_pool(size: int | None) -> None:
+    """Use pools of at most size connections shared by all threads (None: per-thread)."""
+    global POOL_SIZE
+    close_pools()
+    POOL_SIZE = size
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _pool(readonly: bool) -> ConnectionPool:
+    # keyed by pid too: a forked worker must not reuse its parent's connections
+    key = (os.getpid(), str(DB_PATH), readonly)
+    pool = _POOLS.get(key)
+    if pool is None:
+        with _POOLS_LOCK:
+            pool = _POOLS.setdefault(key, ConnectionPool(DB_PATH, readonly, POOL_SIZE))
+    return pool
+
+
+@contextmanager
+def get_conn(readonly: bool = False):
+    """
+    A pooled connection to DB_PATH for the with block. readonly=True gets a
+    query_only connection with a larger page cache and memory-mapped reads.
+    """
+    with _pool(readonly).connection() as conn:
+        yield conn
+
+
+def get_db() -> sqlite3.Connection:
+    """A configured connection outside the pool; the caller closes it."""
+    return _connect(DB_PATH)
 
 
 def init_db():
@@ -38,7 +291,13 @@ def init_db():
                 source_file TEXT NOT NULL,
                 content TEXT NOT NULL,
                 content_hash TEXT NOT NULL UNIQUE,
-                loaded_at TEXT NOT NULL
+                loaded_at TEXT NOT NULL,
+                n_chunks INTEGER NOT NULL DEFAULT 0,
+                parent_id INTEGER REFERENCES raw_logs(id),
+                base_len INTEGER NOT NULL DEFAULT 0,
+                total_len INTEGER,
+                head_hash TEXT,
+                codec TEXT NOT NULL DEFAULT 'none'
             )
             """
         )
@@ -58,6 +317,103 @@ def init_db():
             """
         )
 
+        # Block-level dedupe of overlapping exports (see normalize.py).
+        # A block is one timestamp marker plus the lines under it; the k-th copy
+        # of a block (fingerprint, occurrence) is stored once, by its owner raw log.
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS line_blocks (
+                fingerprint TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                raw_log_id INTEGER NOT NULL,
+                first_line_no INTEGER NOT NULL,
+                last_line_no INTEGER NOT NULL,
+                PRIMARY KEY (fingerprint, occurrence),
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        # every raw log that contained a block (owner included)
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS line_block_sources (
+                fingerprint TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                raw_log_id INTEGER NOT NULL,
+                PRIMARY KEY (raw_log_id, fingerprint, occurrence),
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        # per raw log: which normalizer version produced its normalized_lines
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS normalize_state (
+                raw_log_id INTEGER PRIMARY KEY,
+                normalizer_version TEXT NOT NULL,
+                line_count INTEGER NOT NULL,
+                skipped_lines INTEGER NOT NULL DEFAULT 0,
+                last_ts_raw TEXT,
+                lines_kept INTEGER NOT NULL DEFAULT 1,
+                normalized_at TEXT NOT NULL,
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        # lines_kept = 0: a lines-free build parsed this raw log without storing its lines
+        cols = {r[1] for r in cur.execute("PRAGMA table_info(normalize_state)").fetchall()}
+        if "lines_kept" not in cols:
+            cur.execute("ALTER TABLE normalize_state ADD COLUMN lines_kept INTEGER NOT NULL DEFAULT 1")
+        # lines no parser rule matched (audit input); signature groups similar lines
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS unparsed_lines (
+                raw_log_id INTEGER NOT NULL,
+                line_no INTEGER NOT NULL,
+                ts TEXT,
+                ts_raw TEXT,
+                signature TEXT NOT NULL,
+                text TEXT NOT NULL,
+                PRIMARY KEY (raw_log_id, line_no),
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_unparsed_sig ON unparsed_lines(signature)")
+
+        # per parser rule: cumulative matches, failed attempts and regex time
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parser_stats (
+                rule TEXT PRIMARY KEY,
+                event_type TEXT NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                match_ns INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+
+        # per raw log: parser rule set that produced its events and the last
+        # normalized line parsed (watermark); normalized_at ties it to the lines it saw
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parse_state (
+                raw_log_id INTEGER PRIMARY KEY,
+                rules_version TEXT NOT NULL,
+                last_line_no INTEGER NOT NULL,
+                normalized_at TEXT,
+                parsed_at TEXT NOT NULL,
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_block_sources_fp ON line_block_sources(fingerprint, occurrence)"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_blocks_owner ON line_blocks(raw_log_id, first_line_no)")
+
         cur.execute(
             """
             CREATE TABLE IF NOT EXISTS identities (
@@ -86,9 +442,55 @@ def init_db():
                 """
             )
 
+        create_indexes(cur, IDENTITIES_INDEXES)
+
+        # alt-account clusters: nodes "id:101" / "name:Ion" / "ip:1.2.3.4" linked by
+        # connect/disconnect sightings; nodes of one connected component share cluster
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS identity_clusters (
+                node TEXT PRIMARY KEY,
+                cluster INTEGER NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_identity_clusters_cluster ON identity_clusters(cluster)")
+
+
         cols = {r[1] for r in cur.execute("PRAGMA table_info(raw_logs)").fetchall()}
         if "loaded_at" not in cols:
             cur.execute("ALTER TABLE raw_logs ADD COLUMN loaded_at TEXT")
+        # n_chunks = 0 -> evidence inline in content; > 0 -> streamed into raw_log_chunks
+        if "n_chunks" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN n_chunks INTEGER NOT NULL DEFAULT 0")
+        # append-aware ingest: a row may hold only the tail of a grown export (see evidence.py)
+        if "parent_id" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN parent_id INTEGER REFERENCES raw_logs(id)")
+        if "base_len" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN base_len INTEGER NOT NULL DEFAULT 0")
+        if "total_len" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN total_len INTEGER")
+        if "head_hash" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN head_hash TEXT")
+        # codec of content: none (plain TEXT) | zlib | lzma (see evidence.py)
+        if "codec" not in cols:
+            cur.execute("ALTER TABLE raw_logs ADD COLUMN codec TEXT NOT NULL DEFAULT 'none'")
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS raw_log_chunks (
+                raw_log_id INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                content TEXT NOT NULL,
+                codec TEXT NOT NULL DEFAULT 'none',
+                PRIMARY KEY (raw_log_id, seq),
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        cols = {r[1] for r in cur.execute("PRAGMA table_info(raw_log_chunks)").fetchall()}
+        if "codec" not in cols:
+            cur.execute("ALTER TABLE raw_log_chunks ADD COLUMN codec TEXT NOT NULL DEFAULT 'none'")
 
         cur.execute(
             """
@@ -125,9 +527,14 @@ def init_db():
             """
         )
 
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_norm_raw_line ON normalized_lines(raw_log_id, line_no)")
+        create_indexes(cur, NORMALIZED_LINES_INDEXES)
         cur.execute("CREATE INDEX IF NOT EXISTS idx_raw_source ON raw_logs(source_file)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_norm_raw ON normalized_lines(raw_log_id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_raw_head ON raw_logs(head_hash)")
+
+        # backfill append checkpoints for rows loaded before they existed (one-time)
+        for r in cur.execute("SELECT id, n_chunks FROM raw_logs WHERE total_len IS NULL").fetchall():
+            _h, head, n_chars = fingerprint_chunks(iter_raw_chunks(conn, r["id"], r["n_chunks"]))
+            cur.execute("UPDATE raw_logs SET total_len=?, head_hash=? WHERE id=?", (n_chars, head, r["id"]))
         cols = {row[1] for row in cur.execute("PRAGMA table_info(normalized_lines)").fetchall()}
         if "timestamp_quality" not in cols:
             cur.execute("ALTER TABLE normalized_lines ADD COLUMN timestamp_quality TEXT")
@@ -139,11 +546,103 @@ def init_db():
             cur.execute("ALTER TABLE events ADD COLUMN line_no INTEGER")
         if "source_file" not in cols:
             cur.execute("ALTER TABLE events ADD COLUMN source_file TEXT")
+        # natural key across exports (see parse.event_fingerprint); NULL on rows
+        # parsed before it existed, which the parser version bump reparses
+        if "fingerprint" not in cols:
+            cur.execute("ALTER TABLE events ADD COLUMN fingerprint TEXT")
+        if "occurrence" not in cols:
+            cur.execute("ALTER TABLE events ADD COLUMN occurrence INTEGER")
 
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_norm_ts ON normalized_lines(ts)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_src ON events(src_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_dst ON events(dst_id)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_item ON events(item)")
+        create_indexes(cur, EVENTS_INDEXES)
+        # upsert target and per-raw-log clears (clear_parsed); kept through bulk loads (not in EVENTS_INDEXES)
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_events_fp ON events(fingerprint, occurrence)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_events_raw ON events(raw_log_id)")
+
+        # every line an event was parsed from (the events row keeps the first one);
+        # the k-th event with a fingerprint in a raw log is occurrence k
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS event_occurrences (
+                fingerprint TEXT NOT NULL,
+                occurrence INTEGER NOT NULL,
+                raw_log_id INTEGER NOT NULL,
+                line_no INTEGER NOT NULL,
+                PRIMARY KEY (raw_log_id, line_no),
+                FOREIGN KEY(raw_log_id) REFERENCES raw_logs(id)
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_event_occ_fp ON event_occurrences(fingerprint, occurrence)")
+
+        # one row per (player, event) the player took part in, in timeline order per player
+        new = not cur.execute("SELECT 1 FROM sqlite_master WHERE name='event_participants'").fetchone()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS event_participants (
+                player_id TEXT NOT NULL,
+                ts_key TEXT NOT NULL,
+                event_id INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                PRIMARY KEY (player_id, ts_key, event_id)
+            ) WITHOUT ROWID
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_event_participants_event ON event_participants(event_id)")
+        if new:
+            cur.execute(PARTICIPANTS_SQL, (0, 0))
+
+        # distinct event sources (src_id, src_name) for /entities autocomplete
+        new = not cur.execute("SELECT 1 FROM sqlite_master WHERE name='entities'").fetchone()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entities (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                player_id TEXT,
+                name TEXT,
+                last_seen TEXT
+            )
+            """
+        )
+        cur.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_entities_key ON entities(COALESCE(player_id,''), COALESCE(name,''))"
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_entities_last_seen ON entities(last_seen)")
+        if new:
+            cur.execute(
+                """
+                INSERT INTO entities(player_id, name, last_seen)
+                SELECT src_id, src_name, MAX(ts) FROM events
+                WHERE src_id IS NOT NULL OR src_name IS NOT NULL
+                GROUP BY src_id, src_name
+                """
+            )
+
+        # trigram indexes for substring search on IDs and names; triggers keep them in sync.
+        # Without trigram support (SQLite < 3.34 or no FTS5) there are none, and
+        # triggers a newer build left behind are dropped so writes keep working.
+        for table, columns in TRIGRAM_INDEXES:
+            fts = f"{table}_fts"
+            if not has_trigram():
+                cur.execute(f"DROP TRIGGER IF EXISTS {fts}_ai")
+                cur.execute(f"DROP TRIGGER IF EXISTS {fts}_ad")
+                continue
+            # (re)built whenever its triggers are new: the table may have changed without them
+            new = not cur.execute("SELECT 1 FROM sqlite_master WHERE name=?", (f"{fts}_ai",)).fetchone()
+            cols = ", ".join(columns)
+            cur.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} "
+                f"USING fts5({cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+            )
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {', '.join('new.' + c for c in columns)}); END"
+            )
+            cur.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {', '.join('old.' + c for c in columns)}); END"
+            )
+            if new:
+                cur.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
 
         conn.commit()
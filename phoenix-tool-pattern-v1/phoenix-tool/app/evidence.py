@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import io
+import lzma
+import zipfile
+import zlib
+from pathlib import Path
+
+# Raw evidence storage.
+# Small exports are stored inline in raw_logs.content (one TEXT value).
+# Large exports are streamed into ordered raw_log_chunks rows so neither ingest
+# nor normalize ever needs the whole file in memory.
+
+CHUNK_CHARS = 1 << 20                  # ~1M characters per stored chunk
+STREAM_THRESHOLD_BYTES = 8 << 20       # files above this size are ingested chunked
+
+# Append-aware ingest checkpoints: every raw log records the hash of its first
+# HEAD_CHARS characters (head_hash) next to the hash of the whole logical file
+# (content_hash, over total_len characters). A new export whose head matches and
+# whose first total_len characters hash to content_hash is that file plus a tail.
+HEAD_CHARS = 1024
+
+# Stored evidence may be compressed. Every raw_logs / raw_log_chunks row records
+# the codec of its content; readers decode transparently and all hashes are over
+# the decoded text, so dedupe and append detection do not depend on the codec.
+CODECS = ("none", "zlib", "lzma")
+DEFAULT_CODEC = "zlib"
+
+
+# Archive members are addressed as "<archive>.zip!/<member path>"; *.gz files
+# hold a single text. Such source labels are plain strings, so they can be
+# handed to ingest worker processes like ordinary paths.
+ZIP_SEP = "!/"
+
+
+def zip_text_members(path: str) -> list[str]:
+    """Sorted *.txt member names of a zip archive (nested folders included)."""
+    with zipfile.ZipFile(path) as z:
+        return sorted(i.filename for i in z.infolist() if not i.is_dir() and i.filename.endswith(".txt"))
+
+
+def source_size(source: str | Path) -> int | None:
+    """
+    Uncompressed size in bytes of a file or zip member (used to pick streaming).
+    None for .gz files: the gzip trailer only holds the size mod 2**32, so it
+    cannot tell a small file from a huge one; callers stream those.
+    """
+    source = str(source)
+    if ZIP_SEP in source:
+        archive, member = source.split(ZIP_SEP, 1)
+        with zipfile.ZipFile(archive) as z:
+            return z.getinfo(member).file_size
+    if source.endswith(".gz"):
+        return None
+    return Path(source).stat().st_size
+
+
+def open_source_text(source: str | Path):
+    """Text stream (utf-8, errors ignored, universal newlines) for a file, .gz file or zip member."""
+    source = str(source)
+    if ZIP_SEP in source:
+        archive, member = source.split(ZIP_SEP, 1)
+        # the archive file stays open while the member stream is and closes with it
+        with zipfile.ZipFile(archive) as z:
+            return io.TextIOWrapper(z.open(member), encoding="utf-8", errors="ignore")
+    if source.endswith(".gz"):
+        return gzip.open(source, "rt", encoding="utf-8", errors="ignore")
+    return Path(source).open("r", encoding="utf-8", errors="ignore")
+
+
+def read_text_chunks(path: str | Path, chunk_chars: int = CHUNK_CHARS):
+    """
+    Yield the decoded text of a file (or archive member) in fixed-size chunks.
+    Decoding matches Path.read_text(encoding="utf-8", errors="ignore"),
+    including universal newline translation.
+    """
+    with open_source_text(path) as f:
+        while True:
+            chunk = f.read(chunk_chars)
+            if not chunk:
+                break
+            yield chunk
+
+
+def fingerprint_chunks(chunks) -> tuple[str, str | None, int]:
+    """
+    One pass over a text stream -> (content_hash, head_hash, n_chars).
+    head_hash is None for texts shorter than HEAD_CHARS (they never act as a prefix).
+    """
+    h = hashlib.sha1()
+    head = hashlib.sha1()
+    n = 0
+    for chunk in chunks:
+        if n < HEAD_CHARS:
+            head.update(chunk[: HEAD_CHARS - n].encode("utf-8", errors="ignore"))
+        h.update(chunk.encode("utf-8", errors="ignore"))
+        n += len(chunk)
+    return h.hexdigest(), (head.hexdigest() if n >= HEAD_CHARS else None), n
+
+
+def scan_prefixes(chunks, lengths) -> dict[int, tuple[str, bool]]:
+    """
+    Hash the first L characters of a text stream for every L in lengths.
+    Returns {L: (sha1 hex, on_line_boundary)}; a prefix is on a line boundary
+    when it ends with a newline or the next character is one.
+    """
+    targets = sorted({int(n) for n in lengths if n > 0})
+    out: dict[int, tuple[str, bool]] = {}
+    waiting: list[tuple[int, str]] = []  # prefixes ending exactly at a chunk end
+    h = hashlib.sha1()
+    pos = 0
+    ti = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        for L, digest in waiting:
+            out[L] = (digest, chunk[0] == "\n")
+        waiting = []
+        start = 0
+        while ti < len(targets) and targets[ti] - pos <= len(chunk):
+            cut = targets[ti] - pos
+            h.update(chunk[start:cut].encode("utf-8", errors="ignore"))
+            start = cut
+            digest = h.hexdigest()
+            if chunk[cut - 1] == "\n":
+                out[targets[ti]] = (digest, True)
+            elif cut < len(chunk):
+                out[targets[ti]] = (digest, chunk[cut] == "\n")
+            else:
+                waiting.append((targets[ti], digest))
+            ti += 1
+        h.update(chunk[start:].encode("utf-8", errors="ignore"))
+        pos += len(chunk)
+        if ti >= len(targets) and not waiting:
+            break
+    for L, digest in waiting:
+        out[L] = (digest, True)  # prefix is the whole text
+    return out
+
+
+def skip_chars(chunks, n: int):
+    """Yield a text stream without its first n characters."""
+    for chunk in chunks:
+        if n >= len(chunk):
+            n -= len(chunk)
+            continue
+        yield chunk[n:] if n else chunk
+        n = 0
+
+
+def split_lines(chunks):
+    """
+    Yield lines from a stream of text chunks.
+    Output is identical to "".join(chunks).splitlines() but only ever holds
+    one chunk (plus a partial line) in memory.
+    """
+    carry = ""
+    for chunk in chunks:
+        buf = carry + chunk
+        parts = buf.splitlines(keepends=True)
+        if not parts:
+            carry = ""
+            continue
+        # The last part may be an unfinished line (or a "\r" whose "\n" is in the next chunk).
+        carry = parts.pop()
+        for part in parts:
+            yield part.splitlines()[0]
+    if carry:
+        yield from carry.splitlines()
+
+
+def encode_text(text: str, codec: str = DEFAULT_CODEC):
+    """Text -> stored value (str for "none", compressed bytes otherwise)."""
+    if codec == "none":
+        return text
+    if codec == "zlib":
+        return zlib.compress(text.encode("utf-8"), 6)
+    if codec == "lzma":
+        return lzma.compress(text.encode("utf-8"), preset=6)
+    raise ValueError(f"Unknown evidence codec: {codec}")
+
+
+def decode_text(value, codec: str | None) -> str:
+    """Stored value -> text. Rows written before codecs existed are plain text."""
+    if not value:
+        return ""
+    if not codec or codec == "none":
+        return value
+    if codec == "zlib":
+        return zlib.decompress(value).decode("utf-8")
+    if codec == "lzma":
+        return lzma.decompress(value).decode("utf-8")
+    raise ValueError(f"Unknown evidence codec: {codec}")
+
+
+def store_chunks(cur, raw_log_id: int, chunks, codec: str = DEFAULT_CODEC) -> int:
+    """Insert ordered chunk rows for one raw log. Returns the number of chunks written."""
+    n = 0
+    for n, chunk in enumerate(chunks, 1):
+        cur.execute(
+            "INSERT INTO raw_log_chunks(raw_log_id, seq, content, codec) VALUES (?,?,?,?)",
+            (raw_log_id, n, encode_text(chunk, codec), codec),
+        )
+    return n
+
+
+def iter_raw_chunks(conn, raw_log_id: int, n_chunks: int = 0):
+    """Yield the stored text of one raw log, chunk by chunk (decompressed)."""
+    if not n_chunks:
+        row = conn.execute("SELECT content, codec FROM raw_logs WHERE id=?", (raw_log_id,)).fetchone()
+        if row and row["content"]:
+            yield decode_text(row["content"], row["codec"])
+        return
+
+    rows = conn.execute(
+        "SELECT content, codec FROM raw_log_chunks WHERE raw_log_id=? ORDER BY seq ASC",
+        (raw_log_id,),
+    )
+    for r in rows:
+        yield decode_text(r["content"], r["codec"])
+
+
+def iter_raw_lines(conn, raw_log_id: int, n_chunks: int = 0):
+    """Line stream for one raw log, regardless of how its evidence is stored."""
+    return split_lines(iter_raw_chunks(conn, raw_log_id, n_chunks))
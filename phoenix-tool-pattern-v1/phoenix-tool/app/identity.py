@@ -1,85 +1,272 @@
+import json
+import re
+from collections import Counter
+
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
-from .db import get_conn
+from .db import IDENTITIES_INDEXES, create_indexes, drop_indexes, get_conn, iter_fetchmany, trigram_phrase
 
 console = Console(force_terminal=True)
 
 
+def _clean(v) -> str | None:
+    return (str(v).strip() if v is not None else "") or None
+
+
+def identity_key(pid, name, ip=None) -> tuple | None:
+    """(player_id, name, ip) as stored in identities, or None for a junk sighting."""
+    pid, name, ip = _clean(pid), _clean(name), _clean(ip)
+    # Require at least ID or name (avoid junk)
+    if pid is None and name is None:
+        return None
+    return pid, name, ip
+
+
+def event_identities(event_type, container, src_id, src_name, dst_id, dst_name) -> list[tuple]:
+    """Identity keys one event observes: its source, and its destination (with IP if connect/disconnect)."""
+    ip = None
+    if event_type in ("connect", "disconnect"):
+        cand = (container or "").strip()
+        # only accept likely IPs; ignore nil/empty
+        if cand and cand.lower() != "nil" and "." in cand:
+            ip = cand.replace("**", "")
+    keys = (identity_key(src_id, src_name), identity_key(dst_id, dst_name, ip))
+    return [k for k in keys if k is not None]
+
+
+# Event columns event_identities reads, in its argument order.
+IDENTITY_EVENT_COLUMNS = "event_type, container, src_id, src_name, dst_id, dst_name"
+
+_UPSERT_SIGHTINGS_SQL = """
+    INSERT INTO identities(player_id, name, ip, sightings) VALUES (?,?,?,?)
+    ON CONFLICT(COALESCE(player_id,''), COALESCE(name,''), COALESCE(ip,''))
+    DO UPDATE SET sightings = sightings + excluded.sightings
+"""
+
+
+def record_sightings(cur, events: list, sign: int = 1) -> int:
+    """
+    Add (sign=1) or remove (sign=-1) the sightings of event rows
+    (IDENTITY_EVENT_COLUMNS) with one batched upsert; identities left with
+    no sightings are deleted. Clusters follow: added links are merged in,
+    removed ones trigger a cluster rebuild. The parser keeps identities
+    current this way. Returns the identity keys touched.
+    """
+    sightings: Counter = Counter()
+    for r in events:
+        sightings.update(event_identities(*r))
+    if not sightings:
+        return 0
+    cur.executemany(_UPSERT_SIGHTINGS_SQL, ((*key, sign * n) for key, n in sightings.items()))
+    if sign > 0:
+        link_clusters(cur, events)
+    else:
+        cur.execute("DELETE FROM identities WHERE sightings <= 0")
+        if any(r[0] in CLUSTER_EVENT_TYPES for r in events):
+            rebuild_clusters(cur)
+    return len(sightings)
+
+
+# -------------------------
+# Entities (autocomplete)
+# -------------------------
+
+# NOT INDEXED: read the new events by rowid range; left alone, the planner
+# walks all of idx_events_src to get the GROUP BY order
+_UPSERT_ENTITIES_SQL = """
+    INSERT INTO entities(player_id, name, last_seen)
+    SELECT src_id, src_name, MAX(ts) FROM events NOT INDEXED
+    WHERE id > ? AND (src_id IS NOT NULL OR src_name IS NOT NULL)
+    GROUP BY src_id, src_name
+    ON CONFLICT(COALESCE(player_id,''), COALESCE(name,''))
+    DO UPDATE SET last_seen = CASE
+        WHEN last_seen IS NULL OR excluded.last_seen > last_seen THEN excluded.last_seen
+        ELSE last_seen
+    END
+"""
+
+
+def record_entities(cur, after_id: int) -> None:
+    """Add the sources of events with id > after_id to entities (and entities_fts), moving last_seen forward."""
+    cur.execute(_UPSERT_ENTITIES_SQL, (after_id,))
+
+
+def refresh_entities(cur, keys) -> None:
+    """
+    Recompute last_seen of the (src_id, src_name) keys after their events were
+    deleted; keys with no events left are dropped from entities.
+    """
+    gone, moved = [], []
+    for pid, name in set(keys):
+        n, last_seen = cur.execute(
+            "SELECT COUNT(*), MAX(ts) FROM events WHERE src_id IS ? AND src_name IS ?", (pid, name)
+        ).fetchone()
+        if n:
+            moved.append((last_seen, pid, name))
+        else:
+            gone.append((pid, name))
+    where = "COALESCE(player_id,'') = COALESCE(?,'') AND COALESCE(name,'') = COALESCE(?,'')"
+    cur.executemany(f"DELETE FROM entities WHERE {where}", gone)
+    cur.executemany(f"UPDATE entities SET last_seen = ? WHERE {where}", moved)
+
+
+# -------------------------
+# Alt-account clusters
+# -------------------------
+
+# Sightings that link an ID to a name and an IP.
+CLUSTER_EVENT_TYPES = ("connect", "disconnect")
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: dict = {}
+        self.size: dict = {}
+
+    def find(self, x):
+        parent = self.parent
+        if x not in parent:
+            parent[x] = x
+            self.size[x] = 1
+            return x
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # path halving
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def groups(self) -> dict:
+        """root -> members, in first-seen order."""
+        out: dict = {}
+        for x in self.parent:
+            out.setdefault(self.find(x), []).append(x)
+        return out
+
+
+def _cluster_links(events) -> list[tuple[str, str]]:
+    """Node pairs linked by connect/disconnect rows (IDENTITY_EVENT_COLUMNS); a lone node pairs with itself."""
+    links = []
+    for r in events:
+        if r[0] not in CLUSTER_EVENT_TYPES:
+            continue
+        for pid, name, ip in event_identities(*r):
+            nodes = [f"{kind}:{v}" for kind, v in (("id", pid), ("name", name), ("ip", ip)) if v is not None]
+            links.extend(zip(nodes, nodes[1:]) if len(nodes) > 1 else [(nodes[0], nodes[0])])
+    return links
+
+
+def link_clusters(cur, events) -> int:
+    """
+    Merge the links of new event rows into identity_clusters (incremental
+    union-find). Stored clusters take part as single elements: joined clusters
+    are relabelled to the largest one, new nodes get its label or a new one.
+    Returns the nodes added.
+    """
+    links = _cluster_links(events)
+    if not links:
+        return 0
+    nodes = {n for link in links for n in link}
+    labels = dict(
+        cur.execute(
+            "SELECT node, cluster FROM identity_clusters WHERE node IN (SELECT value FROM json_each(?))",
+            (json.dumps(sorted(nodes)),),
+        ).fetchall()
+    )
+    uf = _UnionFind()
+    for a, b in links:
+        uf.union(a, b)
+    for node, label in labels.items():
+        uf.union(node, label)  # labels are ints, nodes are "kind:value"
+
+    next_label = None
+    added = []
+    for members in uf.groups().values():
+        new = [m for m in members if isinstance(m, str) and m not in labels]
+        old = sorted({m for m in members if isinstance(m, int)})
+        if not new and len(old) < 2:
+            continue
+        if old:
+            qs = ",".join("?" * len(old))
+            sizes = dict(cur.execute(f"SELECT cluster, COUNT(*) FROM identity_clusters WHERE cluster IN ({qs}) GROUP BY cluster", old).fetchall())
+            label = max(old, key=lambda c: (sizes.get(c, 0), -c))
+            rest = [c for c in old if c != label]
+            if rest:
+                cur.execute(f"UPDATE identity_clusters SET cluster=? WHERE cluster IN ({','.join('?' * len(rest))})", [label, *rest])
+        else:
+            if next_label is None:
+                next_label = cur.execute("SELECT COALESCE(MAX(cluster), 0) + 1 FROM identity_clusters").fetchone()[0]
+            label, next_label = next_label, next_label + 1
+        added.extend((m, label) for m in new)
+    cur.executemany("INSERT INTO identity_clusters(node, cluster) VALUES (?,?)", added)
+    return len(added)
+
+
+def rebuild_clusters(cur) -> int:
+    """Recompute identity_clusters from all connect/disconnect events. Returns the clusters."""
+    qs = ",".join("?" * len(CLUSTER_EVENT_TYPES))
+    rows = cur.execute(
+        f"SELECT {IDENTITY_EVENT_COLUMNS} FROM events WHERE event_type IN ({qs}) ORDER BY id", CLUSTER_EVENT_TYPES
+    )
+    uf = _UnionFind()
+    for a, b in _cluster_links(iter_fetchmany(rows)):
+        uf.union(a, b)
+    groups = uf.groups().values()
+    cur.execute("DELETE FROM identity_clusters")
+    cur.executemany(
+        "INSERT INTO identity_clusters(node, cluster) VALUES (?,?)",
+        ((node, label) for label, members in enumerate(groups, 1) for node in members),
+    )
+    return len(groups)
+
+
 def rebuild_identities(silent: bool = False):
     """
     Stage 4: Identity resolution is OBSERVED, not assumed.
-    Rebuild deterministically from parsed events (not raw logs).
+    Rebuild deterministically from parsed events (not raw logs). Parsing
+    keeps identities current (record_sightings); this renumbers them and
+    repairs a database whose events were changed outside the parser.
+
+    One streaming pass counts sightings per (player_id, name, ip); rows are
+    written in first-sighting order with one executemany, and the indexes are
+    built after the load.
     """
     with get_conn() as conn:
         cur = conn.cursor()
-        cur.execute("DELETE FROM identities")
 
         rows = cur.execute(
-            """
-            SELECT
-                ts,
-                raw_log_id,
-                id as event_id,
-                event_type,
-                container,
-                src_id, src_name,
-                dst_id, dst_name
+            f"""
+            SELECT {IDENTITY_EVENT_COLUMNS}
             FROM events
             ORDER BY
                 CASE WHEN ts IS NULL THEN 1 ELSE 0 END,
                 ts ASC,
                 raw_log_id ASC,
-                event_id ASC
+                id ASC
             """
-        ).fetchall()
-
-        inserted = 0
-
-        def observe(pid, name, ip=None):
-            nonlocal inserted
-
-            pid = (str(pid).strip() if pid is not None else "") or None
-            name = (str(name).strip() if name is not None else "") or None
-            ip = (str(ip).strip() if ip is not None else "") or None
+        )
+        sightings: Counter = Counter()
+        for r in iter_fetchmany(rows):
+            sightings.update(event_identities(*r))
 
-            # Require at least ID or name (avoid junk)
-            if pid is None and name is None:
-                return
-
-            row = cur.execute(
-                """
-                SELECT id FROM identities
-                WHERE COALESCE(player_id,'') = COALESCE(?, '')
-                  AND COALESCE(name,'')      = COALESCE(?, '')
-                  AND COALESCE(ip,'')        = COALESCE(?, '')
-                """,
-                (pid, name, ip),
-            ).fetchone()
-
-            if row:
-                cur.execute("UPDATE identities SET sightings = sightings + 1 WHERE id = ?", (row["id"],))
-            else:
-                cur.execute(
-                    "INSERT INTO identities(player_id, name, ip, sightings) VALUES (?,?,?,1)",
-                    (pid, name, ip),
-                )
-                inserted += 1
-
-        for r in rows:
-            # observe source
-            observe(r["src_id"], r["src_name"], None)
-
-            # observe destination, with IP if connect/disconnect
-            ip = None
-            if r["event_type"] in ("connect", "disconnect"):
-                cand = (r["container"] or "").strip()
-                # only accept likely IPs; ignore nil/empty
-                if cand and cand.lower() != "nil" and "." in cand:
-                    ip = cand.replace("**", "")
-
-            observe(r["dst_id"], r["dst_name"], ip)
+        drop_indexes(cur, IDENTITIES_INDEXES)
+        cur.execute("DELETE FROM identities")
+        cur.executemany(
+            "INSERT INTO identities(player_id, name, ip, sightings) VALUES (?,?,?,?)",
+            ((*key, n) for key, n in sightings.items()),
+        )
+        create_indexes(cur, IDENTITIES_INDEXES)
+        inserted = len(sightings)
+        rebuild_clusters(cur)
 
         conn.commit()
 
@@ -89,7 +276,7 @@ def rebuild_identities(silent: bool = False):
 
 
 def show_identity(query: str, as_data: bool = False):
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
 
         if query.isdigit():
@@ -104,7 +291,21 @@ def show_identity(query: str, as_data: bool = False):
                 (query,),
             ).fetchall()
             title = f"ID {query}"
+        elif phrase := trigram_phrase(query):
+            rows = cur.execute(
+                """
+                SELECT i.player_id, i.name, i.ip, i.sightings
+                FROM identities_fts f
+                JOIN identities i ON i.id = f.rowid
+                WHERE identities_fts MATCH ?
+                ORDER BY i.sightings DESC
+                LIMIT 50
+                """,
+                (phrase,),
+            ).fetchall()
+            title = f"Query '{query}'"
         else:
+            # no trigram index for this query (short, or SQLite without FTS5 trigram)
             rows = cur.execute(
                 """
                 SELECT player_id, name, ip, sightings
@@ -138,3 +339,62 @@ def show_identity(query: str, as_data: bool = False):
         t.add_row(str(r["player_id"] or ""), str(r["name"] or ""), str(r["ip"] or ""), str(r["sightings"] or 0))
 
     console.print(t)
+
+
+RE_IPV4 = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+def _query_node(query: str) -> str:
+    q = query.strip()
+    if q.isdigit():
+        return f"id:{q}"
+    if RE_IPV4.match(q):
+        return f"ip:{q}"
+    return f"name:{q}"
+
+
+def fetch_alts(query: str) -> dict:
+    """
+    The alt-account cluster of an ID, exact name or IP: every ID, name and IP
+    connected to it through connect/disconnect sightings (one indexed lookup).
+    """
+    with get_conn(readonly=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT c.node, c.cluster
+            FROM identity_clusters q
+            JOIN identity_clusters c ON c.cluster = q.cluster
+            WHERE q.node = ?
+            """,
+            (_query_node(query),),
+        ).fetchall()
+
+    members: dict[str, list[str]] = {"id": [], "name": [], "ip": []}
+    for r in rows:
+        kind, _, value = r["node"].partition(":")
+        members[kind].append(value)
+    return {
+        "query": query,
+        "cluster": rows[0]["cluster"] if rows else None,
+        "ids": sorted(members["id"], key=lambda v: (len(v), v)),
+        "names": sorted(members["name"], key=str.lower),
+        "ips": sorted(members["ip"]),
+    }
+
+
+def show_alts(query: str, as_data: bool = False):
+    data = fetch_alts(query)
+    if as_data:
+        return data
+
+    if data["cluster"] is None:
+        console.print(Panel(f"No connect/disconnect sightings for '{query}'.", title="ALTS"))
+        return data
+
+    t = Table(title=f"ALTS — '{query}' (cluster {data['cluster']})", show_lines=True)
+    t.add_column("Player IDs")
+    t.add_column("Names")
+    t.add_column("IPs")
+    t.add_row("\n".join(data["ids"]), "\n".join(data["names"]), "\n".join(data["ips"]))
+    console.print(t)
+    return data
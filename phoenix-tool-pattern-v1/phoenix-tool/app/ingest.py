@@ -1,21 +1,217 @@
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
 from rich.console import Console
 from rich.panel import Panel
 
 from .db import get_conn
+from .evidence import (
+    CHUNK_CHARS,
+    DEFAULT_CODEC,
+    HEAD_CHARS,
+    STREAM_THRESHOLD_BYTES,
+    ZIP_SEP,
+    encode_text,
+    fingerprint_chunks,
+    open_source_text,
+    read_text_chunks,
+    scan_prefixes,
+    skip_chars,
+    source_size,
+    store_chunks,
+    zip_text_members,
+)
 from .util import sha1_text, utc_now_iso
 
 console = Console()
 
+# Writer commits once per this many inserted raw logs.
+INGEST_BATCH_SIZE = 200
 
-def load_logs(path: str, silent: bool = False):
+_INSERT_RAW_SQL = """
+    INSERT INTO raw_logs
+    (source_file, content, content_hash, loaded_at, parent_id, base_len, total_len, head_hash, codec)
+    VALUES (?,?,?,?,?,?,?,?,?)
+"""
+
+
+def _read_and_hash(path: str, stream: bool | None, chunk_chars: int):
+    """
+    Read + decode + hash one file. Runs in worker processes when workers > 1.
+    Returns (path, text, hash, head_hash, n_chars, error). text is None for
+    files that must be stored chunked; the writer streams those itself.
+    """
+    try:
+        chunked = stream
+        if chunked is None:
+            size = source_size(path)  # None for .gz: always streamed
+            chunked = size is None or size > STREAM_THRESHOLD_BYTES
+        if chunked:
+            # hash only (constant memory); the writer stores chunks if the file is new
+            h, head, n_chars = fingerprint_chunks(read_text_chunks(path, chunk_chars))
+            return path, None, h, head, n_chars, None
+        with open_source_text(path) as f:
+            text = f.read()
+        head = sha1_text(text[:HEAD_CHARS]) if len(text) >= HEAD_CHARS else None
+        return path, text, sha1_text(text), head, len(text), None
+    except Exception as e:
+        return path, None, None, None, 0, str(e)
+
+
+def _find_prefix(
+    fpath: str,
+    text: str | None,
+    n_chars: int,
+    candidates: list[tuple[int, str]],
+    chunk_chars: int,
+) -> tuple[int, str] | None:
+    """
+    Return (total_len, content_hash) of the longest already-ingested file that is
+    a line-aligned prefix of this one, or None. candidates share its head_hash.
+    """
+    cands = [(n, h) for n, h in candidates if n < n_chars]
+    if not cands:
+        return None
+    chunks = [text] if text is not None else read_text_chunks(fpath, chunk_chars)
+    scanned = scan_prefixes(chunks, [n for n, _h in cands])
+    for n, h in sorted(cands, reverse=True):
+        digest, on_boundary = scanned.get(n, (None, False))
+        if digest == h and on_boundary:
+            return n, h
+    return None
+
+
+def _iter_read_results(files: list[str], workers: int, stream: bool | None, chunk_chars: int):
+    """Yield _read_and_hash results in input order (deterministic raw_log_id assignment)."""
+    paths = [str(f) for f in files]
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield _read_and_hash(path, stream, chunk_chars)
+        return
+
+    # Submit in bounded windows so decoded texts never pile up far ahead of the writer.
+    window = workers * 8
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for start in range(0, len(paths), window):
+            part = paths[start : start + window]
+            yield from pool.map(
+                _read_and_hash,
+                part,
+                [stream] * len(part),
+                [chunk_chars] * len(part),
+            )
+
+
+def _is_archive(f: Path) -> bool:
+    return f.suffix == ".zip" or f.name.endswith(".txt.gz")
+
+
+def _resolve_sources(p: Path, silent: bool) -> list[str]:
+    """
+    Source labels to ingest, in a deterministic order: *.txt files, *.txt.gz
+    files and the *.txt members of *.zip archives ("archive.zip!/dir/file.txt").
+    """
+    if p.is_file():
+        files = [p]
+    else:
+        files = sorted(f for f in p.rglob("*") if f.is_file() and (f.suffix == ".txt" or _is_archive(f)))
+
+    sources: list[str] = []
+    for f in files:
+        if f.suffix != ".zip":
+            sources.append(str(f))
+            continue
+        try:
+            sources.extend(f"{f}{ZIP_SEP}{m}" for m in zip_text_members(str(f)))
+        except (OSError, zipfile.BadZipFile) as e:
+            if not silent:
+                console.print(f"[red]Failed to read[/red] {f}: {e}")
+    return sources
+
+
+def insert_raw_log(
+    cur,
+    source_file: str,
+    tail: str,
+    content_hash: str,
+    head_hash: str | None,
+    parent_id: int | None = None,
+    base_len: int = 0,
+    codec: str = DEFAULT_CODEC,
+) -> int:
+    """
+    Insert one inline raw_logs row holding tail, the text after the first
+    base_len characters of the logical file (stored in parent_id's chain).
+    Hashes are over the whole logical file. Returns the new raw_log_id.
+    """
+    cur.execute(
+        _INSERT_RAW_SQL,
+        (source_file, encode_text(tail, codec), content_hash, utc_now_iso(), parent_id, base_len, base_len + len(tail), head_hash, codec),
+    )
+    return cur.lastrowid
+
+
+def store_text(cur, source_file: str, text: str, codec: str = DEFAULT_CODEC) -> tuple[int, bool]:
+    """
+    Store one decoded text as raw evidence (dedupe + append detection).
+    Returns (raw_log_id, inserted); inserted is False for an exact duplicate.
+    """
+    h = sha1_text(text)
+    row = cur.execute("SELECT id FROM raw_logs WHERE content_hash=?", (h,)).fetchone()
+    if row:
+        return row["id"], False
+
+    head = sha1_text(text[:HEAD_CHARS]) if len(text) >= HEAD_CHARS else None
+    parent_id = None
+    base_len = 0
+    if head:
+        candidates = [
+            (r["total_len"], r["content_hash"])
+            for r in cur.execute("SELECT total_len, content_hash FROM raw_logs WHERE head_hash=?", (head,))
+        ]
+        prefix = _find_prefix(source_file, text, len(text), candidates, CHUNK_CHARS)
+        if prefix:
+            base_len = prefix[0]
+            parent_id = cur.execute("SELECT id FROM raw_logs WHERE content_hash=?", (prefix[1],)).fetchone()["id"]
+
+    return insert_raw_log(cur, source_file, text[base_len:], h, head, parent_id, base_len, codec), True
+
+
+def load_logs(
+    path: str,
+    silent: bool = False,
+    stream: bool | None = None,
+    chunk_chars: int = CHUNK_CHARS,
+    workers: int = 1,
+    append: bool = True,
+    codec: str = DEFAULT_CODEC,
+):
     """
     Stage 1: RAW INGESTION
     - Accepts a file OR a directory
-    - Recursively loads *.txt files
+    - Recursively loads *.txt files, *.txt.gz files and *.txt members of
+      *.zip archives (read in place, never extracted to disk)
     - Stores raw evidence unchanged
     - Deduplicates by content hash
+
+    stream=None picks streaming per file (size > STREAM_THRESHOLD_BYTES);
+    stream=True/False forces chunked/inline storage for every file.
+    Streaming reads the file in chunk_chars pieces, hashes as it goes and
+    stores the evidence as ordered raw_log_chunks rows.
+
+    workers > 1 reads, decodes and hashes files in a process pool. A single
+    writer (this process) dedupes against a hash set loaded once and inserts
+    in file order, so raw_log_id values do not depend on the worker count.
+
+    append=True stores only the new tail of a re-exported file: if an already
+    ingested file is a line-aligned prefix of this one (same head_hash, matching
+    content_hash over its length), the new row keeps just the appended text and
+    points at it through parent_id / base_len.
+
+    codec compresses the stored evidence (none | zlib | lzma); hashes are
+    always computed over the decoded text.
     """
 
     p = Path(path)
@@ -25,11 +221,8 @@ def load_logs(path: str, silent: bool = False):
             console.print(f"[red]Path not found:[/red] {path}")
         return 0
 
-    # Resolve files deterministically
-    if p.is_file():
-        files = [p]
-    else:
-        files = sorted(p.rglob("*.txt"))
+    # Resolve files (and archive members) deterministically
+    files = _resolve_sources(p, silent)
 
     if not files:
         if not silent:
@@ -38,51 +231,82 @@ def load_logs(path: str, silent: bool = False):
 
     inserted = 0
     skipped = 0
+    extended = 0
 
     with get_conn() as conn:
         cur = conn.cursor()
 
-        for f in files:
-            try:
-                text = f.read_text(encoding="utf-8", errors="ignore")
-            except Exception as e:
-                if not silent:
-                    console.print(f"[red]Failed to read[/red] {f}: {e}")
-                continue
+        # Deduplication by content hash (evidence safety): one query, then set lookups.
+        # raw_ids maps content_hash -> id (None while the row is still pending).
+        raw_ids: dict[str, int | None] = {}
+        heads: dict[str, list[tuple[int, str]]] = defaultdict(list)
+        for r in cur.execute("SELECT id, content_hash, head_hash, total_len FROM raw_logs"):
+            raw_ids[r["content_hash"]] = r["id"]
+            if r["head_hash"] and r["total_len"]:
+                heads[r["head_hash"]].append((r["total_len"], r["content_hash"]))
+        pending: list[tuple] = []
+
+        def flush(commit: bool = True):
+            if pending:
+                cur.executemany(_INSERT_RAW_SQL, pending)
+                pending.clear()
+            if commit:
+                conn.commit()
 
-            h = sha1_text(text)
+        def raw_id_for(content_hash: str) -> int:
+            if raw_ids.get(content_hash) is None:
+                flush(commit=False)
+                raw_ids[content_hash] = cur.execute(
+                    "SELECT id FROM raw_logs WHERE content_hash=?", (content_hash,)
+                ).fetchone()["id"]
+            return raw_ids[content_hash]
 
-            # Deduplication by content hash (evidence safety)
-            exists = cur.execute(
-                "SELECT 1 FROM raw_logs WHERE content_hash=?",
-                (h,),
-            ).fetchone()
+        for fpath, text, h, head, n_chars, err in _iter_read_results(files, int(workers or 1), stream, chunk_chars):
+            if err is not None:
+                if not silent:
+                    console.print(f"[red]Failed to read[/red] {fpath}: {err}")
+                continue
 
-            if exists:
+            if h in raw_ids:
                 skipped += 1
                 continue
 
-            cur.execute(
-                """
-                INSERT INTO raw_logs
-                (source_file, content, content_hash, loaded_at)
-                VALUES (?,?,?,?)
-                """,
-                (
-                    str(f),
-                    text,
-                    h,
-                    utc_now_iso(),
-                ),
-            )
+            parent_id = None
+            base_len = 0
+            prefix = _find_prefix(fpath, text, n_chars, heads.get(head, []), chunk_chars) if (append and head) else None
+            if prefix:
+                base_len, parent_hash = prefix
+                parent_id = raw_id_for(parent_hash)
+                extended += 1
+
+            raw_ids[h] = None
+            if head:
+                heads[head].append((n_chars, h))
+
+            if text is not None:
+                pending.append(
+                    (fpath, encode_text(text[base_len:], codec), h, utc_now_iso(), parent_id, base_len, n_chars, head, codec)
+                )
+            else:
+                # chunked rows need their id right away; keep insertion order intact
+                flush(commit=False)
+                cur.execute(_INSERT_RAW_SQL, (fpath, "", h, utc_now_iso(), parent_id, base_len, n_chars, head, "none"))
+                raw_id = cur.lastrowid
+                raw_ids[h] = raw_id
+                chunks = skip_chars(read_text_chunks(fpath, chunk_chars), base_len)
+                n_chunks = store_chunks(cur, raw_id, chunks, codec)
+                cur.execute("UPDATE raw_logs SET n_chunks=? WHERE id=?", (n_chunks, raw_id))
             inserted += 1
 
-        conn.commit()
+            if inserted % INGEST_BATCH_SIZE == 0:
+                flush()
+
+        flush()
 
     if not silent:
         console.print(
             Panel(
-                f"Files loaded: {inserted}\nDuplicates skipped: {skipped}",
+                f"Files loaded: {inserted}\nAppended tails: {extended}\nDuplicates skipped: {skipped}",
                 title="RAW INGEST",
             )
         )
@@ -1,8 +1,14 @@
+import json
 import re
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
 from datetime import datetime, timedelta, timezone
 from rich.console import Console
 from rich.panel import Panel
-from .db import get_conn
+from .db import NORMALIZED_LINES_INDEXES, bulk_load, create_indexes, drop_indexes, get_conn, iter_fetchmany
+from .evidence import iter_raw_lines
+from .util import sha1_text, utc_now_iso
 
 console = Console()
 
@@ -32,6 +38,13 @@ RE_ABS_TS_MDY12 = re.compile(
 RE_FILE_DATE_DMY = re.compile(r"(\d{1,2})[.\-_](\d{1,2})[.\-_](\d{4})")
 RE_FILE_DATE_YMD = re.compile(r"(\d{4})[.\-_](\d{1,2})[.\-_](\d{1,2})")
 
+# normalized_lines rows per executemany call
+NORMALIZE_BATCH_SIZE = 5000
+
+# Recorded per raw log in normalize_state; bump whenever normalization output
+# changes (noise rules, marker formats, block dedupe) so stale logs are redone.
+NORMALIZER_VERSION = "1"
+
 NOISE_EXACT = {
     "Freaks Logs",
     "PHOENIX LOGS",
@@ -192,83 +205,432 @@ def _parse_marker(ts_raw: str, base_date: datetime | None) -> tuple[str | None,
     return None, "UNKNOWN"
 
 
-def normalize_all(silent: bool = False):
-    with get_conn() as conn:
-        cur = conn.cursor()
+def _is_marker(s: str) -> bool:
+    return "—" in s and bool(
+        RE_REL_TS.search(s)
+        or RE_REL_24H.search(s)
+        or RE_ABS_TS_DMY.search(s)
+        or RE_ABS_TS_YMD.search(s)
+        or RE_ABS_TS_MDY12.search(s)
+    )
+
+
+def _is_noise(s: str) -> bool:
+    if not s:
+        return True
+    if len(s) >= 10 and s[0] == "=" and not s.strip("="):
+        return True
+    if s in NOISE_EXACT:
+        return True
+    # NOISE_PREFIXES covers RAW_LOG_ID: / FILE:
+    return s.startswith(NOISE_PREFIXES)
+
+
+def _block_fingerprint(ts_iso: str, lines: list[str]) -> str:
+    # keyed on the resolved timestamp, not the marker text: the same message reads
+    # "Today at 10:07 PM" in one export and "20.12.2025 22:07" in another
+    return sha1_text(ts_iso + "\n" + "\n".join(lines))
+
+
+class _BlockIndex:
+    """Owner lookup for (fingerprint, occurrence) keys, cached for one run."""
+
+    def __init__(self, cur, empty: bool = False):
+        self.cur = cur
+        self.owners: dict[tuple[str, int], int] = {}
+        self.complete = empty  # line_blocks was just cleared: the cache is the whole table
+
+    def owner(self, key: tuple[str, int]) -> int | None:
+        if key in self.owners or self.complete:
+            return self.owners.get(key)
+        row = self.cur.execute(
+            "SELECT raw_log_id FROM line_blocks WHERE fingerprint=? AND occurrence=?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self.owners[key] = row["raw_log_id"]
+        return row["raw_log_id"]
+
+
+# Highest occurrence of one block fingerprint among the raw logs of a chain (?1, JSON ids).
+_CHAIN_OCCURRENCE_SQL = """
+    SELECT MAX(occurrence)
+    FROM line_block_sources
+    WHERE fingerprint = ?2
+      AND raw_log_id IN (SELECT value FROM json_each(?1))
+"""
+
+
+class _ChainOccurrences(Counter):
+    """
+    Block occurrence counts that continue an append chain's numbering. Each
+    fingerprint's count in the chain is looked up when the tail first has it,
+    so a tail costs its own blocks, not every block of the file before it.
+    """
+
+    def __init__(self, conn, chain: list[int]):
+        super().__init__()
+        self.conn = conn
+        self.chain = json.dumps(chain)
+
+    def __missing__(self, fp: str) -> int:
+        n = self.conn.execute(_CHAIN_OCCURRENCE_SQL, (self.chain, fp)).fetchone()[0] or 0
+        self[fp] = n
+        return n
+
+
+def _chain_occurrences(conn, parent_id: int | None) -> Counter:
+    """Block occurrence counts of an append chain (a tail continues its parent's numbering)."""
+    ids = []
+    while parent_id:
+        ids.append(parent_id)
+        r = conn.execute("SELECT parent_id FROM raw_logs WHERE id=?", (parent_id,)).fetchone()
+        parent_id = r["parent_id"] if r else None
+    return _ChainOccurrences(conn, ids) if ids else Counter()
+
+
+@dataclass
+class _RawLogResult:
+    """Filled in when the row generator of one raw log is exhausted."""
+    inserted: int = 0
+    skipped: int = 0                # duplicate block lines not inserted
+    last_ts_raw: str | None = None  # last marker (context for an appended tail)
+
+
+def _iter_normalized_rows(
+    conn,
+    r,
+    seed_ts_raw: str | None = None,
+    blocks: _BlockIndex | None = None,
+    result: _RawLogResult | None = None,
+    record: bool = True,
+):
+    """
+    Yield normalized_lines rows (raw_log_id, line_no, ts, ts_raw, timestamp_quality, text)
+    for one raw log. seed_ts_raw is the marker in effect before the first line
+    (appended tails continue their parent's context). record=False replays an
+    already normalized raw log without writing block bookkeeping.
+
+    With a block index, lines are grouped into blocks (one marker + its lines).
+    A timestamped block already stored by another raw log (same fingerprint and
+    occurrence number) is only recorded as a source, not yielded again; the
+    occurrence number keeps genuinely repeated messages within one export.
+    """
+    result = result if result is not None else _RawLogResult()
+    raw_id = r["id"]
+    # base date priority: explicit filename date -> None
+    base_dt = _base_date_from_filename(r["source_file"])
+
+    last_ts_raw = seed_ts_raw
+    last_ts_iso = None
+    last_ts_quality = "UNKNOWN"
+    if last_ts_raw:
+        last_ts_iso, last_ts_quality = _parse_marker(last_ts_raw, base_dt)
+
+    # normalized sequence line number (1..N per raw_log)
+    norm_no = 0
+    block: list[str] = []
+    occurrences = _chain_occurrences(conn, r["parent_id"]) if blocks is not None else Counter()
+    sources: list[tuple] = []
+    claimed: list[tuple] = []
+
+    def block_rows() -> list[tuple]:
+        nonlocal norm_no
+        if blocks is not None and last_ts_iso:
+            fp = _block_fingerprint(last_ts_iso, block)
+            occurrences[fp] += 1
+            key = (fp, occurrences[fp])
+            sources.append((fp, key[1], raw_id))
+            owner = blocks.owner(key)
+            if owner is not None and owner != raw_id:
+                result.skipped += len(block)
+                return []
+            blocks.owners[key] = raw_id
+            claimed.append((fp, key[1], raw_id, norm_no + 1, norm_no + len(block)))
+
+        first = norm_no + 1
+        norm_no += len(block)
+        return [
+            (raw_id, no, last_ts_iso, last_ts_raw, last_ts_quality, text)
+            for no, text in enumerate(block, first)
+        ]
+
+    for line in iter_raw_lines(conn, raw_id, r["n_chunks"]):
+        s = line.strip()
+
+        # noise removal
+        if _is_noise(s):
+            continue
+
+        # timestamp marker line updates context, not inserted
+        if _is_marker(s):
+            if block:
+                yield from block_rows()
+                block.clear()
+            last_ts_raw = s
+            last_ts_iso, last_ts_quality = _parse_marker(s, base_dt)  # may be None; ts_raw still kept
+            continue
+
+        block.append(s)
+
+    if block:
+        yield from block_rows()
+
+    if claimed and record:
+        conn.executemany("INSERT OR REPLACE INTO line_blocks VALUES (?,?,?,?,?)", claimed)
+    if sources and record:
+        conn.executemany("INSERT OR IGNORE INTO line_block_sources VALUES (?,?,?)", sources)
+
+    result.inserted = norm_no
+    result.last_ts_raw = last_ts_raw
+
+
+_INSERT_LINE_SQL = """
+    INSERT INTO normalized_lines(raw_log_id, line_no, ts, ts_raw, timestamp_quality, text)
+    VALUES (?,?,?,?,?,?)
+"""
+
+
+def _write_rows(cur, rows, batch_size: int, keep_lines: bool = True, on_batch=None) -> int:
+    """
+    Drain a row generator in batch_size slices: executemany into normalized_lines
+    (keep_lines) and/or hand each slice to on_batch(cur, batch). Returns rows seen.
+    """
+    n = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return n
+        if keep_lines:
+            cur.executemany(_INSERT_LINE_SQL, batch)
+        if on_batch is not None:
+            on_batch(cur, batch)
+        n += len(batch)
+
+
+def _end_marker(conn, raw_id: int | None) -> str | None:
+    """Last timestamp marker of a raw log, walking up the append chain if it has none."""
+    while raw_id:
+        r = conn.execute("SELECT n_chunks, parent_id FROM raw_logs WHERE id=?", (raw_id,)).fetchone()
+        if r is None:
+            return None
+        last = None
+        for line in iter_raw_lines(conn, raw_id, r["n_chunks"]):
+            s = line.strip()
+            if s and not _is_noise(s) and _is_marker(s):
+                last = s
+        if last:
+            return last
+        raw_id = r["parent_id"]
+    return None
+
+
+_RAW_SELECT = "SELECT id, source_file, n_chunks, parent_id FROM raw_logs"
+
+
+def _version(dedupe: bool) -> str:
+    return NORMALIZER_VERSION if dedupe else f"{NORMALIZER_VERSION}-nodedupe"
+
+
+def _save_state(conn, results: dict[int, _RawLogResult], version: str, keep_lines: bool = True):
+    now = utc_now_iso()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO normalize_state
+        (raw_log_id, normalizer_version, line_count, skipped_lines, last_ts_raw, lines_kept, normalized_at)
+        VALUES (?,?,?,?,?,?,?)
+        """,
+        [
+            (raw_id, version, res.inserted, res.skipped, res.last_ts_raw, int(keep_lines), now)
+            for raw_id, res in results.items()
+        ],
+    )
 
-        # rebuild deterministically
-        cur.execute("DELETE FROM normalized_lines")
 
-        # Support older DBs where raw_logs may not have loaded_at yet
-        cols = {row[1] for row in cur.execute("PRAGMA table_info(raw_logs)").fetchall()}
-        has_loaded_at = "loaded_at" in cols
+def _parent_marker(conn, parent_id: int) -> str | None:
+    row = conn.execute("SELECT last_ts_raw FROM normalize_state WHERE raw_log_id=?", (parent_id,)).fetchone()
+    # rows normalized before normalize_state existed: scan the parent chain
+    return row["last_ts_raw"] if row else _end_marker(conn, parent_id)
 
-        if has_loaded_at:
-            raws = cur.execute(
-                "SELECT id, source_file, loaded_at, content FROM raw_logs ORDER BY id ASC"
-            ).fetchall()
-        else:
-            raws = cur.execute(
-                "SELECT id, source_file, content FROM raw_logs ORDER BY id ASC"
-            ).fetchall()
 
-        inserted = 0
+def lines_kept(conn, raw_id: int) -> bool:
+    """False when a lines-free build did not store this raw log's normalized_lines."""
+    state = conn.execute("SELECT lines_kept FROM normalize_state WHERE raw_log_id=?", (raw_id,)).fetchone()
+    return state is None or bool(state["lines_kept"])
 
+
+def iter_line_rows(
+    conn,
+    raw,
+    blocks: _BlockIndex | None = None,
+    after_line_no: int = 0,
+    upto_line_no: int | None = None,
+):
+    """
+    Normalized rows of one raw log (raw: id, source_file, n_chunks, parent_id)
+    with after_line_no < line_no <= upto_line_no (no upper bound by default).
+    Read from normalized_lines, or replayed from the raw evidence when a
+    lines-free build did not keep them (normalize_state.lines_kept = 0).
+    """
+    if lines_kept(conn, raw["id"]):
+        params = [raw["id"], after_line_no]
+        upto = ""
+        if upto_line_no is not None:
+            upto = "AND line_no <= ?"
+            params.append(upto_line_no)
+        cur = conn.execute(
+            f"""
+            SELECT raw_log_id, line_no, ts, ts_raw, timestamp_quality, text
+            FROM normalized_lines
+            WHERE raw_log_id=? AND line_no > ? {upto}
+            ORDER BY line_no ASC
+            """,
+            params,
+        )
+        yield from iter_fetchmany(cur)
+        return
+    seed = _parent_marker(conn, raw["parent_id"]) if raw["parent_id"] else None
+    if blocks is None:
+        blocks = _BlockIndex(conn.cursor())
+    for row in _iter_normalized_rows(conn, raw, seed, blocks, record=False):
+        if upto_line_no is not None and row[1] > upto_line_no:
+            return
+        if row[1] > after_line_no:
+            yield row
+
+
+def rebuild_lines(
+    conn,
+    dedupe: bool = True,
+    batch_size: int = NORMALIZE_BATCH_SIZE,
+    keep_lines: bool = True,
+    on_batch=None,
+) -> tuple[int, int]:
+    """
+    Full rebuild of normalized_lines (and block / state bookkeeping) on an open
+    connection, without committing. Every slice of rows is passed to
+    on_batch(cur, rows) as well; keep_lines=False skips storing the lines.
+    Returns (lines, duplicate lines skipped).
+    """
+    cur = conn.cursor()
+
+    # rebuild deterministically
+    cur.execute("DELETE FROM normalized_lines")
+    cur.execute("DELETE FROM line_blocks")
+    cur.execute("DELETE FROM line_block_sources")
+    cur.execute("DELETE FROM normalize_state")
+    drop_indexes(cur, NORMALIZED_LINES_INDEXES)
+
+    # content is not selected here: each raw log is streamed line by line
+    raws = cur.execute(_RAW_SELECT + " ORDER BY id ASC").fetchall()
+    blocks = _BlockIndex(conn.cursor(), empty=True) if dedupe else None
+    # per raw log; an appended tail continues its parent's timestamp context
+    results: dict[int, _RawLogResult] = {}
+
+    def rows():
         for r in raws:
-            raw_id = r["id"]
-            source_file = r["source_file"]
-            # base date priority: explicit filename date -> None
-            base_dt = _base_date_from_filename(source_file)
-
-            last_ts_raw = None
-            last_ts_iso = None
-            last_ts_quality = "UNKNOWN"
-
-            # normalized sequence line number (1..N per raw_log)
-            norm_no = 0
-
-            for _raw_ln_no, line in enumerate(r["content"].splitlines(), 1):
-                s = line.strip()
-
-                if set(s) <= {"="} and len(s) >= 10:
-                    continue
-
-                if s.startswith("RAW_LOG_ID:") or s.startswith("FILE:"):
-                    continue
-
-                if not s:
-                    continue
-
-                # noise removal
-                if s in NOISE_EXACT:
-                    continue
-                if any(s.startswith(p) for p in NOISE_PREFIXES):
-                    continue
-
-                # timestamp marker line updates context, not inserted
-                if "—" in s and (
-                    RE_REL_TS.search(s)
-                    or RE_REL_24H.search(s)
-                    or RE_ABS_TS_DMY.search(s)
-                    or RE_ABS_TS_YMD.search(s)
-                    or RE_ABS_TS_MDY12.search(s)
-                ):
-                    last_ts_raw = s
-                    last_ts_iso, last_ts_quality = _parse_marker(s, base_dt)  # may be None; ts_raw still kept
-                    continue
-
-                # insert meaningful normalized line
-                norm_no += 1
-                cur.execute(
-                    """
-                    INSERT INTO normalized_lines(raw_log_id, line_no, ts, ts_raw, timestamp_quality, text)
-                    VALUES (?,?,?,?,?,?)
-                    """,
-                    (raw_id, norm_no, last_ts_iso, last_ts_raw, last_ts_quality, s),
-                )
-                inserted += 1
+            parent = results.get(r["parent_id"]) if r["parent_id"] else None
+            res = results[r["id"]] = _RawLogResult()
+            yield from _iter_normalized_rows(conn, r, parent.last_ts_raw if parent else None, blocks, res)
 
-        conn.commit()
+    n = _write_rows(cur, rows(), batch_size, keep_lines=keep_lines, on_batch=on_batch)
+    create_indexes(cur, NORMALIZED_LINES_INDEXES)
+    _save_state(conn, results, _version(dedupe), keep_lines=keep_lines)
+    return n, sum(res.skipped for res in results.values())
+
+
+def _report(inserted: int, skipped: int, silent: bool):
     if not silent:
-        console.print(Panel(f"Normalized lines inserted: {inserted}", title="NORMALIZE"))
+        console.print(
+            Panel(
+                f"Normalized lines inserted: {inserted}\nDuplicate block lines skipped: {skipped}",
+                title="NORMALIZE",
+            )
+        )
+
+
+def normalize_all(silent: bool = False, dedupe: bool = True, batch_size: int = NORMALIZE_BATCH_SIZE):
+    """
+    Rebuild normalized_lines from every raw log.
+    dedupe=True stores blocks shared by overlapping exports only once
+    (line_blocks / line_block_sources keep track of every file that had them).
+
+    Rows come from one generator chain and are written with executemany in
+    batch_size slices, inside one transaction under the bulk-load profile;
+    the normalized_lines secondary indexes are dropped first and rebuilt once
+    at the end instead of being updated per row.
+    """
+    with get_conn() as conn, bulk_load(conn):
+        inserted, skipped = rebuild_lines(conn, dedupe=dedupe, batch_size=batch_size)
+        conn.commit()
+
+    _report(inserted, skipped, silent)
+    return inserted
+
+
+def normalize_raw_logs(raw_ids: list[int], silent: bool = False, dedupe: bool = True):
+    """Normalize only the given raw logs (new or stale); other lines are untouched."""
+    if not raw_ids:
+        return 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        qs = ",".join(["?"] * len(raw_ids))
+        raws = cur.execute(_RAW_SELECT + f" WHERE id IN ({qs}) ORDER BY id ASC", list(raw_ids)).fetchall()
+        for r in raws:
+            cur.execute("DELETE FROM normalized_lines WHERE raw_log_id=?", (r["id"],))
+            cur.execute("DELETE FROM line_block_sources WHERE raw_log_id=?", (r["id"],))
+
+        blocks = _BlockIndex(conn.cursor()) if dedupe else None
+        results: dict[int, _RawLogResult] = {}
+
+        def rows():
+            for r in raws:
+                parent = r["parent_id"]
+                seed = None
+                if parent:
+                    seed = results[parent].last_ts_raw if parent in results else _parent_marker(conn, parent)
+                res = results[r["id"]] = _RawLogResult()
+                yield from _iter_normalized_rows(conn, r, seed, blocks, res)
+
+        inserted = _write_rows(cur, rows(), NORMALIZE_BATCH_SIZE)
+        _save_state(conn, results, _version(dedupe))
+        conn.commit()
+
+    _report(inserted, sum(res.skipped for res in results.values()), silent)
     return inserted
+
+
+def pending_raw_log_ids(dedupe: bool = True) -> list[int]:
+    """Raw logs without a normalize_state row for the current normalizer version."""
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT r.id
+            FROM raw_logs r
+            LEFT JOIN normalize_state s ON s.raw_log_id = r.id AND s.normalizer_version = ?
+            WHERE s.raw_log_id IS NULL
+            ORDER BY r.id ASC
+            """,
+            (_version(dedupe),),
+        ).fetchall()
+    return [r["id"] for r in rows]
+
+
+def has_current_state(dedupe: bool = True) -> bool:
+    """True when some raw log was normalized by the current normalizer version."""
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM normalize_state WHERE normalizer_version=? LIMIT 1", (_version(dedupe),)
+        ).fetchone()
+    return row is not None
+
+
+def normalize_incremental(silent: bool = False, dedupe: bool = True) -> int:
+    """
+    Normalize only raw logs that are new or were normalized by another
+    normalizer version. Falls back to the bulk normalize_all when nothing
+    current can be reused (fresh database, version bump, pre-state database).
+    """
+    if not has_current_state(dedupe):
+        return normalize_all(silent=silent, dedupe=dedupe)
+    return normalize_raw_logs(pending_raw_log_ids(dedupe), silent=silent, dedupe=dedupe)
@@ -1,10 +1,22 @@
+import json
 import re
+import sqlite3
+import time
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
+
+import yaml
 from rich.console import Console
 from rich.panel import Panel
 
-from .db import get_conn
-from .util import normalize_money, normalize_qty
+from . import db as app_db
+from .db import BASE_DIR, PARTICIPANTS_SQL, _configure_conn, get_conn, iter_fetchmany
+from .identity import IDENTITY_EVENT_COLUMNS, record_entities, record_sightings, refresh_entities
+from .normalize import iter_line_rows, lines_kept
+from .util import normalize_money, normalize_qty, sha1_text, utc_now_iso
 
 console = Console()
 
@@ -12,12 +24,90 @@ console = Console()
 # Regex patterns
 # -------------------------
 
-RE_BANK_TRANSFER = re.compile(
+def _atomic(pattern: str) -> str:
+    """
+    Spell atomic groups "(?>X)" as "(?=(?P<_aN>X))(?P=_aN)": the lookahead
+    matches X once and never backtracks into it, the backreference consumes
+    it. Same matches as native atomic groups, which need Python 3.11.
+
+    Only patterns with atomic groups are rewritten. The added groups are named
+    so they cannot clash with the pattern's own names, but they still shift its
+    group numbers, so numeric backreferences ("\\1", "(?(1)...)") are rejected
+    there: use (?P<name>...) and (?P=name).
+    """
+    prefix = "_a"
+    own = set(re.findall(r"\(\?P<(\w+)>", pattern))
+    while any(g.startswith(prefix) for g in own):
+        prefix = "_" + prefix
+    out = []
+    groups: list[int | None] = []  # per open paren: its atomic group number
+    n = 0
+    i = 0
+    numeric = None  # first numeric group reference seen
+    in_class = False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\":
+            if not in_class and pattern[i + 1 : i + 2] in tuple("123456789"):
+                numeric = numeric or pattern[i : i + 2]
+            out.append(pattern[i : i + 2])
+            i += 2
+            continue
+        if in_class:
+            in_class = c != "]"
+        elif c == "[":
+            in_class = True
+            # "]" right after "[" or "[^" is a literal
+            j = i + 1 + pattern.startswith("^", i + 1)
+            if pattern.startswith("]", j):
+                out.append(pattern[i : j + 1])
+                i = j + 1
+                continue
+        elif pattern.startswith("(?>", i):
+            n += 1
+            groups.append(n)
+            out.append(f"(?=(?P<{prefix}{n}>")
+            i += 3
+            continue
+        elif c == "(":
+            if re.match(r"\(\?\(\d", pattern[i : i + 4]):
+                numeric = numeric or pattern[i : i + 4]
+            groups.append(None)
+        elif c == ")" and groups:
+            k = groups.pop()
+            if k is not None:
+                out.append(f"))(?P={prefix}{k})")
+                i += 1
+                continue
+        out.append(c)
+        i += 1
+    if n and numeric:
+        raise ValueError(f"numeric group reference {numeric} in a pattern with atomic groups")
+    return "".join(out)
+
+
+def _compile(pattern: str, flags: int = 0) -> re.Pattern:
+    return re.compile(_atomic(pattern), flags)
+
+
+# Linear-time guards (same matches as the plain patterns, without the
+# backtracking blow-up on long non-matching lines; "(?>...)" goes through _atomic):
+# - "(?>name.+?[id] literal(?=\s))\s+" commits to the first place a lazy group
+#   can end. What follows starts with another lazy ".+?" that can take in
+#   anything a later ending would skip, so a later ending never matches where
+#   the first one failed.
+# - (?<![A-Za-z0-9_?]) only starts a bare name at the start of its run.
+# - the rest run anchored (anchor: start). A pattern that begins with ".+?" can
+#   only have its leftmost match at 0, and "(?>.*?Prefix(?=\s))\s+name.+?"
+#   tries the first occurrence of Prefix only: a name that can take in
+#   anything matches from there whenever it matches from a later one.
+
+RE_BANK_TRANSFER = _compile(
     r"""
-    (?P<src_name>.+?)\[(?P<src_id>\d+)\]
+    (?>(?P<src_name>.+?)\[(?P<src_id>\d+)\]
     \s+a\s+transferat\s+
     (?P<amount>[\d\.,]+)\$
-    \s+lui\s+
+    \s+lui(?=\s))\s+
     (?P<dst_name>.+?)\[(?P<dst_id>\d+)\]
     \.?
     """,
@@ -25,96 +115,499 @@ RE_BANK_TRANSFER = re.compile(
 )
 
 # Deposit bank: "name[id] a depozitat 1.900.000$."
-RE_BANK_DEPOSIT = re.compile(
+RE_BANK_DEPOSIT = _compile(
     r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+depozitat\s+(?P<amount>[\d\.,]+)\$\s*\.?",
     re.I,
 )
 
 # Withdraw bank: "name[id] a retras 4.900.000$."
-RE_BANK_WITHDRAW = re.compile(
+RE_BANK_WITHDRAW = _compile(
     r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+retras\s+(?P<amount>[\d\.,]+)\$\s*\.?",
     re.I,
 )
 
-RE_OFERA_ITEM = re.compile(
-    r"Jucatorul\s+(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+i-a oferit lui\s+(?P<dst_name>.+?)\[(?P<dst_id>\d+)\]\s+-\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
+RE_OFERA_ITEM = _compile(
+    r"(?>.*?Jucatorul(?=\s))\s+(?>(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+i-a oferit lui(?=\s))\s+(?>(?P<dst_name>.+?)\[(?P<dst_id>\d+)\]\s+-(?=\s))\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
     re.I,
 )
 
-RE_OFERA_BANI = re.compile(
-    r"Jucatorul\s+(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+i-a oferit lui\s+(?P<dst_name>.+?)\[(?P<dst_id>\d+)\]\s+suma de\s+(?P<amount>[\d\.,]+)\$\.",
+RE_OFERA_BANI = _compile(
+    r"(?>.*?Jucatorul(?=\s))\s+(?>(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+i-a oferit lui(?=\s))\s+(?P<dst_name>.+?)\[(?P<dst_id>\d+)\]\s+suma de\s+(?P<amount>[\d\.,]+)\$\.",
     re.I,
 )
 
-RE_PHONE_ADD = re.compile(
-    r"Jucătorului:\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+i-au fost adaugati\s+(?P<amount>[\d\.,]+)\s*\$",
+RE_PHONE_ADD = _compile(
+    r"(?>.*?Jucătorului:(?=\s))\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+i-au fost adaugati\s+(?P<amount>[\d\.,]+)\s*\$",
     re.I,
 )
 
-RE_PHONE_REMOVE = re.compile(
-    r"Jucătorului:\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+i-au fost luati\s+(?P<amount>[\d\.,]+)\s*\$",
+RE_PHONE_REMOVE = _compile(
+    r"(?>.*?Jucătorului:(?=\s))\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+i-au fost luati\s+(?P<amount>[\d\.,]+)\s*\$",
     re.I,
 )
 
-RE_DROP_ITEM = re.compile(
-    r"Jucător:\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+a aruncat pe jos\s+(?P<qty>[\d\.,\s]+)x\s+(?P<item>.+)",
+RE_DROP_ITEM = _compile(
+    r"(?>.*?Jucător:(?=\s))\s+(?P<name>.+?)\s*\(\s*(?P<id>\d+)\s*\)\s+a aruncat pe jos\s+(?P<qty>[\d\.,\s]+)x\s+(?P<item>.+)",
     re.I,
 )
 
-RE_CONTAINER_PUT = re.compile(
-    r"\[TRANSFER\]\s+Jucatorul\s+(?P<name>.+?)\[(?P<id>\d+)\]\s+a pus in\s+(?P<container>.+?)\s+item-ul\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
+RE_CONTAINER_PUT = _compile(
+    r"(?>.*?\[TRANSFER\]\s+Jucatorul(?=\s))\s+(?>(?P<name>.+?)\[(?P<id>\d+)\]\s+a pus in(?=\s))\s+(?>(?P<container>.+?)\s+item-ul(?=\s))\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
     re.I,
 )
 
-RE_CONTAINER_REMOVE = re.compile(
-    r"\[REMOVE\]\s+Jucatorul\s+(?P<name>.+?)\[(?P<id>\d+)\]\s+a scos din\s+(?P<container>.+?)\s+item-ul\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
+RE_CONTAINER_REMOVE = _compile(
+    r"(?>.*?\[REMOVE\]\s+Jucatorul(?=\s))\s+(?>(?P<name>.+?)\[(?P<id>\d+)\]\s+a scos din(?=\s))\s+(?>(?P<container>.+?)\s+item-ul(?=\s))\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
     re.I,
 )
 
 # Perchezitie (robbery/search): "[PERCHEZITIE] Jucatorul Name[2] a scos din 787 item-ul Gadget Pistol(x1)."
-RE_PERCHEZITIE = re.compile(
-    r"\[PERCHEZITIE\]\s+Jucatorul\s+(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+a\s+scos\s+din\s+(?P<dst_id>\d+)\s+item-ul\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
+RE_PERCHEZITIE = _compile(
+    r"(?>.*?\[PERCHEZITIE\]\s+Jucatorul(?=\s))\s+(?>(?P<src_name>.+?)\[(?P<src_id>\d+)\]\s+a\s+scos\s+din\s+(?P<dst_id>\d+)\s+item-ul(?=\s))\s+(?P<item>.+?)\(x(?P<qty>[\d\.,\s]+)\)\.",
     re.I,
 )
 
 
 # Vehicle sell (Remat): "Jucător: Name (123) a vandut vehiculul Model [code] pentru suma de X$ | GARAGE: Y"
-RE_VEHICLE_SELL_REMAT = re.compile(
-    r"Jucător:\s+(?P<name>.+?)\s+\((?P<id>\d+)\)\s+a vandut vehiculul\s+(?P<veh>.+?)\s+\[(?P<veh_code>.*?)\]\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\s+\|\s+GARAGE:\s*(?P<garage>.+)$",
+RE_VEHICLE_SELL_REMAT = _compile(
+    r"(?>.*?Jucător:(?=\s))\s+(?>(?P<name>.+?)\s+\((?P<id>\d+)\)\s+a vandut vehiculul(?=\s))\s+(?P<veh>.+?)\s+\[(?P<veh_code>.*?)\]\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\s+\|\s+GARAGE:\s*(?P<garage>.+)$",
     re.I,
 )
 
 # Vehicle buy (Showroom): "Jucător: Name (123) a achizitionat vehiculul: ... pentru suma de X$ !"
-RE_VEHICLE_BUY_SHOWROOM = re.compile(
-    r"Jucător:\s+(?P<name>.+?)\s+\((?P<id>\d+)\)\s+a achizitionat vehiculul:\s+(?P<veh>.+?)\s+\[(?P<veh_code>.*?)\]\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\s*!?\s*",
+RE_VEHICLE_BUY_SHOWROOM = _compile(
+    r"(?>.*?Jucător:(?=\s))\s+(?>(?P<name>.+?)\s+\((?P<id>\d+)\)\s+a achizitionat vehiculul:(?=\s))\s+(?P<veh>.+?)\s+\[(?P<veh_code>.*?)\]\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\s*!?\s*",
     re.I,
 )
 
 # Player-to-player vehicle sale: "Jucător: Alberto a vandut vehiculul nerossmk2 lui [8296] NAME pentru suma de 1$!"
-RE_VEHICLE_SELL_TO_PLAYER = re.compile(
-    r"Jucător:\s+(?P<src_name>.+?)\s+a vandut vehiculul\s+(?P<veh_code>[A-Za-z0-9_]+)\s+lui\s+\[(?P<dst_id>\d+)\]\s+(?P<dst_name>.+?)\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\!",
+RE_VEHICLE_SELL_TO_PLAYER = _compile(
+    r"(?>.*?Jucător:(?=\s))\s+(?P<src_name>.+?)\s+a vandut vehiculul\s+(?P<veh_code>[A-Za-z0-9_]+)\s+lui\s+\[(?P<dst_id>\d+)\]\s+(?P<dst_name>.+?)\s+pentru suma de\s+(?P<amount>[\d\.,]+)\$\!",
     re.I,
 )
 
-RE_CONNECT = re.compile(
-    r"(?P<name>[A-Za-z0-9_?]+)\[(?P<id>\d+)\]\s+se\s+conecteaz(?:ă|a)\s+cu\s+succes.*?\(ip:\s*(?P<ip>[\d\.]+)\*\*\)",
+RE_CONNECT = _compile(
+    r"(?<![A-Za-z0-9_?])(?P<name>[A-Za-z0-9_?]+)\[(?P<id>\d+)\]\s+se\s+conecteaz(?:ă|a)\s+cu\s+succes.*?\(ip:\s*(?P<ip>[\d\.]+)\*\*\)",
     re.I,
 )
 
-RE_DISCONNECT = re.compile(
-    r"(?P<name>[A-Za-z0-9_?]+)\[(?P<id>\d+)\]\s+s-a\s+deconectat\s+cu\s+succes.*?\(ip:\s*(?P<ip>[^)]+)\)",
+RE_DISCONNECT = _compile(
+    r"(?<![A-Za-z0-9_?])(?P<name>[A-Za-z0-9_?]+)\[(?P<id>\d+)\]\s+s-a\s+deconectat\s+cu\s+succes.*?\(ip:\s*(?P<ip>[^)]+)\)",
     re.I,
 )
 
 
-RE_DEPOSIT = re.compile(r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+depozitat\s+(?P<amount>[\d\.,]+)\$\s*\.?", re.I)
-RE_WITHDRAW = re.compile(r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+retras\s+(?P<amount>[\d\.,]+)\$\s*\.?", re.I)
+RE_DEPOSIT = _compile(r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+depozitat\s+(?P<amount>[\d\.,]+)\$\s*\.?", re.I)
+RE_WITHDRAW = _compile(r"(?P<name>.+?)\[(?P<id>\d+)\]\s+a\s+retras\s+(?P<amount>[\d\.,]+)\$\s*\.?", re.I)
 
 # -------------------------
-# Audit handling
+# Parser registry
 # -------------------------
 
-AUDIT_PATH = Path("output/audit/audit_samples.txt")
+PARSERS_CONFIG = BASE_DIR / "config" / "parsers.yaml"
+
+# Bump when parse_rows or a normalizer changes output for the same rules;
+# a different rules version (this + the rule set) forces a full reparse.
+PARSER_VERSION = "4"
+
+# Event columns a rule can fill; everything else comes from the line row.
+VALUE_COLUMNS = ("src_id", "src_name", "dst_id", "dst_name", "item", "qty", "money", "container")
+
+
+def _ip(v: str | None) -> str:
+    return (v or "").strip().replace("**", "")
+
+
+def _ip_or_none(v: str | None) -> str | None:
+    ip = _ip(v)
+    return None if ip.lower() in ("nil", "") else ip
+
+
+# Value normalizers usable as "group | name" in a column mapping.
+NORMALIZERS = {
+    "strip": lambda v: (v or "").strip(),
+    "money": normalize_money,
+    "qty": normalize_qty,
+    "ip": _ip,
+    "ip_or_none": _ip_or_none,
+}
+
+# Built-in rules, in cascade order (the first matching rule wins).
+# keyword: a lower-case literal every matching line contains; lines without it
+# never reach the regex. columns: event column -> "group", "group | normalizer"
+# or a "{group} ..." template (groups stripped). Unmapped columns stay NULL.
+# priority (default 0): adaptive ordering only swaps rules of equal priority,
+# so a generic fallback that overlaps a specific rule gets a lower one.
+# anchor: "start" tries the pattern at the line start only (re.match).
+DEFAULT_RULES = [
+    {
+        "name": "bank_transfer",
+        "pattern": RE_BANK_TRANSFER,
+        "keyword": "transferat",
+        "anchor": "start",
+        "columns": {
+            "src_id": "src_id",
+            "src_name": "src_name | strip",
+            "dst_id": "dst_id",
+            "dst_name": "dst_name | strip",
+            "money": "amount | money",
+        },
+    },
+    {
+        "name": "bank_deposit",
+        "pattern": RE_BANK_DEPOSIT,
+        "keyword": "depozitat",
+        "anchor": "start",
+        "columns": {"dst_id": "id", "dst_name": "name | strip", "money": "amount | money"},
+    },
+    {
+        "name": "bank_withdraw",
+        "pattern": RE_BANK_WITHDRAW,
+        "keyword": "retras",
+        "anchor": "start",
+        "columns": {"src_id": "id", "src_name": "name | strip", "money": "amount | money"},
+    },
+    {
+        "name": "ofera_item",
+        "pattern": RE_OFERA_ITEM,
+        "keyword": "i-a oferit lui",
+        "anchor": "start",
+        "columns": {
+            "src_id": "src_id",
+            "src_name": "src_name | strip",
+            "dst_id": "dst_id",
+            "dst_name": "dst_name | strip",
+            "item": "item | strip",
+            "qty": "qty | qty",
+        },
+    },
+    {
+        "name": "ofera_bani",
+        "pattern": RE_OFERA_BANI,
+        "keyword": "i-a oferit lui",
+        "anchor": "start",
+        "columns": {
+            "src_id": "src_id",
+            "src_name": "src_name | strip",
+            "dst_id": "dst_id",
+            "dst_name": "dst_name | strip",
+            "money": "amount | money",
+        },
+    },
+    {
+        "name": "phone_add",
+        "pattern": RE_PHONE_ADD,
+        "keyword": "adaugati",
+        "anchor": "start",
+        "columns": {"src_id": "id", "src_name": "name | strip", "money": "amount | money"},
+    },
+    {
+        "name": "phone_remove",
+        "pattern": RE_PHONE_REMOVE,
+        "keyword": "luati",
+        "anchor": "start",
+        "columns": {"src_id": "id", "src_name": "name | strip", "money": "amount | money"},
+    },
+    {
+        "name": "drop_item",
+        "pattern": RE_DROP_ITEM,
+        "keyword": "aruncat",
+        "anchor": "start",
+        "columns": {"src_id": "id", "src_name": "name | strip", "item": "item | strip", "qty": "qty | qty"},
+    },
+    {
+        "name": "container_put",
+        "pattern": RE_CONTAINER_PUT,
+        "keyword": "[transfer]",
+        "anchor": "start",
+        "columns": {
+            "src_id": "id",
+            "src_name": "name | strip",
+            "item": "item | strip",
+            "qty": "qty | qty",
+            "container": "container | strip",
+        },
+    },
+    {
+        "name": "container_remove",
+        "pattern": RE_CONTAINER_REMOVE,
+        "keyword": "[remove]",
+        "anchor": "start",
+        "columns": {
+            "src_id": "id",
+            "src_name": "name | strip",
+            "item": "item | strip",
+            "qty": "qty | qty",
+            "container": "container | strip",
+        },
+    },
+    {
+        "name": "perchezitie_remove",
+        "pattern": RE_PERCHEZITIE,
+        "keyword": "[perchezitie]",
+        "anchor": "start",
+        "columns": {
+            "src_id": "src_id",
+            "src_name": "src_name | strip",
+            "dst_id": "dst_id",
+            "item": "item | strip",
+            "qty": "qty | qty",
+        },
+    },
+    {
+        "name": "vehicle_sell_remat",
+        "pattern": RE_VEHICLE_SELL_REMAT,
+        "keyword": "garage:",
+        "anchor": "start",
+        "columns": {
+            "src_id": "id",
+            "src_name": "name | strip",
+            "money": "amount | money",
+            "item": "{veh} [{veh_code}]",
+            "container": "garage | strip",
+        },
+    },
+    {
+        "name": "vehicle_buy_showroom",
+        "pattern": RE_VEHICLE_BUY_SHOWROOM,
+        "keyword": "achizitionat",
+        "anchor": "start",
+        "columns": {
+            "dst_id": "id",
+            "dst_name": "name | strip",
+            "money": "amount | money",
+            "item": "{veh} [{veh_code}]",
+        },
+    },
+    {
+        "name": "vehicle_sell_to_player",
+        "pattern": RE_VEHICLE_SELL_TO_PLAYER,
+        "keyword": "vandut",
+        "anchor": "start",
+        "columns": {
+            "src_name": "src_name | strip",
+            "dst_id": "dst_id",
+            "dst_name": "dst_name | strip",
+            "money": "amount | money",
+            "item": "veh_code | strip",
+        },
+    },
+    {
+        "name": "connect",
+        "pattern": RE_CONNECT,
+        "keyword": "conecteaz",
+        "columns": {"dst_id": "id", "dst_name": "name | strip", "container": "ip | ip"},
+    },
+    {
+        "name": "disconnect",
+        "pattern": RE_DISCONNECT,
+        "keyword": "deconectat",
+        "columns": {"dst_id": "id", "dst_name": "name | strip", "container": "ip | ip_or_none"},
+    },
+    {
+        "name": "deposit",
+        "event_type": "bank_deposit",
+        "pattern": RE_DEPOSIT,
+        "keyword": "depozitat",
+        "anchor": "start",
+        "priority": -10,
+        "columns": {"dst_id": "id", "dst_name": "name | strip", "money": "amount | money"},
+    },
+    {
+        "name": "withdraw",
+        "event_type": "bank_withdraw",
+        "pattern": RE_WITHDRAW,
+        "keyword": "retras",
+        "anchor": "start",
+        "priority": -10,
+        "columns": {"src_id": "id", "src_name": "name | strip", "money": "amount | money"},
+    },
+]
+
+
+@dataclass(frozen=True)
+class ParserRule:
+    name: str
+    event_type: str
+    pattern: re.Pattern
+    keyword: str | None
+    values: tuple  # one getter (match -> value) or None per VALUE_COLUMNS entry
+    priority: int = 0
+    signature: str = ""  # everything that affects the rule's output (rules version)
+    find: Callable[[str], re.Match | None] | None = None  # pattern.search, or pattern.match when anchored
+
+    def row(self, m: re.Match) -> tuple:
+        return tuple(g(m) if g else None for g in self.values)
+
+
+def _compile_pattern(spec: dict) -> re.Pattern:
+    pattern = spec["pattern"]
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for f in str(spec.get("flags", "I")).upper():
+        flags |= {"I": re.I, "X": re.X, "S": re.S, "M": re.M}[f]
+    return _compile(pattern, flags)
+
+
+def _getter(rule: str, rx: re.Pattern, spec: str):
+    spec = str(spec).strip()
+    if "{" in spec:
+        missing = set(re.findall(r"\{(\w+)\}", spec)) - set(rx.groupindex)
+        if missing:
+            raise ValueError(f"Parser rule {rule}: unknown group(s) {', '.join(sorted(missing))}")
+        return lambda m: spec.format_map({k: (v or "").strip() for k, v in m.groupdict().items()})
+
+    group, _, norm = (p.strip() for p in spec.partition("|"))
+    if group not in rx.groupindex:
+        raise ValueError(f"Parser rule {rule}: unknown group {group}")
+    if not norm:
+        return lambda m: m.group(group)
+    if norm not in NORMALIZERS:
+        raise ValueError(f"Parser rule {rule}: unknown normalizer {norm}")
+    fn = NORMALIZERS[norm]
+    return lambda m: fn(m.group(group))
+
+
+def compile_rule(spec: dict) -> ParserRule:
+    """Build a ParserRule from a rule mapping (a DEFAULT_RULES entry or a parsers.yaml rule)."""
+    name = spec.get("name")
+    if not name or not spec.get("pattern"):
+        raise ValueError(f"Parser rule needs a name and a pattern: {spec}")
+    try:
+        rx = _compile_pattern(spec)
+    except ValueError as e:
+        raise ValueError(f"Parser rule {name}: {e}") from e
+    columns = spec.get("columns") or {}
+    unknown = set(columns) - set(VALUE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Parser rule {name}: unknown column(s) {', '.join(sorted(unknown))}")
+    keyword = spec.get("keyword")
+    source = getattr(spec["pattern"], "pattern", spec["pattern"])
+    # dispatch only tries the rule on lines containing the keyword: it must be literal pattern text
+    if keyword and str(keyword).lower() not in re.sub(r"\\(\W)", r"\1", source).lower():
+        raise ValueError(f"Parser rule {name}: keyword {keyword!r} is not literal text of its pattern")
+    anchor = spec.get("anchor")
+    if anchor not in (None, "start"):
+        raise ValueError(f"Parser rule {name}: unknown anchor {anchor}")
+    return ParserRule(
+        name=name,
+        event_type=spec.get("event_type") or name,
+        pattern=rx,
+        keyword=str(keyword).lower() if keyword else None,
+        values=tuple(_getter(name, rx, columns[c]) if c in columns else None for c in VALUE_COLUMNS),
+        priority=int(spec.get("priority", 0)),
+        signature=json.dumps(
+            [name, spec.get("event_type") or name, rx.pattern, rx.flags, keyword, sorted(columns.items()), int(spec.get("priority", 0)), anchor],
+            ensure_ascii=False,
+        ),
+        find=rx.match if anchor == "start" else rx.search,
+    )
+
+
+def load_rules(path: Path | str | None = PARSERS_CONFIG) -> list[ParserRule]:
+    """
+    Built-in rules merged with parsers.yaml. A config rule with the name of a
+    built-in one overrides the fields it gives, in place (enabled: false drops
+    it); a new pattern does not inherit the built-in's keyword or anchor, which
+    only fit the old pattern. New rules are tried after the built-ins, in file order.
+    """
+    specs = {s["name"]: s for s in DEFAULT_RULES}
+    if path is not None and Path(path).exists():
+        cfg = yaml.safe_load(Path(path).read_text(encoding="utf-8")) or {}
+        for spec in cfg.get("rules") or []:
+            name = spec.get("name")
+            if spec.get("enabled", True) is False:
+                specs.pop(name, None)
+            elif name in specs:
+                base = specs[name]
+                if "pattern" in spec:
+                    base = {k: v for k, v in base.items() if k not in ("keyword", "anchor")}
+                specs[name] = {**base, **spec}
+            else:
+                specs[name] = spec
+    return [compile_rule(s) for s in specs.values()]
+
+
+# Non-ASCII characters that re.IGNORECASE treats as equal to an ASCII letter.
+_CASE_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+# False runs every rule on every line (reference behaviour, used by bench_parse.py).
+USE_DISPATCH = True
+
+
+class ParserRegistry:
+    """
+    Compiled rules plus the keyword dispatch table shared by all of them.
+
+    Lines are sorted into candidate rules with cheap substring checks on the
+    case-folded line first; only the candidates' regexes then run, in cascade
+    order, so output equals trying every rule. Rules without a keyword are
+    candidates for every line.
+
+    hits (rule name -> observed matches) switches to adaptive order: within
+    each priority level the most frequent rules are tried first. version is
+    always that of the configured order.
+    """
+
+    def __init__(self, rules: list[ParserRule], hits: dict[str, int] | None = None):
+        self.configured = list(rules)
+        self.version = sha1_text("\n".join([PARSER_VERSION, *(r.signature for r in self.configured)]))[:12]
+        self.hits = dict(hits) if hits else None
+        if self.hits:
+            pos = {r.name: i for i, r in enumerate(self.configured)}
+            rules = sorted(rules, key=lambda r: (-r.priority, -self.hits.get(r.name, 0), pos[r.name]))
+        self.rules = list(rules)
+        table: dict[str, list[int]] = {}
+        for i, r in enumerate(self.rules):
+            if r.keyword:
+                table.setdefault(r.keyword, []).append(i)
+        self.keywords = tuple((kw, tuple(ix)) for kw, ix in table.items())
+        self.always = tuple(i for i, r in enumerate(self.rules) if not r.keyword)
+        self._all = tuple(range(len(self.rules)))
+
+    def candidates(self, line: str) -> tuple[int, ...]:
+        """Indices of the rules that can possibly match line, in cascade order."""
+        if not USE_DISPATCH:
+            return self._all
+        low = line.lower() if line.isascii() else line.translate(_CASE_FOLD).lower()
+        out = set(self.always)
+        for kw, ix in self.keywords:
+            if kw in low:
+                out.update(ix)
+        return tuple(sorted(out))
+
+    def new_stats(self) -> list[list[int]]:
+        """Per-rule [hits, misses, match_ns] counters, indexed like self.rules."""
+        return [[0, 0, 0] for _ in self.rules]
+
+    def match(self, line: str, stats: list[list[int]] | None = None) -> tuple[ParserRule, re.Match] | None:
+        for i in self.candidates(line):
+            r = self.rules[i]
+            if stats is None:
+                m = r.find(line)
+            else:
+                t = time.perf_counter_ns()
+                m = r.find(line)
+                s = stats[i]
+                s[2] += time.perf_counter_ns() - t
+                s[0 if m else 1] += 1
+            if m:
+                return r, m
+        return None
+
+
+REGISTRY = ParserRegistry(load_rules())
+
+
+def candidate_patterns(line: str) -> frozenset:
+    """Patterns that can possibly match line."""
+    return frozenset(REGISTRY.rules[i].pattern for i in REGISTRY.candidates(line))
+
+
+# -------------------------
+# Audit handling
+# -------------------------
 
 SKIP_AUDIT_PREFIXES = ("Made by ", "Made by Synked")
 SKIP_AUDIT_EXACT = {"APP", "Freaks Logs", "PHOENIX LOGS", "Depunere Banca", "Retragere Banca", "Ofera Item", "Ofera Bani", "Transfera Item", "Transfer (Bancar)", "🚗 Remat", "🚘 Showroom", "💵 Telefon"}
@@ -136,583 +629,552 @@ def should_audit(line: str) -> bool:
         return False
     return True
 
-def _audit_unparsed(raw_log_id: int, ts: str | None, ts_raw: str | None, text: str):
-    AUDIT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with AUDIT_PATH.open("a", encoding="utf-8") as f:
-        f.write(f"[raw_log_id={raw_log_id}] ts={ts or 'NULL'} ts_raw={ts_raw or 'NULL'}\n")
-        f.write(text.strip() + "\n")
-        f.write("-" * 60 + "\n")
+RE_NUM = re.compile(r"\d+")
+RE_WS = re.compile(r"\s+")
+
+
+def _signature(line: str) -> str:
+    """Audit group key: whitespace collapsed, numbers replaced by <n>."""
+    s = (line or "").strip()
+    s = RE_WS.sub(" ", s)
+    s = RE_NUM.sub("<n>", s)
+    return s[:140]
+
+
+# Unparsed lines are stored (with their signature) for the audit command.
+_INSERT_UNPARSED_SQL = """
+    INSERT OR REPLACE INTO unparsed_lines(raw_log_id, line_no, ts, ts_raw, signature, text)
+    VALUES (?,?,?,?,?,?)
+"""
 
 # -------------------------
 # Parser
 # -------------------------
 
-def parse_events(silent: bool = False):
-    with get_conn() as conn:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM events")
-
-        rows = cur.execute(
-            """
-            SELECT
-                nl.raw_log_id,
-                nl.line_no,
-                nl.ts,
-                nl.ts_raw,
-                nl.timestamp_quality,
-                nl.text,
-                rl.source_file
-            FROM normalized_lines nl
-            JOIN raw_logs rl ON rl.id = nl.raw_log_id
-            ORDER BY
-                CASE WHEN nl.ts IS NULL THEN 1 ELSE 0 END,
-                nl.ts ASC,
-                nl.raw_log_id ASC,
-                nl.line_no ASC
-            """
-        ).fetchall()
-
-        inserted = 0
-        unparsed = 0
-
-        for r in rows:
-            raw_id = r["raw_log_id"]
-            line_no = r["line_no"]
-            ts = r["ts"]
-            ts_raw = r["ts_raw"]
-            ts_quality = r["timestamp_quality"]
-            source_file = r["source_file"]
-            line = (r["text"] or "").strip()
-
-            if not line:
-                continue
+# Events buffered per executemany.
+PARSE_BATCH_SIZE = 5000
 
-            # --- Transfers ---
-            m = RE_BANK_TRANSFER.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,dst_id,dst_name,
-                        money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "bank_transfer",
-                        m.group("src_id"),
-                        (m.group("src_name") or "").strip(),
-                        m.group("dst_id"),
-                        (m.group("dst_name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+# Longer lines never reach the rules (no event line comes close); they go to
+# the audit as overflow, so one pasted blob cannot stall a parse.
+MAX_LINE_CHARS = 4096
+OVERFLOW_SIGNATURE = "<overflow>"
 
-            # --- Deposits / Withdraws ---
-            m = RE_BANK_DEPOSIT.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        dst_id,dst_name,money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "bank_deposit",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+# Natural key of an event, with ts and event_type.
+FINGERPRINT_COLUMNS = ("src_id", "dst_id", "item", "qty", "money", "container")
+_FINGERPRINT_INDEX = tuple(VALUE_COLUMNS.index(c) for c in FINGERPRINT_COLUMNS)
 
-            m = RE_BANK_WITHDRAW.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "bank_withdraw",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
 
-            # --- Ofera ---
-            m = RE_OFERA_ITEM.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,dst_id,dst_name,
-                        item,qty,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "ofera_item",
-                        m.group("src_id"),
-                        (m.group("src_name") or "").strip(),
-                        m.group("dst_id"),
-                        (m.group("dst_name") or "").strip(),
-                        (m.group("item") or "").strip(),
-                        normalize_qty(m.group("qty")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+def event_fingerprint(ts: str | None, event_type: str, values: tuple, raw_id: int, line_no: int) -> str:
+    """
+    Fingerprint of one in-game action: (ts, event_type, src_id, dst_id, item,
+    qty, money, container), values in VALUE_COLUMNS order. An untimed event
+    cannot be told apart from a genuine repeat, so its key includes its own
+    line and it is never merged.
+    """
+    key = (ts, event_type, *(values[i] for i in _FINGERPRINT_INDEX))
+    if ts is None:
+        key += (raw_id, line_no)
+    return sha1_text(repr(key))
 
-            m = RE_OFERA_BANI.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,dst_id,dst_name,
-                        money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "ofera_bani",
-                        m.group("src_id"),
-                        (m.group("src_name") or "").strip(),
-                        m.group("dst_id"),
-                        (m.group("dst_name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
 
-            # --- Phone ---
-            m = RE_PHONE_ADD.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "phone_add",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+# Highest occurrence number per fingerprint among a raw log's append chain
+# (?1: JSON list of raw_log_ids, ?2: JSON list of fingerprints).
+_CHAIN_OCCURRENCES_SQL = """
+    SELECT fingerprint, MAX(occurrence)
+    FROM event_occurrences
+    WHERE fingerprint IN (SELECT value FROM json_each(?2))
+      AND raw_log_id IN (SELECT value FROM json_each(?1))
+    GROUP BY fingerprint
+"""
 
-            m = RE_PHONE_REMOVE.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,money,raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "phone_remove",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+_INSERT_OCCURRENCE_SQL = """
+    INSERT OR REPLACE INTO event_occurrences(fingerprint, occurrence, raw_log_id, line_no)
+    VALUES (?,?,?,?)
+"""
 
-            # --- Items ---
-            m = RE_DROP_ITEM.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,item,qty,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "drop_item",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        (m.group("item") or "").strip(),
-                        normalize_qty(m.group("qty")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+# Upsert: a line whose (fingerprint, occurrence) already has an event only
+# adds its event_occurrences row.
+_INSERT_EVENT_SQL = f"""
+    INSERT INTO events(
+        ts,ts_raw,timestamp_quality,event_type,
+        {",".join(VALUE_COLUMNS)},
+        raw_log_id,line_no,source_file,fingerprint,occurrence
+    )
+    VALUES ({",".join(["?"] * (len(VALUE_COLUMNS) + 9))})
+    ON CONFLICT(fingerprint, occurrence) DO NOTHING
+"""
 
-            m = RE_CONTAINER_PUT.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,item,qty,container,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "container_put",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        (m.group("item") or "").strip(),
-                        normalize_qty(m.group("qty")),
-                        (m.group("container") or "").strip(),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
 
-            m = RE_CONTAINER_REMOVE.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,item,qty,container,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "container_remove",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        (m.group("item") or "").strip(),
-                        normalize_qty(m.group("qty")),
-                        (m.group("container") or "").strip(),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+def iter_parsed(rows, source_file: str | None, registry: ParserRegistry | None = None, stats=None):
+    """
+    Run the parser rules over normalized line rows of one raw log. Rows are
+    (raw_log_id, line_no, ts, ts_raw, timestamp_quality, text) sequences, as
+    stored in normalized_lines or yielded by the normalizer. Yields
+    (event_row, None) for matched lines and (None, unparsed_lines row) for
+    unmatched lines that belong in the audit. stats (registry.new_stats())
+    collects per-rule hits, misses and match time. Lines over MAX_LINE_CHARS
+    are not matched and audit under the OVERFLOW_SIGNATURE group. Event rows
+    end with their event_fingerprint.
+    """
+    registry = registry or REGISTRY
+    for raw_id, line_no, ts, ts_raw, ts_quality, text in rows:
+        line = (text or "").strip()
 
-            # --- Perchezitie (robbery/search) ---
-            m = RE_PERCHEZITIE.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        src_id,src_name,dst_id,item,qty,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "perchezitie_remove",
-                        m.group("src_id"),
-                        (m.group("src_name") or "").strip(),
-                        m.group("dst_id"),
-                        (m.group("item") or "").strip(),
-                        normalize_qty(m.group("qty")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+        if not line:
+            continue
 
-            # --- Vehicles ---
-            m = RE_VEHICLE_SELL_REMAT.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts, ts_raw, timestamp_quality, event_type,
-                        src_id, src_name,
-                        money, item, container,
-                        raw_log_id, line_no, source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "vehicle_sell_remat",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        f"{(m.group('veh') or '').strip()} [{(m.group('veh_code') or '').strip()}]",
-                        (m.group("garage") or "").strip(),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+        if len(line) > MAX_LINE_CHARS:
+            yield None, (raw_id, line_no, ts, ts_raw, OVERFLOW_SIGNATURE, line)
+            continue
 
-            m = RE_VEHICLE_BUY_SHOWROOM.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts, ts_raw, timestamp_quality, event_type,
-                        dst_id, dst_name,
-                        money, item,
-                        raw_log_id, line_no, source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "vehicle_buy_showroom",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        f"{(m.group('veh') or '').strip()} [{(m.group('veh_code') or '').strip()}]",
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+        hit = registry.match(line, stats)
+        if hit:
+            rule, m = hit
+            values = rule.row(m)
+            fp = event_fingerprint(ts, rule.event_type, values, raw_id, line_no)
+            yield (ts, ts_raw, ts_quality, rule.event_type, *values, raw_id, line_no, source_file, fp), None
+        elif should_audit(line):
+            yield None, (raw_id, line_no, ts, ts_raw, _signature(line), line)
 
-            m = RE_VEHICLE_SELL_TO_PLAYER.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts, ts_raw, timestamp_quality, event_type,
-                        src_id, src_name,
-                        dst_id, dst_name,
-                        money, item,
-                        raw_log_id, line_no, source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "vehicle_sell_to_player",
-                        None,
-                        (m.group("src_name") or "").strip(),
-                        m.group("dst_id"),
-                        (m.group("dst_name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        (m.group("veh_code") or "").strip(),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
 
-            # --- Connect / disconnect ---
-            m = RE_CONNECT.search(line)
-            if m:
-                ip = (m.group("ip") or "").strip().replace("**", "")
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        dst_id,dst_name,container,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "connect",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        ip,
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+def _append_chain(cur, raw_id: int) -> list[int]:
+    """raw_id and the raw logs it was appended to (a tail continues its parent's numbering)."""
+    ids = []
+    while raw_id:
+        ids.append(raw_id)
+        r = cur.execute("SELECT parent_id FROM raw_logs WHERE id=?", (raw_id,)).fetchone()
+        raw_id = r[0] if r else None
+    return ids
 
-            m = RE_DISCONNECT.search(line)
-            if m:
-                ip_raw = (m.group("ip") or "").strip().replace("**", "")
-                ip = None if ip_raw.lower() in ("nil", "") else ip_raw
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts,ts_raw,timestamp_quality,event_type,
-                        dst_id,dst_name,container,
-                        raw_log_id,line_no,source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "disconnect",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        ip,
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
 
-            m = RE_DEPOSIT.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts, ts_raw, timestamp_quality, event_type,
-                        dst_id, dst_name, money,
-                        raw_log_id, line_no, source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "bank_deposit",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+def _write_events(cur, pending: list[tuple]) -> int:
+    """
+    Number and upsert a batch of iter_parsed event rows. The k-th event with a
+    fingerprint in a raw log (append chain included) is occurrence k: repeats
+    within one export stay apart, while the same action in an overlapping
+    export gets the same (fingerprint, occurrence) and merges. The added
+    events' sightings go into identities, their sources into entities and
+    their players into event_participants. Returns the events added.
+    """
+    counts: dict[int, dict[str, int]] = {}
+    for raw_id in {e[-4] for e in pending}:
+        fps = sorted({e[-1] for e in pending if e[-4] == raw_id})
+        chain = _append_chain(cur, raw_id)
+        counts[raw_id] = dict(cur.execute(_CHAIN_OCCURRENCES_SQL, (json.dumps(chain), json.dumps(fps))).fetchall())
 
-            m = RE_WITHDRAW.search(line)
-            if m:
-                cur.execute(
-                    """
-                    INSERT INTO events(
-                        ts, ts_raw, timestamp_quality, event_type,
-                        src_id, src_name, money,
-                        raw_log_id, line_no, source_file
-                    )
-                    VALUES (?,?,?,?,?,?,?,?,?,?)
-                    """,
-                    (
-                        ts,
-                        ts_raw,
-                        ts_quality,
-                        "bank_withdraw",
-                        m.group("id"),
-                        (m.group("name") or "").strip(),
-                        normalize_money(m.group("amount")),
-                        raw_id,
-                        line_no,
-                        source_file,
-                    ),
-                )
-                inserted += 1
-                continue
+    rows = []
+    occurrences = []
+    for e in pending:
+        raw_id, line_no, fp = e[-4], e[-3], e[-1]
+        seen = counts[raw_id]
+        n = seen[fp] = seen.get(fp, 0) + 1
+        rows.append((*e, n))
+        occurrences.append((fp, n, raw_id, line_no))
+    last_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+    cur.executemany(_INSERT_OCCURRENCE_SQL, occurrences)
+    cur.executemany(_INSERT_EVENT_SQL, rows)
+    inserted = cur.rowcount
+    if inserted:
+        added = cur.execute(f"SELECT {IDENTITY_EVENT_COLUMNS} FROM events WHERE id > ?", (last_id,)).fetchall()
+        record_sightings(cur, added)
+        record_entities(cur, last_id)
+        cur.execute(PARTICIPANTS_SQL, (last_id, last_id))
+    return inserted
 
-            # --- Audit ---
-            if should_audit(line):
-                _audit_unparsed(raw_id, ts, ts_raw, line)
-                unparsed += 1
 
-        conn.commit()
+def write_parsed(cur, parsed) -> tuple[int, int]:
+    """
+    Insert iter_parsed output (events, unparsed lines) in executemany batches.
+    Returns (events added, unparsed lines); lines merged into an existing event
+    only add an event_occurrences row.
+    """
+    inserted = 0
+    unparsed = 0
+    pending: list[tuple] = []
+    misses: list[tuple] = []
+
+    for event, miss in parsed:
+        if event is not None:
+            pending.append(event)
+            if len(pending) >= PARSE_BATCH_SIZE:
+                inserted += _write_events(cur, pending)
+                pending.clear()
+        else:
+            misses.append(miss)
+            unparsed += 1
+            if len(misses) >= PARSE_BATCH_SIZE:
+                cur.executemany(_INSERT_UNPARSED_SQL, misses)
+                misses.clear()
+
+    if pending:
+        inserted += _write_events(cur, pending)
+    if misses:
+        cur.executemany(_INSERT_UNPARSED_SQL, misses)
+
+    return inserted, unparsed
+
+
+def parse_rows(cur, rows, source_file: str | None, registry: ParserRegistry | None = None, stats=None) -> tuple[int, int]:
+    """
+    Parse normalized line rows of one raw log and insert matched events.
+    Returns (events inserted, unparsed lines).
+    """
+    return write_parsed(cur, iter_parsed(rows, source_file, registry, stats))
+
+
+_RAW_SELECT = "SELECT id, source_file, n_chunks, parent_id FROM raw_logs"
+
+
+def record_parse_state(conn, watermarks: dict[int, int], registry: ParserRegistry | None = None):
+    """Store the last parsed line_no per raw log, tied to its current normalize_state."""
+    registry = registry or REGISTRY
+    now = utc_now_iso()
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO parse_state(raw_log_id, rules_version, last_line_no, normalized_at, parsed_at)
+        VALUES (?, ?, ?, (SELECT normalized_at FROM normalize_state WHERE raw_log_id=?), ?)
+        """,
+        [(raw_id, registry.version, last, raw_id, now) for raw_id, last in watermarks.items()],
+    )
+
+
+def record_parser_stats(conn, registry: ParserRegistry, stats: list[list[int]]):
+    """Add one run's per-rule counters (registry.new_stats() layout) to parser_stats."""
+    now = utc_now_iso()
+    conn.executemany(
+        """
+        INSERT INTO parser_stats(rule, event_type, hits, misses, match_ns, updated_at)
+        VALUES (?,?,?,?,?,?)
+        ON CONFLICT(rule) DO UPDATE SET
+            event_type=excluded.event_type,
+            hits=hits + excluded.hits,
+            misses=misses + excluded.misses,
+            match_ns=match_ns + excluded.match_ns,
+            updated_at=excluded.updated_at
+        """,
+        [(r.name, r.event_type, *s, now) for r, s in zip(registry.rules, stats) if any(s)],
+    )
+
+
+def adaptive_registry(conn) -> ParserRegistry:
+    """REGISTRY reordered by the hit counts in parser_stats (same rules, same version)."""
+    hits = {r["rule"]: r["hits"] for r in conn.execute("SELECT rule, hits FROM parser_stats")}
+    return ParserRegistry(REGISTRY.configured, hits) if hits else REGISTRY
+
+
+# Tables filled by the parser; cleared together before (re)parsing.
+PARSED_TABLES = (
+    "events",
+    "event_occurrences",
+    "event_participants",
+    "unparsed_lines",
+    "identities",
+    "identity_clusters",
+    "entities",
+)
+
+
+def clear_parsed(cur, raw_ids: list[int] | None = None):
+    """
+    Delete parser output: all of it, or that of the given raw logs. An event
+    that another raw log also contains is kept and moved to its next occurrence;
+    the sightings of deleted events are taken out of identities and entities.
+    """
+    if raw_ids is None:
+        for table in PARSED_TABLES:
+            cur.execute(f"DELETE FROM {table}")
+        return
+    for i in range(0, len(raw_ids), 500):
+        part = list(raw_ids[i : i + 500])
+        qs = ",".join(["?"] * len(part))
+        # raw logs that were never parsed (new watcher / ingest data) have nothing to clear
+        part = [
+            r[0]
+            for r in cur.execute(
+                f"SELECT raw_log_id FROM parse_state WHERE raw_log_id IN ({qs}) "
+                f"UNION SELECT raw_log_id FROM events WHERE raw_log_id IN ({qs})",
+                part + part,
+            )
+        ]
+        if not part:
+            continue
+        qs = ",".join(["?"] * len(part))
+        cur.execute(f"DELETE FROM unparsed_lines WHERE raw_log_id IN ({qs})", part)
+        cur.execute(f"DELETE FROM event_occurrences WHERE raw_log_id IN ({qs})", part)
+        orphaned = f"""
+            FROM events
+            WHERE raw_log_id IN ({qs})
+              AND NOT EXISTS (
+                SELECT 1 FROM event_occurrences o
+                WHERE o.fingerprint = events.fingerprint AND o.occurrence = events.occurrence
+              )
+        """
+        # one pass over the orphans serves both identities and entities
+        gone = cur.execute(f"SELECT {IDENTITY_EVENT_COLUMNS} {orphaned}", part).fetchall()
+        record_sightings(cur, gone, sign=-1)
+        cur.execute(f"DELETE FROM event_participants WHERE event_id IN (SELECT id {orphaned})", part)
+        cur.execute(f"DELETE {orphaned}", part)
+        refresh_entities(cur, [(r["src_id"], r["src_name"]) for r in gone])
+        cur.execute(
+            f"""
+            UPDATE events SET (raw_log_id, line_no, source_file) = (
+                SELECT o.raw_log_id, o.line_no, r.source_file
+                FROM event_occurrences o JOIN raw_logs r ON r.id = o.raw_log_id
+                WHERE o.fingerprint = events.fingerprint AND o.occurrence = events.occurrence
+                ORDER BY o.raw_log_id, o.line_no
+                LIMIT 1
+            )
+            WHERE raw_log_id IN ({qs})
+            """,
+            part,
+        )
+
+
+def _parse_raws(
+    conn,
+    raws,
+    after: dict[int, int] | None = None,
+    workers: int = 1,
+    registry: ParserRegistry | None = None,
+) -> tuple[int, int]:
+    """
+    Parse raw logs one after another, each in line order, starting after the
+    watermark in after (default: from the first line). Event ids follow
+    (raw_log_id, line_no); every reader orders by (ts, id), which gives the
+    same result as a global timestamp sort without doing one.
+
+    workers > 1 parses line ranges of the raw logs (PARSE_SHARD_LINES each) in a
+    process pool; results are written by this connection in (raw_log_id,
+    line_no) order, so event ids do not depend on the worker count.
+    """
+    registry = registry or REGISTRY
+    cur = conn.cursor()
+    inserted = unparsed = 0
+    after = after or {}
+    watermarks: dict[int, int] = {}
+    stats = registry.new_stats()
+
+    def parse_inline(raw):
+        # streams the raw log through parse_rows (bounded batches, flat memory)
+        watermarks[raw["id"]] = after.get(raw["id"], 0)
+
+        def rows():
+            for row in iter_line_rows(conn, raw, after_line_no=after.get(raw["id"], 0)):
+                watermarks[raw["id"]] = row[1]
+                yield row
+
+        return parse_rows(cur, rows(), raw["source_file"], registry, stats)
+
+    if workers > 1:
+        raws = [dict(r) for r in raws]
+        for raw in raws:
+            watermarks[raw["id"]] = after.get(raw["id"], 0)
+        for (raw, _lo, upto), result in _iter_shards(conn, raws, after, workers, registry):
+            if result is None:
+                n, u = parse_inline(raw)
+            else:
+                parsed, last, shard_stats = result
+                n, u = write_parsed(cur, parsed)
+                if last is not None:
+                    watermarks[raw["id"]] = last
+                for s, t in zip(stats, shard_stats):
+                    s[0] += t[0]
+                    s[1] += t[1]
+                    s[2] += t[2]
+            inserted += n
+            unparsed += u
+        record_parse_state(conn, watermarks)
+        record_parser_stats(conn, registry, stats)
+        return inserted, unparsed
+
+    for raw in raws:
+        n, u = parse_inline(raw)
+        inserted += n
+        unparsed += u
+    record_parse_state(conn, watermarks)
+    record_parser_stats(conn, registry, stats)
+    return inserted, unparsed
+
 
+# -------------------------
+# Parallel parse (worker processes)
+# -------------------------
+
+# Lines per parallel parse task: a large raw log is split into line ranges, so
+# a worker and the writer each hold at most this many parsed lines of it.
+PARSE_SHARD_LINES = 50_000
+
+_worker_conn = None
+_worker_registry = None
+
+
+def _init_worker(db_path: str, hits: dict[str, int] | None):
+    global _worker_conn, _worker_registry
+    app_db.DB_PATH = Path(db_path)
+    _worker_conn = sqlite3.connect(db_path, timeout=30)
+    _configure_conn(_worker_conn)
+    # same rule order as the parent (rules hold lambdas, so they are rebuilt, not pickled)
+    _worker_registry = ParserRegistry(REGISTRY.configured, hits)
+
+
+def _parse_shard(raw: dict, after: int, upto: int) -> tuple[list[tuple], int | None, list[list[int]]]:
+    """
+    Parse lines after < line_no <= upto of one raw log (a shard) in a worker.
+    Returns (iter_parsed output, last line_no read or None, per-rule stats).
+    """
+    last = None
+    stats = _worker_registry.new_stats()
+
+    def rows():
+        nonlocal last
+        for row in iter_line_rows(_worker_conn, raw, after_line_no=after, upto_line_no=upto):
+            last = row[1]
+            yield row
+
+    parsed = list(iter_parsed(rows(), raw["source_file"], _worker_registry, stats))
+    return parsed, last, stats
+
+
+def _plan_shards(conn, raws, after: dict[int, int]):
+    """
+    (raw, after, upto) tasks in write order: PARSE_SHARD_LINES line ranges of
+    each raw log's stored lines. A raw log a lines-free build did not store
+    gets one (raw, after, None) task: it is replayed by the writer itself.
+    """
+    for raw in raws:
+        start = after.get(raw["id"], 0)
+        if not lines_kept(conn, raw["id"]):
+            yield raw, start, None
+            continue
+        end = conn.execute("SELECT MAX(line_no) FROM normalized_lines WHERE raw_log_id=?", (raw["id"],)).fetchone()[0]
+        for lo in range(start, end or 0, PARSE_SHARD_LINES):
+            yield raw, lo, min(lo + PARSE_SHARD_LINES, end)
+
+
+def _iter_shards(conn, raws, after: dict[int, int], workers: int, registry: ParserRegistry):
+    """
+    Yield (task, _parse_shard result) in task order, with a bounded window of
+    tasks ahead of the writer; tasks left to the writer yield a None result.
+    """
+    tasks = _plan_shards(conn, raws, after)
+    window: deque = deque()
+    initargs = (str(app_db.DB_PATH), registry.hits)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+
+        def submit() -> None:
+            task = next(tasks, None)
+            if task is not None:
+                raw, lo, upto = task
+                window.append((task, pool.submit(_parse_shard, raw, lo, upto) if upto is not None else None))
+
+        for _ in range(workers * 4):
+            submit()
+        while window:
+            task, future = window.popleft()
+            submit()
+            yield task, future.result() if future is not None else None
+
+
+def _report(inserted: int, unparsed: int, silent: bool, full: bool = True):
     if not silent:
-        console.print(Panel(f"Events inserted: {inserted}\nUnparsed lines: {unparsed}", title="EVENT PARSE"))
+        mode = "full" if full else "incremental"
+        console.print(
+            Panel(f"Mode: {mode}\nEvents inserted: {inserted}\nUnparsed lines: {unparsed}", title="EVENT PARSE")
+        )
+
+
+def needs_full_parse(conn) -> bool:
+    """True when stored events came from another rule set (or predate parse_state)."""
+    stale = conn.execute(
+        "SELECT 1 FROM parse_state WHERE rules_version != ? LIMIT 1", (REGISTRY.version,)
+    ).fetchone()
+    if stale:
+        return True
+    has_state = conn.execute("SELECT 1 FROM parse_state LIMIT 1").fetchone()
+    return not has_state and conn.execute("SELECT 1 FROM events LIMIT 1").fetchone() is not None
+
+
+# Raw logs with lines past their watermark, or whose lines were re-normalized
+# since they were parsed (those start over: fresh = 1).
+_PENDING_SQL = """
+    SELECT r.id, r.source_file, r.n_chunks, r.parent_id,
+           p.last_line_no,
+           (p.raw_log_id IS NULL OR p.normalized_at IS NOT s.normalized_at) AS fresh
+    FROM raw_logs r
+    LEFT JOIN normalize_state s ON s.raw_log_id = r.id
+    LEFT JOIN parse_state p ON p.raw_log_id = r.id
+    WHERE p.raw_log_id IS NULL
+       OR p.normalized_at IS NOT s.normalized_at
+       OR p.last_line_no < COALESCE(
+            s.line_count,
+            (SELECT MAX(n.line_no) FROM normalized_lines n WHERE n.raw_log_id = r.id),
+            0
+          )
+    ORDER BY r.id ASC
+"""
+
+
+def parse_events(silent: bool = False, full: bool = False, workers: int = 1, adaptive: bool = False):
+    """
+    Parse normalized lines into events.
+
+    Incremental by default: only lines past each raw log's parse_state
+    watermark are parsed, so existing events keep their ids. A raw log whose
+    lines were re-normalized is reparsed on its own. Everything is reparsed
+    (clear_parsed) with full=True, when the parser rules version
+    differs from the one the stored events were parsed with, or when every
+    raw log has to start over anyway (e.g. after normalize --full).
+
+    workers > 1 runs the rules in that many processes, one line range (PARSE_SHARD_LINES) per task.
+    adaptive=True tries rules in the order of their parser_stats hit counts
+    (within a priority level); the events are the same, the regex work is not.
+    Every run adds its per-rule counters to parser_stats (a full parse resets them).
+    """
+    workers = int(workers or 1)
+    with get_conn() as conn:
+        cur = conn.cursor()
+        registry = adaptive_registry(conn) if adaptive else REGISTRY
+        full = full or needs_full_parse(conn)
+        if not full:
+            pending = cur.execute(_PENDING_SQL).fetchall()
+            fresh = [r["id"] for r in pending if r["fresh"]]
+            # every raw log starts over (e.g. after normalize --full): one clear, not per-log deletes
+            full = bool(fresh) and len(fresh) == cur.execute("SELECT COUNT(*) FROM raw_logs").fetchone()[0]
+        if full:
+            clear_parsed(cur)
+            cur.execute("DELETE FROM parse_state")
+            cur.execute("DELETE FROM parser_stats")
+            raws = iter_fetchmany(conn.execute(_RAW_SELECT + " ORDER BY id ASC"))
+            inserted, unparsed = _parse_raws(conn, raws, workers=workers, registry=registry)
+        else:
+            clear_parsed(cur, fresh)
+            after = {r["id"]: r["last_line_no"] for r in pending if not r["fresh"]}
+            inserted, unparsed = _parse_raws(conn, pending, after, workers=workers, registry=registry)
+
+        conn.commit()
+
+    _report(inserted, unparsed, silent, full)
+    return inserted
+
+
+def parse_raw_logs(raw_ids: list[int], silent: bool = False):
+    """
+    Parse only the normalized lines of the given raw logs (appending events).
+    Used for newly loaded data; existing events keep their ids.
+    """
+    if not raw_ids:
+        return 0
+    with get_conn() as conn:
+        cur = conn.cursor()
+        qs = ",".join(["?"] * len(raw_ids))
+        clear_parsed(cur, list(raw_ids))
+
+        raws = iter_fetchmany(conn.execute(_RAW_SELECT + f" WHERE id IN ({qs}) ORDER BY id ASC", list(raw_ids)))
+        inserted, unparsed = _parse_raws(conn, raws)
+
+        conn.commit()
+
+    _report(inserted, unparsed, silent, full=False)
     return inserted
 
 
@@ -720,36 +1182,13 @@ def parse_events(silent: bool = False):
 # Public helpers (audit)
 # -------------------------
 
-KNOWN_PATTERNS = [
-    RE_BANK_TRANSFER,
-    RE_BANK_DEPOSIT,
-    RE_BANK_WITHDRAW,
-    RE_OFERA_ITEM,
-    RE_OFERA_BANI,
-    RE_PHONE_ADD,
-    RE_PHONE_REMOVE,
-    RE_DROP_ITEM,
-    RE_CONTAINER_PUT,
-    RE_CONTAINER_REMOVE,
-    RE_PERCHEZITIE,
-    RE_VEHICLE_SELL_REMAT,
-    RE_VEHICLE_BUY_SHOWROOM,
-    RE_VEHICLE_SELL_TO_PLAYER,
-    RE_CONNECT,
-    RE_DISCONNECT,
-    RE_DEPOSIT,
-    RE_WITHDRAW,
-]
+# Cascade order; includes rules added through parsers.yaml.
+KNOWN_PATTERNS = [r.pattern for r in REGISTRY.rules]
 
 
 def matches_any_known_pattern(line: str) -> bool:
     s = (line or "").strip()
     if not s:
         return False
-    for rx in KNOWN_PATTERNS:
-        try:
-            if rx.search(s):
-                return True
-        except Exception:
-            continue
-    return False
+    # the parser's own matching (keyword dispatch, anchors), so audit and parse agree
+    return REGISTRY.match(s) is not None
@@ -0,0 +1,86 @@
+from rich.console import Console
+from rich.panel import Panel
+
+from .db import EVENTS_INDEXES, bulk_load, create_indexes, drop_indexes, get_conn
+from .normalize import NORMALIZE_BATCH_SIZE, has_current_state, normalize_all, normalize_incremental, rebuild_lines
+from .parse import REGISTRY, clear_parsed, parse_events, parse_rows, record_parse_state, record_parser_stats
+
+console = Console()
+
+
+def build_all(
+    silent: bool = False,
+    keep_lines: bool = True,
+    dedupe: bool = True,
+    batch_size: int = NORMALIZE_BATCH_SIZE,
+) -> dict:
+    """
+    Fused full rebuild: raw evidence -> noise filter -> timestamp anchoring ->
+    event regexes -> events, as one generator chain in one transaction.
+
+    Each slice of normalized rows is parsed while it is still in memory, so
+    events never wait for normalized_lines to be written, read back and sorted.
+    keep_lines=False does not store normalized_lines at all (they are only
+    needed for audit and line context); later parses replay those raw logs.
+    """
+    totals = {"parsed": 0, "unparsed": 0}
+
+    with get_conn() as conn, bulk_load(conn):
+        cur = conn.cursor()
+        clear_parsed(cur)
+        drop_indexes(cur, EVENTS_INDEXES)
+        cur.execute("DELETE FROM parse_state")
+        cur.execute("DELETE FROM parser_stats")
+        stats = REGISTRY.new_stats()
+        sources = {r["id"]: r["source_file"] for r in cur.execute("SELECT id, source_file FROM raw_logs")}
+        watermarks = dict.fromkeys(sources, 0)
+
+        def parse_batch(cur, rows):
+            # a slice may span raw logs; parse_rows takes one source file at a time
+            start = 0
+            for i in range(1, len(rows) + 1):
+                if i == len(rows) or rows[i][0] != rows[start][0]:
+                    n, u = parse_rows(cur, rows[start:i], sources[rows[start][0]], stats=stats)
+                    totals["parsed"] += n
+                    totals["unparsed"] += u
+                    watermarks[rows[start][0]] = rows[i - 1][1]
+                    start = i
+
+        normalized, skipped = rebuild_lines(
+            conn, dedupe=dedupe, batch_size=batch_size, keep_lines=keep_lines, on_batch=parse_batch
+        )
+        record_parse_state(conn, watermarks)
+        record_parser_stats(conn, REGISTRY, stats)
+        create_indexes(cur, EVENTS_INDEXES)
+        conn.commit()
+
+    stats = {"normalized": normalized, "parsed": totals["parsed"], "lines_kept": keep_lines}
+    if not silent:
+        kept = "stored" if keep_lines else "not stored"
+        console.print(
+            Panel(
+                f"Normalized lines: {normalized} ({kept})\nDuplicate block lines skipped: {skipped}\n"
+                f"Events inserted: {totals['parsed']}\nUnparsed lines: {totals['unparsed']}",
+                title="BUILD",
+            )
+        )
+    return stats
+
+
+def build(silent: bool = False, full: bool = False, keep_lines: bool = True, workers: int = 1) -> dict:
+    """
+    The build command. A full (or lines-free) build, or one with nothing
+    reusable, is the fused build_all; otherwise only new raw logs are
+    normalized before events are parsed.
+
+    workers > 1 parses in a process pool instead of fusing: a full build then
+    normalizes everything first and parses all raw logs in parallel
+    (lines-free builds stay fused, single process).
+    """
+    workers = int(workers or 1)
+    full = full or not has_current_state()
+    if not keep_lines or (full and workers <= 1):
+        return {**build_all(silent=silent, keep_lines=keep_lines), "full": True}
+    normalized = normalize_all(silent=silent) if full else normalize_incremental(silent=silent)
+    parsed = parse_events(silent=silent, full=full, workers=workers)
+    return {"normalized": normalized, "parsed": parsed, "lines_kept": True, "full": full}
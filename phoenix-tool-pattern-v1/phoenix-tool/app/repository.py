@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from collections.abc import Iterable
 
-from .db import get_conn
+from .db import UNTIMED_TS_KEY, get_conn, trigram_phrase
 from .models import Event, IdentityRecord, PartnerStat
 
 
@@ -48,12 +48,46 @@ def _row_to_event(row) -> Event:
 
 
 def _fetch_events(sql: str, params: Iterable[object]) -> list[Event]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(sql, list(params)).fetchall()
     return [_row_to_event(row) for row in rows]
 
 
+def _participant_events(
+    pid: str,
+    ts_from: str | None = None,
+    ts_to: str | None = None,
+    roles: tuple[str, ...] | None = None,
+) -> tuple[str, list[object]]:
+    """
+    FROM/WHERE over one player's events through event_participants (p) joined
+    to events (e): an index range on (player_id, ts_key), already in timeline
+    order, instead of an src_id/dst_id OR scan. roles limits it to src/dst/both.
+    """
+    where = ["p.player_id = ?"]
+    params: list[object] = [pid]
+    if roles:
+        where.append(f"p.role IN ({','.join(['?'] * len(roles))})")
+        params.extend(roles)
+    if ts_from or ts_to:
+        where.append("p.ts_key < ?")
+        params.append(UNTIMED_TS_KEY)
+    if ts_from:
+        where.append("p.ts_key >= ?")
+        params.append(ts_from)
+    if ts_to:
+        where.append("p.ts_key <= ?")
+        params.append(ts_to)
+    sql = "FROM event_participants p JOIN events e ON e.id = p.event_id WHERE " + " AND ".join(where)
+    return sql, params
+
+
+# Participant rows in (ts IS NULL, ts, id) order.
+_TIMELINE_ORDER = " ORDER BY p.ts_key ASC, p.event_id ASC"
+_EVENT_COLUMNS_E = ", ".join(f"e.{c}" for c in EVENT_COLUMNS)
+
+
 def build_search_query(
     ids=None,
     between_ids=None,
@@ -64,51 +98,73 @@ def build_search_query(
     max_money=None,
     ts_from: str | None = None,
     ts_to: str | None = None,
+    ordered: bool = False,
 ):
+    """
+    SELECT over events (e) for the search filters, in timeline order if
+    ordered. A search for one player (ids=[pid], or between_ids) scans that
+    player's event_participants rows (p), which come in timeline order; several
+    ids are matched through event_participants as well.
+    """
     where = []
     params: list[object] = []
 
-    if ids:
+    between = list(between_ids) if between_ids and len(between_ids) == 2 else None
+    driver = ids[0] if ids and len(ids) == 1 else between[0] if between else None
+    if driver is not None:
+        source, params = _participant_events(driver, ts_from, ts_to)
+        ts_from = ts_to = None
+        if event_type:
+            source += " AND p.event_type = ?"
+            params.append(event_type)
+            event_type = None
+        order = _TIMELINE_ORDER
+    else:
+        source = "FROM events e"
+        order = " ORDER BY (e.ts IS NULL) ASC, e.ts ASC, e.id ASC"
+
+    if ids and len(ids) > 1:
         qs = ",".join(["?"] * len(ids))
-        where.append(f"(src_id IN ({qs}) OR dst_id IN ({qs}))")
-        params.extend(ids)
+        where.append(f"e.id IN (SELECT event_id FROM event_participants WHERE player_id IN ({qs}))")
         params.extend(ids)
 
-    if between_ids and len(between_ids) == 2:
-        a, b = between_ids
-        where.append("((src_id=? AND dst_id=?) OR (src_id=? AND dst_id=?))")
+    if between:
+        a, b = between
+        where.append("((e.src_id=? AND e.dst_id=?) OR (e.src_id=? AND e.dst_id=?))")
         params.extend([a, b, b, a])
 
     if name:
-        where.append("(src_name LIKE ? OR dst_name LIKE ?)")
+        where.append("(e.src_name LIKE ? OR e.dst_name LIKE ?)")
         params.extend([f"%{name}%", f"%{name}%"])
 
     if item:
-        where.append("item LIKE ?")
+        where.append("e.item LIKE ?")
         params.append(f"%{item}%")
 
     if event_type:
-        where.append("event_type = ?")
+        where.append("e.event_type = ?")
         params.append(event_type)
 
     if min_money is not None:
-        where.append("money >= ?")
+        where.append("e.money >= ?")
         params.append(min_money)
 
     if max_money is not None:
-        where.append("money <= ?")
+        where.append("e.money <= ?")
         params.append(max_money)
 
     if ts_from:
-        where.append("ts >= ?")
+        where.append("e.ts >= ?")
         params.append(ts_from)
     if ts_to:
-        where.append("ts <= ?")
+        where.append("e.ts <= ?")
         params.append(ts_to)
 
-    sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events"
+    sql = f"SELECT {_EVENT_COLUMNS_E} {source}"
     if where:
-        sql += " WHERE " + " AND ".join(where)
+        sql += (" AND " if driver is not None else " WHERE ") + " AND ".join(where)
+    if ordered:
+        sql += order
 
     return sql, params
 
@@ -136,8 +192,9 @@ def search_events(
         max_money=max_money,
         ts_from=ts_from,
         ts_to=ts_to,
+        ordered=True,
     )
-    sql += " ORDER BY (ts IS NULL) ASC, ts ASC, id ASC LIMIT ? OFFSET ?"
+    sql += " LIMIT ? OFFSET ?"
     params.append(int(limit))
     params.append(int(offset))
     return _fetch_events(sql, params)
@@ -167,24 +224,15 @@ def count_search_events(
     )
     count_sql = "SELECT COUNT(*) c FROM (" + sql + ")"
 
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         count = cur.execute(count_sql, params).fetchone()["c"]
     return int(count)
 
 
 def fetch_events_for_id(pid: str, ts_from: str | None = None, ts_to: str | None = None, limit: int | None = None) -> list[Event]:
-    where = ["src_id=? OR dst_id=?"]
-    params: list[object] = [pid, pid]
-    if ts_from:
-        where.append("ts >= ?")
-        params.append(ts_from)
-    if ts_to:
-        where.append("ts <= ?")
-        params.append(ts_to)
-
-    sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events WHERE " + " AND ".join(where)
-    sql += " ORDER BY (ts IS NULL) ASC, ts ASC, id ASC"
+    source, params = _participant_events(pid, ts_from, ts_to)
+    sql = f"SELECT {_EVENT_COLUMNS_E} {source}" + _TIMELINE_ORDER
     if limit is not None:
         sql += " LIMIT ?"
         params.append(int(limit))
@@ -192,23 +240,23 @@ def fetch_events_for_id(pid: str, ts_from: str | None = None, ts_to: str | None
 
 
 def fetch_event_type_counts_for_id(pid: str) -> list[tuple[str, int]]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(
             """
         SELECT event_type, COUNT(*) c
-        FROM events
-        WHERE src_id=? OR dst_id=?
+        FROM event_participants
+        WHERE player_id = ?
         GROUP BY event_type
         ORDER BY c DESC
         """,
-        (pid, pid),
+        (pid,),
     ).fetchall()
     return [(r["event_type"], r["c"]) for r in rows]
 
 
 def fetch_money_totals_for_id(pid: str) -> tuple[int, int]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         money_out = cur.execute(
             """
@@ -231,22 +279,22 @@ def fetch_money_totals_for_id(pid: str) -> tuple[int, int]:
 
 
 def fetch_top_partners(pid: str, limit: int = 15) -> list[PartnerStat]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(
             """
         SELECT
-          CASE WHEN src_id=? THEN dst_id ELSE src_id END partner_id,
-          CASE WHEN src_id=? THEN dst_name ELSE src_name END partner_name,
+          CASE WHEN e.src_id=? THEN e.dst_id ELSE e.src_id END partner_id,
+          CASE WHEN e.src_id=? THEN e.dst_name ELSE e.src_name END partner_name,
           COUNT(*) c
-        FROM events
-        WHERE (src_id=? OR dst_id=?)
+        FROM event_participants p JOIN events e ON e.id = p.event_id
+        WHERE p.player_id = ?
         GROUP BY partner_id, partner_name
         HAVING partner_id IS NOT NULL AND partner_id != ?
         ORDER BY c DESC
         LIMIT ?
         """,
-        (pid, pid, pid, pid, pid, int(limit)),
+        (pid, pid, pid, pid, int(limit)),
     ).fetchall()
     return [PartnerStat(r["partner_id"], r["partner_name"], int(r["c"])) for r in rows]
 
@@ -302,7 +350,7 @@ def fetch_trace_events(event_types: Iterable[str], item_filter: str | None = Non
 
 
 def fetch_identities(pid: str) -> list[IdentityRecord]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(
             """
@@ -324,31 +372,17 @@ def fetch_directional_events(
     ts_to: str | None,
     limit: int,
 ) -> list[Event]:
-    where = ["event_type IN (%s)" % ",".join(["?"] * len(types))]
-    params: list[object] = list(types)
-
-    if direction == "out":
-        where.append("src_id = ?")
-        params.append(pid)
-    else:
-        where.append("dst_id = ?")
-        params.append(pid)
-
-    if ts_from:
-        where.append("ts >= ?")
-        params.append(ts_from)
-    if ts_to:
-        where.append("ts <= ?")
-        params.append(ts_to)
-
-    sql = f"SELECT {', '.join(EVENT_COLUMNS)} FROM events WHERE {' AND '.join(where)}"
-    sql += " ORDER BY (ts IS NULL) ASC, ts ASC, id ASC LIMIT ?"
+    roles = ("src", "both") if direction == "out" else ("dst", "both")
+    source, params = _participant_events(pid, ts_from, ts_to, roles)
+    sql = f"SELECT {_EVENT_COLUMNS_E} {source} AND p.event_type IN ({','.join(['?'] * len(types))})"
+    sql += _TIMELINE_ORDER + " LIMIT ?"
+    params.extend(types)
     params.append(int(limit))
     return _fetch_events(sql, params)
 
 
 def fetch_normalized_lines():
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(
             """
@@ -361,18 +395,19 @@ def fetch_normalized_lines():
 
 
 def fetch_raw_log_sources() -> dict[int, str]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute("SELECT id, source_file FROM raw_logs").fetchall()
     return {r["id"]: r["source_file"] for r in rows}
 
 
 def fetch_event_counts() -> dict:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         raw_n = cur.execute("SELECT COUNT(*) c FROM raw_logs").fetchone()["c"]
         norm_n = cur.execute("SELECT COUNT(*) c FROM normalized_lines").fetchone()["c"]
         ev_n = cur.execute("SELECT COUNT(*) c FROM events").fetchone()["c"]
+        occ_n = cur.execute("SELECT COUNT(*) c FROM event_occurrences").fetchone()["c"]
 
         by_type_rows = cur.execute(
             """
@@ -382,23 +417,36 @@ def fetch_event_counts() -> dict:
         ORDER BY c DESC
         """
     ).fetchall()
+        rule_rows = cur.execute(
+            "SELECT rule, event_type, hits, misses, match_ns FROM parser_stats ORDER BY hits DESC, rule ASC"
+        ).fetchall()
     return {
         "raw_logs": int(raw_n),
         "normalized_lines": int(norm_n),
         "events": int(ev_n),
+        "event_occurrences": int(occ_n),
         "events_by_type": [{"event_type": r["event_type"], "count": int(r["c"])} for r in by_type_rows],
+        "parser_stats": [
+            {
+                "rule": r["rule"],
+                "event_type": r["event_type"],
+                "hits": int(r["hits"]),
+                "misses": int(r["misses"]),
+                "match_ms": round(r["match_ns"] / 1e6, 3),
+            }
+            for r in rule_rows
+        ],
     }
 
 
 def fetch_recent_entities(limit: int = 10) -> list[dict]:
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         rows = cur.execute(
             """
-        SELECT src_id as player_id, src_name as name, MAX(ts) as last_seen
-        FROM events
-        WHERE src_id IS NOT NULL
-        GROUP BY src_id, src_name
+        SELECT player_id, name, last_seen
+        FROM entities
+        WHERE player_id IS NOT NULL
         ORDER BY last_seen DESC
         LIMIT ?
         """,
@@ -415,20 +463,36 @@ def fetch_recent_entities(limit: int = 10) -> list[dict]:
 
 
 def search_entities(query: str, limit: int = 20) -> list[dict]:
-    with get_conn() as conn:
+    """Event sources whose ID or name contains query, most recently seen first (entities_fts trigram index)."""
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
-        q = f"%{query}%"
-        rows = cur.execute(
-            """
-        SELECT src_id as player_id, src_name as name, MAX(ts) as last_seen
-        FROM events
-        WHERE src_id LIKE ? OR src_name LIKE ?
-        GROUP BY src_id, src_name
-        ORDER BY last_seen DESC
-        LIMIT ?
-        """,
-        (q, q, int(limit)),
-    ).fetchall()
+        phrase = trigram_phrase(query)
+        if phrase:
+            rows = cur.execute(
+                """
+            SELECT e.player_id, e.name, e.last_seen
+            FROM entities_fts f
+            JOIN entities e ON e.id = f.rowid
+            WHERE entities_fts MATCH ?
+            ORDER BY e.last_seen DESC
+            LIMIT ?
+            """,
+                (phrase, int(limit)),
+            ).fetchall()
+        else:
+            # no trigram index for this query (short, or SQLite without FTS5 trigram);
+            # entities is one row per source, not per event
+            q = f"%{query}%"
+            rows = cur.execute(
+                """
+            SELECT player_id, name, last_seen
+            FROM entities
+            WHERE player_id LIKE ? OR name LIKE ?
+            ORDER BY last_seen DESC
+            LIMIT ?
+            """,
+                (q, q, int(limit)),
+            ).fetchall()
     return [
         {
             "player_id": r["player_id"],
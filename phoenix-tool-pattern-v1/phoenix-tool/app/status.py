@@ -11,11 +11,12 @@ console = Console()
 
 def show_status():
     """Read-only coverage view: raw logs, normalized lines, events by type."""
-    with get_conn() as conn:
+    with get_conn(readonly=True) as conn:
         cur = conn.cursor()
         raw_n = cur.execute("SELECT COUNT(*) c FROM raw_logs").fetchone()["c"]
         norm_n = cur.execute("SELECT COUNT(*) c FROM normalized_lines").fetchone()["c"]
         ev_n = cur.execute("SELECT COUNT(*) c FROM events").fetchone()["c"]
+        occ_n = cur.execute("SELECT COUNT(*) c FROM event_occurrences").fetchone()["c"]
 
         by_type = cur.execute(
             """
@@ -26,10 +27,19 @@ def show_status():
             """
         ).fetchall()
 
+        rule_stats = cur.execute(
+            """
+            SELECT rule, event_type, hits, misses, match_ns
+            FROM parser_stats
+            ORDER BY hits DESC, rule ASC
+            """
+        ).fetchall()
+
 
     console.print(
         Panel(
-            f"Raw logs: {raw_n}\nNormalized lines: {norm_n}\nParsed events: {ev_n}",
+            f"Raw logs: {raw_n}\nNormalized lines: {norm_n}\nParsed events: {ev_n}\n"
+            f"Event lines: {occ_n} ({occ_n - ev_n} merged duplicates)",
             title="STATUS",
         )
     )
@@ -40,3 +50,13 @@ def show_status():
     for r in by_type:
         t.add_row(str(r["event_type"]), str(r["c"]))
     console.print(t)
+
+    if rule_stats:
+        t = Table(title="Parser rules", show_lines=True)
+        t.add_column("Rule")
+        t.add_column("Hits", justify="right")
+        t.add_column("Misses", justify="right")
+        t.add_column("Match ms", justify="right")
+        for r in rule_stats:
+            t.add_row(str(r["rule"]), str(r["hits"]), str(r["misses"]), f"{r['match_ns'] / 1e6:.1f}")
+        console.print(t)
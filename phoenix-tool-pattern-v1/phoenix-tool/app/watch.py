@@ -0,0 +1,172 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from rich.console import Console
+
+from .db import get_conn
+from .evidence import HEAD_CHARS
+from .ingest import insert_raw_log, store_text
+from .normalize import normalize_raw_logs
+from .parse import parse_raw_logs
+from .util import sha1_text, utc_now_iso
+
+console = Console()
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _TailState:
+    """What the watcher already stored for one file."""
+    offset: int = 0                 # bytes consumed; always just after a newline
+    n_chars: int = 0                # characters of the logical file stored so far
+    head: str = ""                  # first HEAD_CHARS characters (for head_hash)
+    raw_id: int | None = None       # newest raw log holding this file's content
+    hasher: "hashlib._Hash" = field(default_factory=hashlib.sha1)
+
+
+def _decode(data: bytes) -> str:
+    # same text Path.read_text(encoding="utf-8", errors="ignore") produces (universal newlines)
+    return data.decode("utf-8", errors="ignore").replace("\r\n", "\n").replace("\r", "\n")
+
+
+class Watcher:
+    """
+    Poll a directory for new or grown *.txt exports and push only the new
+    complete lines through raw ingest -> normalize -> parse.
+
+    Growth is read from the last consumed byte offset and stored as an appended
+    tail (parent_id/base_len), so the cost of a cycle depends on how much data
+    arrived, not on the size of the files or the database.
+    """
+
+    def __init__(self, root: str, interval: float = 2.0):
+        self.root = Path(root)
+        self.interval = float(interval)
+        self.cycles = 0
+        self.last_poll: dict = {}
+        self.last_error: dict | None = None   # most recent failed cycle, for status
+        self._files: dict[str, _TailState] = {}
+        self._unprocessed: list[int] = []
+
+    def _consume(self, cur, path: Path, size: int) -> int | None:
+        """Store new complete lines of one file. Returns the new raw_log_id, if any."""
+        state = self._files.get(str(path))
+        if state is None or size < state.offset:
+            # new file, or truncated/replaced: start over
+            state = self._files[str(path)] = _TailState()
+
+        with path.open("rb") as f:
+            f.seek(state.offset)
+            data = f.read(size - state.offset)
+        cut = data.rfind(b"\n") + 1
+        if cut == 0:
+            return None  # no complete line yet
+        text = _decode(data[:cut])
+        state.offset += cut
+
+        if state.raw_id is None:
+            raw_id, inserted = store_text(cur, str(path), text)
+        else:
+            hasher = state.hasher.copy()
+            hasher.update(text.encode("utf-8", errors="ignore"))
+            h = hasher.hexdigest()
+            row = cur.execute("SELECT id FROM raw_logs WHERE content_hash=?", (h,)).fetchone()
+            if row:
+                raw_id, inserted = row["id"], False
+            else:
+                head = (state.head + text)[:HEAD_CHARS]
+                head_hash = sha1_text(head) if len(head) >= HEAD_CHARS else None
+                raw_id, inserted = insert_raw_log(cur, str(path), text, h, head_hash, state.raw_id, state.n_chars), True
+
+        state.hasher.update(text.encode("utf-8", errors="ignore"))
+        state.n_chars += len(text)
+        if len(state.head) < HEAD_CHARS:
+            state.head = (state.head + text)[:HEAD_CHARS]
+        state.raw_id = raw_id
+        return raw_id if inserted else None
+
+    def poll(self) -> dict:
+        """One cycle: ingest new data, then normalize + parse only the new raw logs."""
+        new_ids: list[int] = []
+        files = sorted(self.root.rglob("*.txt")) if self.root.is_dir() else [self.root]
+
+        try:
+            with get_conn() as conn:
+                cur = conn.cursor()
+                for f in files:
+                    try:
+                        size = f.stat().st_size
+                    except OSError:
+                        continue
+                    state = self._files.get(str(f))
+                    if state is not None and size == state.offset:
+                        continue
+                    try:
+                        raw_id = self._consume(cur, f, size)
+                    except OSError as e:
+                        console.print(f"[red]Failed to read[/red] {f}: {e}")
+                        continue
+                    if raw_id is not None:
+                        new_ids.append(raw_id)
+                conn.commit()
+        except Exception:
+            # nothing of this cycle was stored: re-read every file next time
+            # (prefixes stored earlier are found again by hash)
+            self._files.clear()
+            raise
+
+        # stored but not yet normalized/parsed raw logs survive a failed cycle
+        self._unprocessed.extend(new_ids)
+        normalized = normalize_raw_logs(self._unprocessed, silent=True)
+        parsed = parse_raw_logs(self._unprocessed, silent=True)
+        self._unprocessed = []
+
+        self.cycles += 1
+        self.last_poll = {
+            "cycle": self.cycles,
+            "files": len(files),
+            "raw_logs": len(new_ids),
+            "normalized": normalized,
+            "parsed": parsed,
+            "at": utc_now_iso(),
+        }
+        return self.last_poll
+
+    def run(self, stop_event: threading.Event | None = None, silent: bool = False):
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                stats = self.poll()
+            except Exception as e:
+                # a failed cycle never ends the loop (it may be the API's background thread)
+                self.last_error = {"cycle": self.cycles + 1, "error": f"{type(e).__name__}: {e}", "at": utc_now_iso()}
+                if not silent:
+                    console.print(f"[red]WATCH cycle failed:[/red] {e}")
+                elif not isinstance(e, sqlite3.OperationalError):
+                    log.exception("watch cycle failed")
+                stop_event.wait(self.interval)
+                continue
+            if not silent and stats["raw_logs"]:
+                console.print(
+                    f"[green]WATCH[/green] {stats['at']} raw logs: {stats['raw_logs']} "
+                    f"lines: {stats['normalized']} events: {stats['parsed']}"
+                )
+            stop_event.wait(self.interval)
+
+
+def start_background_watch(root: str, interval: float = 2.0) -> tuple[Watcher, threading.Event, threading.Thread]:
+    """Run a Watcher in a daemon thread (used by the API server)."""
+    watcher = Watcher(root, interval=interval)
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=watcher.run,
+        kwargs={"stop_event": stop_event, "silent": True},
+        name="phoenix-watch",
+        daemon=True,
+    )
+    thread.start()
+    return watcher, stop_event, thread
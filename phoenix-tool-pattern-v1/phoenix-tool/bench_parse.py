@@ -0,0 +1,140 @@
+"""
+Parser benchmark on a synthetic corpus.
+
+    python bench_parse.py [lines=2000000] [events=0.3]
+    python bench_parse.py pathological=1 [chars=2000000]
+
+Generates a deterministic corpus (`events` = share of lines that are parseable
+events, the rest is channel chatter), then times the parser with and without
+keyword dispatch on a throw-away database and checks both produce the same events.
+
+pathological=1 instead parses lines built to make backtracking regexes blow
+up (repeated near-matches of every rule family), at growing line lengths
+with the same total size, and prints the time per MB for each length. It
+should stay flat: lines past parse.MAX_LINE_CHARS are not matched at all.
+"""
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app import db as app_db
+from app import parse
+
+NAMES = ["Ion", "Maria", "Vlad_Tepes", "Ana Maria", "Radu", "xX_Sniper_Xx"]
+ITEMS = ["Pistol", "Bandage", "Medicine", "USB Drive", "Gadget Pistol", "Navy Revolver"]
+CHATTER = [
+    "Vehicul parcat in garaj de {n}[{i}] la ora stabilita",
+    "{n} a scris in chat: cine vine la banca?",
+    "[ID] {i} BAN {n} motiv: DM in zona safe",
+    "Factura achitata pentru apartamentul {i} de catre {n}",
+    "Server restart in 5 minute, salvati progresul",
+    "{n}[{i}] a primit un avertisment pentru limbaj",
+]
+
+
+def _event_line(rng: random.Random) -> str:
+    a, b = rng.choice(NAMES), rng.choice(NAMES)
+    i, j = rng.randint(1, 9999), rng.randint(1, 9999)
+    money = f"{rng.randint(1, 9_999_999):,}".replace(",", ".")
+    item, qty = rng.choice(ITEMS), rng.randint(1, 500)
+    return rng.choice(
+        [
+            f"Jucatorul {a}[{i}] a transferat {money}$ lui {b}[{j}].",
+            f"{a}[{i}] a depozitat {money}$.",
+            f"{a}[{i}] a retras {money}$.",
+            f"Jucatorul {a}[{i}] i-a oferit lui {b}[{j}] - {item}(x{qty}).",
+            f"Jucatorul {a}[{i}] i-a oferit lui {b}[{j}] suma de {money}$.",
+            f"Jucătorului: {a} ({i}) i-au fost adaugati {money} $",
+            f"Jucător: {a} ({i}) a aruncat pe jos {qty}x {item}",
+            f"[TRANSFER] Jucatorul {a}[{i}] a pus in Locker A item-ul {item}(x{qty}).",
+            f"[REMOVE] Jucatorul {a}[{i}] a scos din Trunk item-ul {item}(x{qty}).",
+            f"[PERCHEZITIE] Jucatorul {a}[{i}] a scos din {j} item-ul {item}(x{qty}).",
+            f"{a.replace(' ', '_')}[{i}] se conectează cu succes (ip: 10.0.{i % 255}.{j % 255}**)",
+            f"{a.replace(' ', '_')}[{i}] s-a deconectat cu succes (ip: nil)",
+        ]
+    )
+
+
+def _pathological_line(n: int, k: int) -> str:
+    """A line of about n chars that nearly matches one rule family many times."""
+    parts = [
+        "a transferat " + "x[1] ",
+        "a depozitat " + "Ion[12] a ",
+        "Jucatorul A[1] i-a oferit lui ",
+        "[TRANSFER] Jucatorul A[1] a pus in ",
+        "Jucător: Ion (1) a aruncat pe jos " + " 1" * 8,
+        "se conectează " + "a" * 20,
+        "GARAGE: Jucător: A (1) a vandut vehiculul " + "x [y] " * 4,
+    ]
+    unit = parts[k % len(parts)]
+    return (unit * (n // len(unit) + 1))[:n]
+
+
+def make_pathological(line_chars: int, total_chars: int) -> list[tuple]:
+    rows = []
+    for no in range(1, max(1, total_chars // line_chars) + 1):
+        rows.append((1, no, "2025-12-20T18:32:00Z", "— 20.12.2025 18:32", "ABSOLUTE", _pathological_line(line_chars, no)))
+    return rows
+
+
+def run_pathological(total_chars: int) -> None:
+    print(f"pathological lines, {total_chars:,} chars per run (MAX_LINE_CHARS={parse.MAX_LINE_CHARS})")
+    for line_chars in (250, 1000, 4000, 16000, 64000):
+        rows = make_pathological(line_chars, total_chars)
+        elapsed, _ = run(rows, dispatch=True)
+        print(f"{line_chars:>6} chars/line: {elapsed:8.2f}s  {elapsed / (total_chars / 1e6):8.2f}s/MB")
+
+
+def make_corpus(n_lines: int, event_share: float, seed: int = 1) -> list[tuple]:
+    rng = random.Random(seed)
+    rows = []
+    for no in range(1, n_lines + 1):
+        if rng.random() < event_share:
+            text = _event_line(rng)
+        else:
+            text = rng.choice(CHATTER).format(n=rng.choice(NAMES), i=rng.randint(1, 9999))
+        rows.append((1, no, "2025-12-20T18:32:00Z", "— 20.12.2025 18:32", "ABSOLUTE", text))
+    return rows
+
+
+def run(rows: list[tuple], dispatch: bool) -> tuple[float, list[tuple]]:
+    parse.USE_DISPATCH = dispatch
+    with app_db.get_conn() as conn:
+        cur = conn.cursor()
+        parse.clear_parsed(cur)
+        t = time.perf_counter()
+        parse.parse_rows(cur, rows, "synthetic.txt")
+        elapsed = time.perf_counter() - t
+        events = cur.execute("SELECT * FROM events ORDER BY id").fetchall()
+        conn.rollback()
+    return elapsed, [tuple(e)[1:] for e in events]
+
+
+def main(argv: list[str]) -> None:
+    kv = dict(a.split("=", 1) for a in argv if "=" in a)
+    n_lines = int(kv.get("lines", 2_000_000))
+    share = float(kv.get("events", 0.3))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app_db.DB_PATH = Path(tmp) / "bench.db"
+        app_db.init_db()
+
+        if kv.get("pathological"):
+            run_pathological(int(kv.get("chars", 2_000_000)))
+            return
+
+        rows = make_corpus(n_lines, share)
+        print(f"corpus: {n_lines} lines, {share:.0%} events")
+        before, ev_before = run(rows, dispatch=False)
+        after, ev_after = run(rows, dispatch=True)
+
+    assert ev_before == ev_after, "dispatch changed parser output"
+    print(f"events: {len(ev_after)} (identical)")
+    print(f"full cascade:     {before:8.2f}s  {n_lines / before:12,.0f} lines/s")
+    print(f"keyword dispatch: {after:8.2f}s  {n_lines / after:12,.0f} lines/s  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
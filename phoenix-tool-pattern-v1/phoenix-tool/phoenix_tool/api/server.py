@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import os
 from pathlib import Path
 from typing import Optional
 
@@ -10,7 +11,8 @@ from fastapi import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
-from app.db import init_db
+from app.db import configure_pool, init_db
+from app.watch import start_background_watch
 from phoenix_tool.core.runner import run_command
 from phoenix_tool.core.response import ErrorItem, build_response
 
@@ -28,9 +30,30 @@ STATIC_DIR = Path(__file__).resolve().parent / "static"
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 
 
+# Optional background watcher: PHOENIX_WATCH_DIR=<folder> [PHOENIX_WATCH_INTERVAL=<seconds>]
+_watch: dict = {}
+
+
 @app.on_event("startup")
 async def startup_event():
+    # request threads share a bounded pool of connections (per mode: read-only / read-write)
+    configure_pool(int(os.environ.get("PHOENIX_DB_POOL_SIZE", "8")))
     init_db()
+    watch_dir = os.environ.get("PHOENIX_WATCH_DIR")
+    if watch_dir:
+        interval = float(os.environ.get("PHOENIX_WATCH_INTERVAL", "2"))
+        watcher, stop_event, thread = start_background_watch(watch_dir, interval=interval)
+        _watch.update(watcher=watcher, stop=stop_event, thread=thread)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _watch:
+        _watch["stop"].set()
+        _watch["thread"].join(timeout=5)
+        _watch.clear()
+    configure_pool(None)
+
 
 def _format_validation_details(exc: RequestValidationError) -> str:
     parts = []
@@ -150,6 +173,11 @@ async def trace(entity: str, depth: int = 2, item: Optional[str] = None):
     return run_command("trace", {"id": entity, "depth": depth, "item": item})
 
 
+@app.get("/alts")
+async def alts(entity: str):
+    return run_command("alts", {"query": entity})
+
+
 @app.get("/between")
 async def between(
     a: str,
@@ -161,9 +189,38 @@ async def between(
     return run_command("between", {"a": a, "b": b, "limit": limit, "from": from_ts, "to": to_ts})
 
 
+@app.post("/ingest")
+async def ingest(payload: dict = Body(default_factory=dict)):
+    return run_command(
+        "ingest",
+        {"path": payload.get("path"), "stream": payload.get("stream"), "workers": payload.get("workers", 1)},
+    )
+
+
+@app.get("/watch")
+async def watch_status():
+    watcher = _watch.get("watcher")
+    data = {
+        "enabled": watcher is not None,
+        "path": str(watcher.root) if watcher else None,
+        "interval": watcher.interval if watcher else None,
+        "cycles": watcher.cycles if watcher else 0,
+        "last_poll": watcher.last_poll if watcher else None,
+        "last_error": watcher.last_error if watcher else None,
+    }
+    return build_response("watch", {}, data)
+
+
 @app.post("/build")
-async def build_db():
-    return run_command("build", {})
+async def build_db(payload: dict = Body(default_factory=dict)):
+    return run_command(
+        "build",
+        {
+            "full": bool(payload.get("full")),
+            "keep_lines": payload.get("keep_lines", True) is not False,
+            "workers": payload.get("workers", 1),
+        },
+    )
 
 
 @app.get("/ask")
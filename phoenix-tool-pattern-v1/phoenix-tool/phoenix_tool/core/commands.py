@@ -5,17 +5,20 @@ from typing import Any
 
 from app.ask import parse_ask_search
 from app.flow import build_flow
-from app.normalize import normalize_all
+from app.normalize import normalize_all, normalize_incremental
 from app.parse import parse_events
+from app.pipeline import build as build_pipeline
 from app.report import build_case_file
 from app.search import search_events, count_search_events
 from app.storages import compute_storage_summary
 from app.summary import summary_for_id
 from app.trace import trace
 from app.ingest import load_logs
-from app.identity import rebuild_identities, show_identity
+from app.watch import Watcher
+from app.identity import fetch_alts, rebuild_identities, show_identity
 from app.hub import build_hub
 from app.audit import audit_unparsed
+from app.compact import compact_raw_logs
 from app.repository import fetch_event_counts, fetch_recent_entities
 from app.util import format_money_ro
 from app.render.common import collapse_events, count_warnings
@@ -23,19 +26,32 @@ from .serialize import to_dict
 from .warnings import warnings_from_lines
 
 
-def ingest(path: str) -> dict[str, Any]:
-    loaded = load_logs(path, silent=True)
+def ingest(path: str, stream: bool | None = None, workers: int = 1) -> dict[str, Any]:
+    loaded = load_logs(path, silent=True, stream=stream, workers=workers)
     return {"loaded": loaded, "path": path}
 
 
-def normalize() -> dict[str, Any]:
-    normalized = normalize_all(silent=True)
-    return {"normalized": normalized}
+def watch_once(path: str) -> dict[str, Any]:
+    stats = Watcher(path).poll()
+    return {"path": path, **stats}
 
 
-def parse() -> dict[str, Any]:
-    parsed = parse_events(silent=True)
-    return {"parsed": parsed}
+def compact(codec: str = "lzma", vacuum: bool = True) -> dict[str, Any]:
+    return compact_raw_logs(codec=codec, vacuum=vacuum, silent=True)
+
+
+def normalize(full: bool = False) -> dict[str, Any]:
+    normalized = normalize_all(silent=True) if full else normalize_incremental(silent=True)
+    return {"normalized": normalized, "full": full}
+
+
+def build(full: bool = False, keep_lines: bool = True, workers: int = 1) -> dict[str, Any]:
+    return build_pipeline(silent=True, full=full, keep_lines=keep_lines, workers=workers)
+
+
+def parse(full: bool = False, workers: int = 1, adaptive: bool = False) -> dict[str, Any]:
+    parsed = parse_events(silent=True, full=full, workers=workers, adaptive=adaptive)
+    return {"parsed": parsed, "full": full}
 
 
 def identities() -> dict[str, Any]:
@@ -48,6 +64,10 @@ def identity_lookup(value: str) -> dict[str, Any]:
     return {"query": value, "identities": to_dict(result)}
 
 
+def alts(value: str) -> dict[str, Any]:
+    return fetch_alts(value)
+
+
 def search(params: dict[str, Any]) -> dict[str, Any]:
     rows = search_events(
         ids=params.get("ids"),
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import sqlite3
 import time
+from pathlib import Path
 from typing import Any, Callable
 
 from app import save as save_store
@@ -9,6 +10,7 @@ from app import export as export_tools
 from app import hub as hub_tools
 from app import audit as audit_tools
 from app import debug as debug_tools
+from app.evidence import CODECS
 from phoenix_tool.core import commands as core_commands
 from phoenix_tool.core.repository import search_entities
 from phoenix_tool.core.response import ErrorItem, WarningItem, build_response
@@ -146,23 +148,38 @@ def run_command(command: str, params: dict[str, Any] | None = None) -> dict[str,
             path = params.get("path")
             if not path:
                 return _error("ingest", params, "VALIDATION", "Missing path.", "Provide a file or folder path.")
-            data = core_commands.ingest(str(path))
-            return build_response("ingest", {"path": str(path)}, data)
+            stream = params.get("stream")
+            workers = max(_normalize_limit(params.get("workers"), 1), 1)
+            data = core_commands.ingest(str(path), stream=stream, workers=workers)
+            return build_response("ingest", {"path": str(path), "stream": stream, "workers": workers}, data)
+
+        if cmd == "watch":
+            path = params.get("path")
+            if not path:
+                return _error("watch", params, "VALIDATION", "Missing path.", "Provide a folder (or file) to watch.")
+            if not Path(str(path)).exists():
+                return _error("watch", params, "NOT_FOUND", "Path not found.", "Check the watched folder path.")
+            data = core_commands.watch_once(str(path))
+            return build_response("watch", {"path": str(path)}, data)
 
         if cmd == "normalize":
-            data = core_commands.normalize()
-            return build_response("normalize", {}, data)
+            full = bool(params.get("full"))
+            data = core_commands.normalize(full=full)
+            return build_response("normalize", {"full": full}, data)
 
         if cmd == "parse":
-            data = core_commands.parse()
-            return build_response("parse", {}, data)
+            full = bool(params.get("full"))
+            workers = max(_normalize_limit(params.get("workers"), 1), 1)
+            adaptive = bool(params.get("adaptive"))
+            data = core_commands.parse(full=full, workers=workers, adaptive=adaptive)
+            return build_response("parse", {"full": full, "workers": workers, "adaptive": adaptive}, data)
 
         if cmd == "build":
-            data = {
-                "normalized": core_commands.normalize()["normalized"],
-                "parsed": core_commands.parse()["parsed"],
-            }
-            return build_response("build", {}, data)
+            full = bool(params.get("full"))
+            keep_lines = params.get("keep_lines") is not False
+            workers = max(_normalize_limit(params.get("workers"), 1), 1)
+            data = core_commands.build(full=full, keep_lines=keep_lines, workers=workers)
+            return build_response("build", {"full": full, "keep_lines": keep_lines, "workers": workers}, data)
 
         if cmd == "status":
             data = core_commands.status()
@@ -179,6 +196,13 @@ def run_command(command: str, params: dict[str, Any] | None = None) -> dict[str,
             data = core_commands.identity_lookup(str(query))
             return build_response("identity", {"query": str(query)}, data)
 
+        if cmd == "alts":
+            query = params.get("query") or params.get("id") or params.get("entity")
+            if not query:
+                return _error("alts", params, "VALIDATION", "Missing alts query.", "Provide an ID, name or IP.")
+            data = core_commands.alts(str(query))
+            return build_response("alts", {"query": str(query)}, data)
+
         if cmd == "entities":
             q = (params.get("q") or "").strip()
             limit = _normalize_limit(params.get("limit"), 20)
@@ -338,6 +362,14 @@ def run_command(command: str, params: dict[str, Any] | None = None) -> dict[str,
             out = hub_tools.build_hub(silent=True)
             return build_response("hub", {}, {"path": str(out)})
 
+        if cmd == "compact":
+            codec = str(params.get("codec") or "lzma").lower()
+            vacuum = params.get("vacuum") is not False
+            if codec not in CODECS:
+                return _error("compact", params, "VALIDATION", f"Unknown codec: {codec}", "Use lzma, zlib or none.")
+            data = core_commands.compact(codec=codec, vacuum=vacuum)
+            return build_response("compact", {"codec": codec, "vacuum": vacuum}, data)
+
         if cmd == "debug":
             out = debug_tools.make_debug_bundle(silent=True)
             return build_response("debug", {}, {"path": str(out)})
@@ -1,17 +1,17 @@
 import re
+import sys
 from collections import Counter
 from pathlib import Path
 
-p = Path("output/audit/audit_samples.txt")
-text = p.read_text(encoding="utf-8", errors="ignore").splitlines()
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-# Grab only the actual audit log lines (skip separators + headers)
-lines = []
-for ln in text:
-    ln = ln.strip()
-    if not ln or ln.startswith("[raw_log_id=") or ln.startswith("-"*10):
-        continue
-    lines.append(ln)
+from app.db import get_conn, init_db
+
+init_db()
+
+# Unparsed lines recorded by the last parse
+with get_conn() as conn:
+    lines = [r["text"] for r in conn.execute("SELECT text FROM unparsed_lines")]
 
 def normalize_signature(s: str) -> str:
     # reduce noise so similar lines group together
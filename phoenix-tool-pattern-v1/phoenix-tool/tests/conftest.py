@@ -37,6 +37,7 @@ def temp_db(tmp_path):
     try:
         yield tmp_path
     finally:
+        app_db.close_pools()
         app_db.DATA_DIR = old_data_dir
         app_db.DB_PATH = old_db_path
 
@@ -78,3 +78,13 @@ def test_build_twice(temp_db):
     assert second.status_code == 200
     assert first.json()["ok"] is True
     assert second.json()["ok"] is True
+
+
+def test_alts_unknown_entity(temp_db):
+    client = TestClient(app)
+    resp = client.get("/alts?entity=101")
+    assert resp.status_code == 200
+    payload = resp.json()
+    _assert_schema(payload)
+    assert payload["ok"] is True
+    assert payload["data"]["cluster"] is None
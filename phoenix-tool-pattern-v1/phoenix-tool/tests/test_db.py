@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+
+import pytest
+
+from app import db as app_db
+
+
+def _in_thread(connection):
+    got = []
+
+    def use():
+        with connection() as conn:
+            got.append(conn)
+
+    t = threading.Thread(target=use)
+    t.start()
+    t.join()
+    return got[0]
+
+
+def test_get_conn_reuses_connections(temp_db):
+    with app_db.get_conn() as conn:
+        first = conn
+        conn.execute("INSERT INTO saved_findings(tag, kind, created_at, payload) VALUES ('a', 'search', 'now', '{}')")
+        # a nested block gets its own connection, not the one mid-transaction
+        with app_db.get_conn() as inner:
+            assert inner is not first
+    # left uncommitted: rolled back when returned, as a close would
+    with app_db.get_conn() as conn:
+        assert conn is first
+        assert conn.execute("SELECT COUNT(*) FROM saved_findings").fetchone()[0] == 0
+
+    with app_db.get_conn(readonly=True) as conn:
+        assert conn is not first
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM saved_findings")
+
+    # other threads get their own connections
+    assert _in_thread(app_db.get_conn) is not first
+
+
+def test_bounded_pool_shares_connections(temp_db):
+    pool = app_db.ConnectionPool(app_db.DB_PATH, readonly=True, size=2, timeout=0.1)
+    try:
+        with pool.connection() as a, pool.connection() as b:
+            assert a is not b
+            with pytest.raises(sqlite3.OperationalError, match="no free database connection"):
+                with pool.connection():
+                    pass
+        assert _in_thread(pool.connection) in (a, b)
+    finally:
+        pool.close()
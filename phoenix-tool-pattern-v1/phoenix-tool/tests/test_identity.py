@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+from app import db as app_db
+from app.identity import rebuild_identities
+
+
+def _identities():
+    with app_db.get_conn() as conn:
+        return [tuple(r) for r in conn.execute("SELECT player_id, name, ip, sightings FROM identities ORDER BY id")]
+
+
+def test_rebuild_identities_counts_sightings(temp_db):
+    with app_db.get_conn() as conn:
+        conn.executemany(
+            "INSERT INTO events(ts, event_type, src_id, src_name, dst_id, dst_name, container) VALUES (?,?,?,?,?,?,?)",
+            [
+                ("2025-12-20T18:33:00Z", "bank_transfer", "101", "Ion", "202", " Maria ", None),
+                ("2025-12-20T18:32:00Z", "connect", None, None, "101", "Ion", "1.2.3.4**"),
+                ("2025-12-20T18:34:00Z", "disconnect", None, None, "101", "Ion", "nil"),
+                (None, "bank_deposit", None, None, "101", "Ion", None),
+                ("2025-12-20T18:35:00Z", "drop_item", None, "", None, None, None),
+            ],
+        )
+        conn.commit()
+
+    assert rebuild_identities(silent=True) == 3
+    # first-sighting order (by ts, untimed last); NULL parts are one key
+    expected = [
+        ("101", "Ion", "1.2.3.4", 1),
+        ("101", "Ion", None, 3),
+        ("202", "Maria", None, 1),
+    ]
+    assert _identities() == expected
+    assert rebuild_identities(silent=True) == 3
+    assert _identities() == expected
+
+
+def test_parsing_keeps_identities_current(loaded_db):
+    from app import parse
+
+    def current():
+        return sorted(_identities(), key=repr)
+
+    parsed = current()
+    assert parsed
+    rebuild_identities(silent=True)
+    assert current() == parsed
+
+    # reparsing one raw log takes its sightings out before adding them back
+    with app_db.get_conn() as conn:
+        raw_id = conn.execute("SELECT MIN(raw_log_id) FROM events").fetchone()[0]
+    parse.parse_raw_logs([raw_id], silent=True)
+    assert current() == parsed
+    with app_db.get_conn() as conn:
+        conn.execute("DELETE FROM events")
+        conn.commit()
+    parse.parse_events(silent=True, full=True)
+    assert current() == parsed
+
+
+def _clusters():
+    with app_db.get_conn() as conn:
+        rows = conn.execute("SELECT node, cluster FROM identity_clusters").fetchall()
+    groups: dict[int, set] = {}
+    for node, cluster in rows:
+        groups.setdefault(cluster, set()).add(node)
+    return sorted(sorted(g) for g in groups.values())
+
+
+def test_alts_follow_shared_ips_incrementally(temp_db, tmp_path):
+    from app.identity import fetch_alts, rebuild_clusters
+    from app.ingest import load_logs
+    from app.normalize import normalize_incremental
+    from app.parse import parse_events
+
+    a, b = tmp_path / "logs_20.12.2025_a.txt", tmp_path / "logs_20.12.2025_b.txt"
+    a.write_text(
+        "— 20.12.2025 18:32\n"
+        "Ion[101] se conectează cu succes (ip: 1.1.1.1**)\n"
+        "Maria[202] se conectează cu succes (ip: 1.1.1.1**)\n"
+        "Vlad[303] se conectează cu succes (ip: 2.2.2.2**)\n"
+        "Ion[101] a depozitat 1.000$.\n",
+        encoding="utf-8",
+    )
+    b.write_text("— 20.12.2025 19:00\nVlad_Alt[404] s-a deconectat cu succes (ip: 2.2.2.2**)\n", encoding="utf-8")
+
+    load_logs(str(a), silent=True)
+    normalize_incremental(silent=True)
+    parse_events(silent=True)
+    assert fetch_alts("101") == {
+        "query": "101",
+        "cluster": fetch_alts("1.1.1.1")["cluster"],
+        "ids": ["101", "202"],
+        "names": ["Ion", "Maria"],
+        "ips": ["1.1.1.1"],
+    }
+    assert fetch_alts("Vlad")["ids"] == ["303"]
+    assert fetch_alts("999")["cluster"] is None
+
+    load_logs(str(b), silent=True)
+    normalize_incremental(silent=True)
+    parse_events(silent=True)
+    assert fetch_alts("Vlad")["ids"] == ["303", "404"]
+    incremental = _clusters()
+    with app_db.get_conn() as conn:
+        assert rebuild_clusters(conn.cursor()) == 2
+        conn.commit()
+    assert _clusters() == incremental
+
+    # a sighting that bridges two stored clusters merges them
+    c = tmp_path / "logs_20.12.2025_c.txt"
+    c.write_text("— 20.12.2025 20:00\nIon[101] se conectează cu succes (ip: 2.2.2.2**)\n", encoding="utf-8")
+    load_logs(str(c), silent=True)
+    normalize_incremental(silent=True)
+    parse_events(silent=True)
+    assert fetch_alts("404")["ids"] == ["101", "202", "303", "404"]
+    assert len(_clusters()) == 1
+
+
+def test_entity_search_uses_trigram_index(loaded_db):
+    from app import parse
+    from app.identity import show_identity
+    from app.repository import fetch_recent_entities, search_entities
+
+    def scan(query):
+        # the old per-event scan the index replaces
+        with app_db.get_conn() as conn:
+            rows = conn.execute(
+                """
+                SELECT src_id, src_name, MAX(ts) FROM events
+                WHERE src_id LIKE ? OR src_name LIKE ?
+                GROUP BY src_id, src_name
+                """,
+                (f"%{query}%", f"%{query}%"),
+            ).fetchall()
+        return sorted((tuple(r) for r in rows), key=repr)
+
+    def found(query):
+        return sorted(((e["player_id"], e["name"], e["last_seen"]) for e in search_entities(query, limit=10_000)), key=repr)
+
+    with app_db.get_conn() as conn:
+        name, pid = conn.execute("SELECT src_name, src_id FROM events WHERE src_name IS NOT NULL LIMIT 1").fetchone()
+        plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN SELECT rowid FROM entities_fts WHERE entities_fts MATCH 'abc'"))
+    assert "VIRTUAL TABLE INDEX" in plan
+    with app_db.get_conn() as conn:
+        from app.identity import _UPSERT_ENTITIES_SQL
+
+        # new events only: the upsert reads a rowid range, whatever the table size
+        upsert = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + _UPSERT_ENTITIES_SQL, (0,)))
+    assert "INTEGER PRIMARY KEY (rowid>?)" in upsert
+    queries = [name, name[:3].lower(), name[:2], pid, "zzzz"]
+    expected = {q: scan(q) for q in queries}
+    assert expected[name]
+    assert {q: found(q) for q in queries} == expected
+    assert all(r["name"] for r in show_identity(name[1:4], as_data=True))
+    assert fetch_recent_entities(limit=1)[0]["last_seen"] == max(e[2] for e in scan("") if e[0] and e[2])
+
+    # clearing a raw log takes its sources out; reparsing adds them back
+    with app_db.get_conn() as conn:
+        raw_id = conn.execute("SELECT raw_log_id FROM events WHERE src_name = ? LIMIT 1", (name,)).fetchone()[0]
+        parse.clear_parsed(conn.cursor(), [raw_id])
+        conn.commit()
+    assert {q: found(q) for q in queries} == {q: scan(q) for q in queries}
+    parse.parse_raw_logs([raw_id], silent=True)
+    assert {q: found(q) for q in queries} == expected
+
+
+def test_entity_search_without_trigram_support(loaded_db, monkeypatch):
+    from app.identity import show_identity
+    from app.parse import parse_events
+    from app.repository import search_entities
+
+    with app_db.get_conn() as conn:
+        name = conn.execute("SELECT src_name FROM events WHERE src_name IS NOT NULL LIMIT 1").fetchone()[0]
+    with_index = search_entities(name[1:4], limit=10_000)
+
+    # an older SQLite build opening the same DB: triggers go, LIKE takes over
+    monkeypatch.setattr(app_db, "_HAS_TRIGRAM", False)
+    app_db.init_db()
+    assert app_db.trigram_phrase(name) is None
+    with app_db.get_conn() as conn:
+        assert not conn.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name LIKE '%_fts_%'").fetchall()
+    parse_events(full=True)
+    assert search_entities(name[1:4], limit=10_000) == with_index
+    assert all(r["name"] for r in show_identity(name[1:4], as_data=True))
+
+    # back on a build with trigram: the index missed those writes and is rebuilt
+    monkeypatch.setattr(app_db, "_HAS_TRIGRAM", True)
+    app_db.init_db()
+    assert search_entities(name[1:4], limit=10_000) == with_index
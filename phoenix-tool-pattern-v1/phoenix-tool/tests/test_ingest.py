@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import gzip
+import zipfile
+from pathlib import Path
+
+from app.compact import compact_raw_logs
+from app.db import get_conn
+from app.evidence import iter_raw_chunks
+from app.ingest import load_logs
+from app.normalize import normalize_all
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def _normalized_rows():
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            SELECT rl.source_file, nl.line_no, nl.ts, nl.ts_raw, nl.timestamp_quality, nl.text
+            FROM normalized_lines nl
+            JOIN raw_logs rl ON rl.id = nl.raw_log_id
+            ORDER BY rl.source_file, nl.line_no
+            """
+        ).fetchall()
+    return [tuple(r) for r in rows]
+
+
+def test_streamed_ingest_matches_inline(temp_db):
+    load_logs(str(FIXTURE_DIR), silent=True, stream=False)
+    normalize_all(silent=True)
+    inline_rows = _normalized_rows()
+    with get_conn() as conn:
+        inline_hashes = {r["content_hash"] for r in conn.execute("SELECT content_hash FROM raw_logs")}
+        conn.execute("DELETE FROM normalized_lines")
+        conn.execute("DELETE FROM raw_logs")
+        conn.commit()
+
+    load_logs(str(FIXTURE_DIR), silent=True, stream=True, chunk_chars=7)
+    normalize_all(silent=True)
+    with get_conn() as conn:
+        raws = conn.execute("SELECT content, content_hash, n_chunks FROM raw_logs").fetchall()
+
+    assert {r["content_hash"] for r in raws} == inline_hashes
+    assert all(r["n_chunks"] > 1 and r["content"] == "" for r in raws)
+    assert _normalized_rows() == inline_rows
+
+    # dedupe by content hash is independent of the storage mode
+    assert load_logs(str(FIXTURE_DIR), silent=True, stream=False) == 0
+
+
+def test_parallel_ingest_is_deterministic(temp_db, tmp_path):
+    src = tmp_path / "logs"
+    src.mkdir()
+    for i in range(6):
+        for f in FIXTURE_DIR.glob("*.txt"):
+            # every other copy is an exact duplicate of the fixture
+            extra = f"\nFILE: copy {i}\n" if i % 2 else ""
+            (src / f"{i:02d}_{f.name}").write_text(f.read_text(encoding="utf-8") + extra, encoding="utf-8")
+
+    def raw_rows():
+        with get_conn() as conn:
+            rows = conn.execute("SELECT id, source_file, content_hash FROM raw_logs ORDER BY id").fetchall()
+        return [tuple(r) for r in rows]
+
+    assert load_logs(str(src), silent=True, workers=1) == 8
+    sequential = raw_rows()
+    with get_conn() as conn:
+        conn.execute("DELETE FROM raw_logs")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name='raw_logs'")
+        conn.commit()
+
+    assert load_logs(str(src), silent=True, workers=3) == 8
+    assert raw_rows() == sequential
+
+
+def test_load_rejects_bad_workers(temp_db, capsys):
+    import json
+
+    from app.cli import main
+
+    for bad in ("workers=abc", "workers=", "workers=0", "workers=-2"):
+        assert main(["load", str(FIXTURE_DIR), bad]) == 1
+        assert "Usage:" in capsys.readouterr().out
+        assert main(["ingest", str(FIXTURE_DIR), bad, "--format", "json"]) == 1
+        assert json.loads(capsys.readouterr().out)["ok"] is False
+    with get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM raw_logs").fetchone()[0] == 0
+
+
+def test_grown_export_stores_only_tail(temp_db, tmp_path):
+    base = "PHOENIX LOGS\n— 20.12.2025 18:32\n" + "".join(
+        f"Jucatorul Ion[101] a pus in Locker A item-ul Pistol(x{i}).\n" for i in range(40)
+    )
+    tail = "Jucatorul Ion[101] a transferat 5$ lui Maria[202].\n"
+    first = tmp_path / "v1_20.12.2025.txt"
+    grown = tmp_path / "v2_20.12.2025.txt"
+    first.write_text(base, encoding="utf-8")
+    grown.write_text(base + tail, encoding="utf-8")
+
+    assert load_logs(str(first), silent=True) == 1
+    assert load_logs(str(grown), silent=True) == 1
+    normalize_all(silent=True)
+
+    with get_conn() as conn:
+        parent, child = conn.execute("SELECT * FROM raw_logs ORDER BY id").fetchall()
+        lines = conn.execute(
+            "SELECT ts, text FROM normalized_lines WHERE raw_log_id=? ORDER BY line_no", (child["id"],)
+        ).fetchall()
+        stored = "".join(iter_raw_chunks(conn, child["id"]))
+
+    assert child["parent_id"] == parent["id"]
+    assert child["base_len"] == len(base)
+    assert child["codec"] == "zlib"
+    assert stored == tail
+    # only the appended line is normalized again, still anchored by the parent's marker
+    assert [(r["ts"], r["text"]) for r in lines] == [("2025-12-20T18:32:00Z", tail.strip())]
+
+
+def test_compact_recompresses_evidence_in_place(temp_db):
+    # one inline row and one chunked row, both written before compression existed
+    load_logs(str(FIXTURE_DIR / "logs_20.12.2025.txt"), silent=True, codec="none")
+    load_logs(str(FIXTURE_DIR / "logs_relative.txt"), silent=True, stream=True, chunk_chars=64, codec="none")
+    normalize_all(silent=True)
+    plain_rows = _normalized_rows()
+
+    for codec in ("lzma", "zlib", "none", "lzma"):
+        stats = compact_raw_logs(codec=codec, vacuum=False, silent=True)
+        assert (stats["raw_logs"], stats["chunks"] > 1) == (1, True)
+        with get_conn() as conn:
+            assert {r["codec"] for r in conn.execute("SELECT codec FROM raw_log_chunks")} == {codec}
+        normalize_all(silent=True)
+        assert _normalized_rows() == plain_rows
+
+    # nothing left to do for the same codec; dedupe still works on compressed rows
+    assert compact_raw_logs(codec="lzma", silent=True)["chunks"] == 0
+    assert load_logs(str(FIXTURE_DIR), silent=True) == 0
+
+
+def test_archives_are_read_in_place(temp_db, tmp_path):
+    dated = FIXTURE_DIR / "logs_20.12.2025.txt"
+    relative = FIXTURE_DIR / "logs_relative.txt"
+    with zipfile.ZipFile(tmp_path / "bundle.zip", "w") as z:
+        z.write(dated, arcname="dec/week3/logs_20.12.2025.txt")
+        z.writestr("dec/readme.md", "not a log")
+    (tmp_path / "logs_relative.txt.gz").write_bytes(gzip.compress(relative.read_bytes()))
+
+    assert load_logs(str(tmp_path), silent=True, workers=2) == 2
+    normalize_all(silent=True)
+    with get_conn() as conn:
+        sources = [r["source_file"] for r in conn.execute("SELECT source_file FROM raw_logs ORDER BY id")]
+        # the gzip trailer cannot size a .gz file, so it is always streamed
+        n_chunks = [r["n_chunks"] for r in conn.execute("SELECT n_chunks FROM raw_logs ORDER BY id")]
+        ts = conn.execute(
+            "SELECT ts FROM normalized_lines WHERE raw_log_id=1 AND ts_raw LIKE '%Today at%'"
+        ).fetchone()["ts"]
+
+    assert sources == [
+        f"{tmp_path / 'bundle.zip'}!/dec/week3/logs_20.12.2025.txt",
+        str(tmp_path / "logs_relative.txt.gz"),
+    ]
+    assert (n_chunks[0], n_chunks[1] > 0) == (0, True)
+    # the member name still carries the export date
+    assert ts == "2025-12-20T22:07:00Z"
+    # same content as the plain files: deduped by hash
+    assert load_logs(str(FIXTURE_DIR), silent=True) == 0
+    assert load_logs(str(tmp_path / "bundle.zip"), silent=True, stream=True) == 0
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from app import normalize
+from app.db import NORMALIZED_LINES_INDEXES, get_conn
+from app.ingest import load_logs
+from app.normalize import normalize_all, normalize_incremental
+from app.parse import parse_events
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_overlapping_exports_are_stored_once(temp_db, tmp_path):
+    # staff A exported 18:32-18:40, staff B 18:40-18:45 a day later (relative markers)
+    a = _write(
+        tmp_path / "a_20.12.2025.txt",
+        "— 20.12.2025 18:32\n"
+        "Jucatorul Ion[101] a transferat 5$ lui Maria[202].\n"
+        "— 20.12.2025 18:40\n"
+        "Jucatorul Ion[101] a transferat 7$ lui Maria[202].\n"
+        "— 20.12.2025 18:40\n"
+        "Jucatorul Ion[101] a transferat 7$ lui Maria[202].\n",
+    )
+    b = _write(
+        tmp_path / "b_21.12.2025.txt",
+        "— Yesterday at 6:40 PM\n"
+        "Jucatorul Ion[101] a transferat 7$ lui Maria[202].\n"
+        "— Yesterday at 6:40 PM\n"
+        "Jucatorul Ion[101] a transferat 7$ lui Maria[202].\n"
+        "— Yesterday at 6:45 PM\n"
+        "Jucatorul Maria[202] a transferat 1$ lui Ion[101].\n",
+    )
+    load_logs(str(a), silent=True)
+    load_logs(str(b), silent=True)
+
+    assert normalize_all(silent=True) == 4
+    parse_events(silent=True)
+
+    with get_conn() as conn:
+        money = [r["money"] for r in conn.execute("SELECT money FROM events ORDER BY ts, id")]
+        sources = conn.execute(
+            """
+            SELECT b.occurrence, COUNT(*) n
+            FROM line_blocks b
+            JOIN line_block_sources s USING (fingerprint, occurrence)
+            WHERE b.first_line_no = 2
+            GROUP BY b.fingerprint, b.occurrence
+            """
+        ).fetchall()
+
+    # the repeated 7$ message is kept twice (two real transfers), not four times
+    assert money == [5, 7, 7, 1]
+    assert [(r["occurrence"], r["n"]) for r in sources] == [(1, 2)]
+
+    # without dedupe every export keeps its own copy
+    assert normalize_all(silent=True, dedupe=False) == 6
+
+
+def test_bulk_rebuild_is_batch_independent(loaded_db):
+    def lines():
+        with get_conn() as conn:
+            rows = conn.execute("SELECT raw_log_id, line_no, ts, ts_raw, timestamp_quality, text FROM normalized_lines ORDER BY id")
+            return [tuple(r) for r in rows]
+
+    expected = lines()
+    assert normalize_all(silent=True, batch_size=3) == len(expected)
+    assert lines() == expected
+
+    with get_conn() as conn:
+        names = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    assert {name for name, _ddl in NORMALIZED_LINES_INDEXES} <= names
+
+
+def test_incremental_normalize_touches_only_new_logs(temp_db, tmp_path, monkeypatch):
+    a = _write(tmp_path / "a_20.12.2025.txt", "— 20.12.2025 18:32\nJucatorul Ion[101] a transferat 5$ lui Maria[202].\n")
+    b = _write(tmp_path / "b_21.12.2025.txt", "— 21.12.2025 09:00\nJucatorul Maria[202] a transferat 1$ lui Ion[101].\n")
+
+    def line_ids():
+        with get_conn() as conn:
+            return [(r["id"], r["raw_log_id"]) for r in conn.execute("SELECT id, raw_log_id FROM normalized_lines ORDER BY id")]
+
+    load_logs(str(a), silent=True)
+    assert normalize_incremental(silent=True) == 1
+    first = line_ids()
+
+    load_logs(str(b), silent=True)
+    assert normalize_incremental(silent=True) == 1
+    assert line_ids()[:1] == first
+    assert normalize_incremental(silent=True) == 0
+
+    with get_conn() as conn:
+        state = conn.execute("SELECT raw_log_id, normalizer_version, line_count FROM normalize_state ORDER BY raw_log_id").fetchall()
+    assert [tuple(r) for r in state] == [(1, normalize.NORMALIZER_VERSION, 1), (2, normalize.NORMALIZER_VERSION, 1)]
+
+    # a new normalizer version redoes everything
+    monkeypatch.setattr(normalize, "NORMALIZER_VERSION", "test-next")
+    assert normalize_incremental(silent=True) == 2
+
+
+def test_appended_tail_continues_chain_occurrences(temp_db, tmp_path):
+    block = "— 20.12.2025 18:40\nJucatorul Ion[101] a transferat 7$ lui Maria[202].\n"
+    base = "PHOENIX LOGS\n" + "".join(
+        f"— 20.12.2025 18:{i:02d}\nJucatorul Ion[101] a pus in Locker A item-ul Pistol(x{i}).\n" for i in range(30)
+    ) + block
+    load_logs(str(_write(tmp_path / "v1_20.12.2025.txt", base)), silent=True)
+    load_logs(str(_write(tmp_path / "v2_20.12.2025.txt", base + block)), silent=True)
+    # another export of the first repeat only: not part of the chain
+    load_logs(str(_write(tmp_path / "other_20.12.2025.txt", block)), silent=True)
+    normalize_incremental(silent=True)
+    parse_events(silent=True)
+
+    with get_conn() as conn:
+        tail_sources = conn.execute(
+            "SELECT occurrence FROM line_block_sources WHERE raw_log_id = 2"
+        ).fetchall()
+        repeats = conn.execute("SELECT COUNT(*) FROM events WHERE money = 7").fetchone()[0]
+
+    # the tail's block is the second 18:40 transfer of the file
+    assert [r["occurrence"] for r in tail_sources] == [2]
+    assert repeats == 2
@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import tracemalloc
+
+from app import db as app_db
+from app import parse
+
+
+def _seed_lines(n: int):
+    with app_db.get_conn() as conn:
+        conn.execute(
+            "INSERT INTO raw_logs(id, source_file, content, content_hash, loaded_at) VALUES (1, 'big.txt', '', 'h', 'now')"
+        )
+        conn.executemany(
+            "INSERT INTO normalized_lines(raw_log_id, line_no, ts, ts_raw, timestamp_quality, text) VALUES (1,?,?,?,?,?)",
+            (
+                (i, "2025-12-20T18:32:00Z", "— 20.12.2025 18:32", "ABSOLUTE", f"Ion[{i}] a depozitat {i}$.")
+                for i in range(1, n + 1)
+            ),
+        )
+        conn.commit()
+
+
+def test_parse_events_streams_with_flat_memory(temp_db, monkeypatch):
+    monkeypatch.setattr(parse, "PARSE_BATCH_SIZE", 500)
+    monkeypatch.setattr(app_db, "FETCH_SIZE", 500)
+
+    def peak(n: int) -> int:
+        with app_db.get_conn() as conn:
+            conn.execute("DELETE FROM normalized_lines")
+            conn.execute("DELETE FROM raw_logs")
+            conn.commit()
+        _seed_lines(n)
+        tracemalloc.start()
+        try:
+            assert parse.parse_events(silent=True, full=True) == n
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    small, large = peak(5_000), peak(50_000)
+    # ten times the lines, not ten times the memory
+    assert large < small * 2
+
+
+def _events():
+    with app_db.get_conn() as conn:
+        return [tuple(r) for r in conn.execute("SELECT id, event_type, src_id, dst_id, money FROM events ORDER BY id")]
+
+
+def test_incremental_parse_keeps_event_ids(temp_db, monkeypatch, tmp_path):
+    from app.ingest import load_logs
+    from app.normalize import normalize_incremental
+
+    a, b = tmp_path / "logs_20.12.2025_a.txt", tmp_path / "logs_20.12.2025_b.txt"
+    a.write_text("— 20.12.2025 18:32\nIon[101] a depozitat 1.000$.\nIon[101] a retras 5$.\n", encoding="utf-8")
+    b.write_text("— 20.12.2025 19:00\nJucatorul Ion[101] a transferat 7$ lui Maria[202].\n", encoding="utf-8")
+
+    load_logs(str(a), silent=True)
+    normalize_incremental(silent=True)
+    assert parse.parse_events(silent=True) == 2
+    first = _events()
+    assert parse.parse_events(silent=True) == 0
+
+    load_logs(str(b), silent=True)
+    normalize_incremental(silent=True)
+    assert parse.parse_events(silent=True) == 1
+    after = _events()
+    assert after[:2] == first
+    assert after[2][1:] == ("bank_transfer", "101", "202", 7)
+
+    # a different rule set reparses everything
+    cfg = tmp_path / "parsers.yaml"
+    cfg.write_text("rules:\n  - name: bank_withdraw\n    enabled: false\n  - name: withdraw\n    enabled: false\n")
+    monkeypatch.setattr(parse, "REGISTRY", parse.ParserRegistry(parse.load_rules(cfg)))
+    assert parse.parse_events(silent=True) == 2
+    assert [e[1] for e in _events()] == ["bank_deposit", "bank_transfer"]
+
+
+def test_parse_after_full_normalize_reparses_in_one_clear(loaded_db, monkeypatch):
+    from app.normalize import normalize_all
+
+    before = [e[1:] for e in _events()]
+    normalize_all(silent=True)
+    cleared = []
+    real_clear = parse.clear_parsed
+    monkeypatch.setattr(parse, "clear_parsed", lambda cur, raw_ids=None: (cleared.append(raw_ids), real_clear(cur, raw_ids)))
+    assert parse.parse_events(silent=True) == len(before)
+    # every raw log was pending: the whole-table clear, not chunked per-log deletes
+    assert cleared == [None]
+    assert [e[1:] for e in _events()] == before
+
+
+def test_parallel_parse_matches_serial(loaded_db, monkeypatch):
+    def events():
+        with app_db.get_conn() as conn:
+            return [tuple(r)[1:] for r in conn.execute("SELECT * FROM events ORDER BY id")]
+
+    def watermarks():
+        with app_db.get_conn() as conn:
+            return conn.execute("SELECT raw_log_id, last_line_no FROM parse_state ORDER BY raw_log_id").fetchall()
+
+    serial, marks = events(), [tuple(r) for r in watermarks()]
+    assert parse.parse_events(silent=True, full=True, workers=3) == len(serial)
+    assert events() == serial
+    assert parse.parse_events(silent=True, workers=3) == 0
+
+    # raw logs split into many line ranges give the same events and watermarks
+    monkeypatch.setattr(parse, "PARSE_SHARD_LINES", 3)
+    assert parse.parse_events(silent=True, full=True, workers=3) == len(serial)
+    assert events() == serial
+    assert [tuple(r) for r in watermarks()] == marks
+
+
+def test_unparsed_lines_feed_the_audit(loaded_db):
+    from app.audit import audit_unparsed
+
+    with app_db.get_conn() as conn:
+        n = conn.execute("SELECT COUNT(*) FROM unparsed_lines").fetchone()[0]
+        top = conn.execute(
+            "SELECT signature, COUNT(*) c FROM unparsed_lines GROUP BY signature ORDER BY c DESC, signature LIMIT 1"
+        ).fetchone()
+    assert n > 0
+
+    path, groups, _limit = audit_unparsed(limit_groups=5, sample_per_group=2)
+    text = open(path, encoding="utf-8").read()
+    assert 0 < groups <= 5
+    assert f"GROUP #1 | count={top['c']}\nSIGNATURE: {top['signature']}\n" in text
+
+    # reparsing replaces the recorded lines instead of adding to them
+    parse.parse_events(silent=True, full=True)
+    with app_db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM unparsed_lines").fetchone()[0] == n
+
+
+def test_parser_stats_and_adaptive_order(loaded_db):
+    with app_db.get_conn() as conn:
+        stats = {r["rule"]: tuple(r)[1:] for r in conn.execute("SELECT rule, hits, misses, match_ns FROM parser_stats")}
+        counts = dict(conn.execute("SELECT event_type, COUNT(*) FROM events GROUP BY event_type").fetchall())
+        registry = parse.adaptive_registry(conn)
+    assert sum(h for h, _m, _ns in stats.values()) == sum(counts.values())
+    assert all(ns > 0 for _h, _m, ns in stats.values())
+
+    # the generic fallbacks stay behind the specific deposit/withdraw rules
+    order = [r.name for r in registry.rules]
+    assert order.index("bank_deposit") < order.index("deposit")
+    assert order.index("bank_withdraw") < order.index("withdraw")
+    assert registry.version == parse.REGISTRY.version
+
+    def events():
+        with app_db.get_conn() as conn:
+            return [tuple(r)[1:] for r in conn.execute("SELECT * FROM events ORDER BY id")]
+
+    before = events()
+    parse.parse_events(silent=True, full=True, adaptive=True)
+    assert events() == before
+
+
+def test_overlong_lines_skip_the_rules(temp_db):
+    long_line = "Jucatorul A[1] i-a oferit lui " * 200
+    rows = [
+        (1, 1, None, None, "UNKNOWN", long_line),
+        (1, 2, None, None, "UNKNOWN", "Ion[101] a depozitat 2.000$."),
+    ]
+    assert len(long_line.strip()) > parse.MAX_LINE_CHARS
+    with app_db.get_conn() as conn:
+        cur = conn.cursor()
+        assert parse.parse_rows(cur, rows, "x.txt") == (1, 1)
+        sig, text = cur.execute("SELECT signature, text FROM unparsed_lines").fetchone()
+    assert (sig, text) == (parse.OVERFLOW_SIGNATURE, long_line.strip())
+
+
+def test_overlapping_exports_merge_events(temp_db, tmp_path):
+    from app.ingest import load_logs
+    from app.normalize import normalize_incremental
+    from app.repository import fetch_money_totals_for_id
+
+    a, b = tmp_path / "logs_20.12.2025_a.txt", tmp_path / "logs_20.12.2025_b.txt"
+    deposits = "Ion[101] a depozitat 1.000$.\nIon[101] a depozitat 1.000$.\n"
+    a.write_text(f"— 20.12.2025 18:32\n{deposits}Jucatorul Ion[101] a transferat 7$ lui Maria[202].\n", encoding="utf-8")
+    b.write_text(f"— 20.12.2025 18:32\n{deposits}Ion[101] a retras 5$.\n", encoding="utf-8")
+    load_logs(str(a), silent=True)
+    load_logs(str(b), silent=True)
+    normalize_incremental(silent=True)
+
+    # the two deposits are repeats within an export: kept apart, merged across exports
+    assert parse.parse_events(silent=True) == 4
+    with app_db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM event_occurrences").fetchone()[0] == 6
+        a_id, b_id = (r[0] for r in conn.execute("SELECT id FROM raw_logs ORDER BY id"))
+    assert fetch_money_totals_for_id("101") == (2000, 12)
+
+    # reparsing one export keeps events the other one also holds
+    parse.parse_raw_logs([a_id], silent=True)
+    with app_db.get_conn() as conn:
+        rows = conn.execute("SELECT event_type, raw_log_id FROM events ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [
+        ("bank_deposit", b_id),
+        ("bank_deposit", b_id),
+        ("bank_withdraw", b_id),
+        ("bank_transfer", a_id),
+    ]
+    assert fetch_money_totals_for_id("101") == (2000, 12)
+
+
+def test_participants_index_matches_or_scans(loaded_db):
+    from app import repository as repo
+
+    def scan(sql, params):
+        with app_db.get_conn() as conn:
+            return [tuple(r) for r in conn.execute(sql, params)]
+
+    def check():
+        with app_db.get_conn() as conn:
+            pids = [r[0] for r in conn.execute("SELECT src_id FROM events UNION SELECT dst_id FROM events") if r[0]]
+            ts = conn.execute("SELECT ts FROM events WHERE ts IS NOT NULL ORDER BY ts LIMIT 1 OFFSET 3").fetchone()[0]
+        assert pids
+        for pid in pids:
+            timeline = scan(
+                "SELECT id FROM events WHERE src_id=? OR dst_id=? ORDER BY (ts IS NULL), ts, id", (pid, pid)
+            )
+            assert [e.id for e in repo.fetch_events_for_id(pid)] == [r[0] for r in timeline]
+            since = scan("SELECT id FROM events WHERE (src_id=? OR dst_id=?) AND ts >= ? ORDER BY ts, id", (pid, pid, ts))
+            assert [e.id for e in repo.fetch_events_for_id(pid, ts_from=ts)] == [r[0] for r in since]
+            assert sorted(repo.fetch_event_type_counts_for_id(pid)) == sorted(
+                scan("SELECT event_type, COUNT(*) FROM events WHERE src_id=? OR dst_id=? GROUP BY event_type", (pid, pid))
+            )
+            assert repo.count_search_events(ids=[pid]) == len(timeline)
+            out = [e.id for e in repo.fetch_directional_events(pid, "out", ["bank_transfer", "give_money"], None, None, 1000)]
+            assert out == [
+                r[0]
+                for r in scan(
+                    "SELECT id FROM events WHERE src_id=? AND event_type IN ('bank_transfer','give_money') "
+                    "ORDER BY (ts IS NULL), ts, id",
+                    (pid,),
+                )
+            ]
+        a, b = pids[:2]
+        both = scan("SELECT id FROM events WHERE src_id IN (?,?) OR dst_id IN (?,?) ORDER BY (ts IS NULL), ts, id", (a, b, a, b))
+        assert [e.id for e in repo.search_events(ids=[a, b], limit=1000)] == [r[0] for r in both]
+        between = scan(
+            "SELECT id FROM events WHERE (src_id=? AND dst_id=?) OR (src_id=? AND dst_id=?) ORDER BY (ts IS NULL), ts, id",
+            (a, b, b, a),
+        )
+        assert [e.id for e in repo.search_events(between_ids=[a, b], limit=1000)] == [r[0] for r in between]
+        partners = {(p.partner_id, p.partner_name, p.count) for p in repo.fetch_top_partners(pids[0], limit=1000)}
+        assert partners == set(
+            scan(
+                """
+                SELECT CASE WHEN src_id=?1 THEN dst_id ELSE src_id END pid,
+                       CASE WHEN src_id=?1 THEN dst_name ELSE src_name END, COUNT(*)
+                FROM events WHERE src_id=?1 OR dst_id=?1
+                GROUP BY 1, 2 HAVING pid IS NOT NULL AND pid != ?1
+                """,
+                (pids[0],),
+            )
+        )
+
+    check()
+    # reparsing one raw log drops its participant rows with its events
+    with app_db.get_conn() as conn:
+        raw_id = conn.execute("SELECT MIN(raw_log_id) FROM events").fetchone()[0]
+    parse.parse_raw_logs([raw_id], silent=True)
+    check()
+    with app_db.get_conn() as conn:
+        assert conn.execute(
+            "SELECT COUNT(*) FROM event_participants WHERE event_id NOT IN (SELECT id FROM events)"
+        ).fetchone()[0] == 0
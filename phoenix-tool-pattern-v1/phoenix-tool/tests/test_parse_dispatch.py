@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import random
+import re
+from pathlib import Path
+
+import pytest
+
+from app.parse import KNOWN_PATTERNS, REGISTRY, candidate_patterns
+
+FIXTURE_DIR = Path(__file__).resolve().parent / "fixtures"
+
+
+def _first_match(line: str, patterns) -> tuple | None:
+    for rx in KNOWN_PATTERNS:
+        if rx in patterns:
+            m = rx.search(line)
+            if m:
+                return rx.pattern, m.groupdict()
+    return None
+
+
+def _variants(line: str, rng: random.Random):
+    yield line
+    yield line.upper()
+    yield line.swapcase()
+    # characters re.IGNORECASE equates with ASCII letters
+    yield line.replace("i", "ı").replace("s", "ſ").replace("k", "K")
+    yield line.replace("I", "İ")
+    yield "".join(c.upper() if rng.random() < 0.5 else c for c in line)
+
+
+def _lines() -> list[str]:
+    lines = [l.strip() for f in FIXTURE_DIR.glob("*.txt") for l in f.read_text(encoding="utf-8").splitlines()]
+    return lines + [
+        "Jucătorului: Ion (101) i-au fost adaugati 5.000 $",
+        "Jucătorului: Ion (101) i-au fost luati 5.000 $",
+        "Jucător: Ion (101) a aruncat pe jos 3x Bandage",
+        "Jucător: Ion (101) a vandut vehiculul Sultan [sultan] pentru suma de 10.000$ | GARAGE: Pillbox",
+        "Jucător: Ion (101) a achizitionat vehiculul: Sultan [sultan] pentru suma de 10.000$ !",
+        "Jucător: Ion a vandut vehiculul sultan lui [202] Maria pentru suma de 1$!",
+        "Ion[101] se conectează cu succes (ip: 1.2.3.4**)",
+        "Ion[101] s-a deconectat cu succes (ip: nil)",
+        "Ion[101] a depozitat 1.000$.",
+        "Ion[101] a retras 1.000$.",
+        "random chatter that mentions nothing",
+    ]
+
+
+def test_dispatch_matches_full_cascade():
+    rng = random.Random(7)
+    for line in _lines():
+        for v in _variants(line, rng):
+            assert _first_match(v, candidate_patterns(v)) == _first_match(v, set(KNOWN_PATTERNS)), v
+
+
+def test_config_rules_extend_and_override_defaults(tmp_path, temp_db):
+    from app import db as app_db
+    from app.parse import ParserRegistry, load_rules, parse_rows
+
+    cfg = tmp_path / "parsers.yaml"
+    cfg.write_text(
+        "rules:\n"
+        "  - name: fine_paid\n"
+        "    pattern: 'Jucatorul\\s+(?P<name>.+?)\\[(?P<id>\\d+)\\]\\s+a platit amenda de\\s+(?P<amount>[\\d\\.,]+)\\$'\n"
+        "    keyword: amenda\n"
+        "    columns: {src_id: id, src_name: name | strip, money: amount | money}\n"
+        "  - name: connect\n"
+        "    enabled: false\n",
+        encoding="utf-8",
+    )
+    registry = ParserRegistry(load_rules(cfg))
+    assert [r.name for r in registry.rules][-1] == "fine_paid"
+    assert "connect" not in {r.name for r in registry.rules}
+
+    rows = [
+        (1, 1, None, None, "UNKNOWN", "Jucatorul Ion Pop[101] a platit amenda de 1.500$"),
+        (1, 2, None, None, "UNKNOWN", "Ion[101] a depozitat 2.000$."),
+    ]
+    with app_db.get_conn() as conn:
+        cur = conn.cursor()
+        assert parse_rows(cur, rows, "x.txt", registry=registry) == (2, 0)
+        got = cur.execute("SELECT event_type, src_id, src_name, dst_id, money FROM events ORDER BY id").fetchall()
+    assert [tuple(r) for r in got] == [
+        ("fine_paid", "101", "Ion Pop", None, 1500),
+        ("bank_deposit", None, None, "101", 2000),
+    ]
+
+
+def _plain(rx: re.Pattern) -> re.Pattern:
+    """The pattern without its linear-time guards (atomic groups, lookarounds)."""
+    p = re.sub(r"\(\?=\(\?P<_a\d+>\.\*\?(.*?)\(\?=\\s\)\)\)\(\?P=_a\d+\)", r"\1", rx.pattern)
+    p = re.sub(r"\(\?=\(\?P<_a\d+>", "(?:", p)
+    p = re.sub(r"\)\(\?P=_a\d+\)", "", p)
+    p = p.replace("(?=\\s)", "").replace("(?<![A-Za-z0-9_?])", "")
+    return re.compile(p, rx.flags)
+
+
+def _groups(m: re.Match | None):
+    return m and {k: v for k, v in m.groupdict().items() if not k.startswith("_a")}
+
+
+def test_guarded_patterns_match_like_plain_patterns():
+    rng = random.Random(18)
+    lines = [l for l in _lines() if l]
+    variants = []
+    for line in lines:
+        other = rng.choice(lines)
+        variants += [
+            line,
+            f"{other} {line}",
+            f"{line} {other}",
+            line.replace("[", "[1] x [", 1),
+            line.replace(" ", "  ", 3),
+            line[: len(line) // 2] + " " + line,
+            line.replace("(x", "(x1) y (x", 1),
+        ]
+    for rule in REGISTRY.rules:
+        plain = _plain(rule.pattern)
+        assert "(?=" not in plain.pattern and "_a" not in plain.pattern
+        for v in variants:
+            got, want = rule.find(v), plain.search(v)
+            assert _groups(got) == _groups(want), (rule.name, v)
+
+
+def test_pattern_override_drops_inherited_keyword_and_anchor(tmp_path):
+    from app.parse import load_rules
+
+    cfg = tmp_path / "parsers.yaml"
+    cfg.write_text(
+        "rules:\n"
+        "  - name: bank_deposit\n"
+        "    pattern: 'Depunere:\\s+(?P<name>.+?)\\[(?P<id>\\d+)\\]\\s+(?P<amount>[\\d\\.,]+)\\$'\n"
+        "    columns: {dst_id: id, dst_name: name | strip, money: amount | money}\n"
+        "  - name: bank_withdraw\n"
+        "    priority: 1\n",
+        encoding="utf-8",
+    )
+    rules = {r.name: r for r in load_rules(cfg)}
+    deposit = rules["bank_deposit"]
+    assert deposit.keyword is None
+    # search semantics again: the match need not start the line
+    assert deposit.find("[12:00] Depunere: Ion[101] 5$").group("id") == "101"
+    # fields other than pattern still merge onto the built-in
+    assert (rules["bank_withdraw"].keyword, rules["bank_withdraw"].priority) == ("retras", 1)
+
+    cfg.write_text(
+        "rules:\n  - name: bank_deposit\n    pattern: 'Depunere:\\s+(?P<id>\\d+)'\n    keyword: depozitat\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError, match="keyword"):
+        load_rules(cfg)
+
+
+def test_atomic_rewrite_keeps_user_groups(tmp_path, monkeypatch):
+    from app import parse
+
+    cfg = tmp_path / "parsers.yaml"
+    # a user group named like the rewrite's own groups
+    cfg.write_text(
+        "rules:\n"
+        "  - name: fine_paid\n"
+        "    pattern: '(?>(?P<_a1>.+?)\\[(?P<id>\\d+)\\]\\s+a platit(?=\\s))\\s+amenda'\n"
+        "    keyword: amenda\n"
+        "    anchor: start\n"
+        "    columns: {src_name: _a1 | strip, src_id: id}\n",
+        encoding="utf-8",
+    )
+    registry = parse.ParserRegistry(parse.load_rules(cfg))
+    rule, m = registry.match("Ion Pop[101] a platit amenda de 5$")
+    assert (rule.name, m.group("_a1"), m.group("id")) == ("fine_paid", "Ion Pop", "101")
+
+    # the rewrite would shift group numbers under a numeric backreference
+    cfg.write_text("rules:\n  - name: twice\n    pattern: '(\\w+) (?>a+) \\1'\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="twice: numeric group reference"):
+        parse.load_rules(cfg)
+    cfg.write_text("rules:\n  - name: twice\n    pattern: '(\\w+) a+ \\1'\n", encoding="utf-8")
+    assert parse.load_rules(cfg)[-1].find("ok aa ok")
+
+    # the audit matches lines the way the parser does (anchor: start included)
+    cfg.write_text(
+        "rules:\n  - name: fine_paid\n    pattern: 'Amenda\\s+(?P<id>\\d+)'\n    keyword: amenda\n    anchor: start\n",
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(parse, "REGISTRY", parse.ParserRegistry(parse.load_rules(cfg)))
+    assert parse.matches_any_known_pattern("Amenda 101")
+    assert not parse.matches_any_known_pattern("x Amenda 101")
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from app.db import get_conn
+from app.parse import parse_events
+from app.pipeline import build_all
+
+EVENT_COLS = "ts, ts_raw, timestamp_quality, event_type, src_id, src_name, dst_id, dst_name, item, qty, money, container, raw_log_id, line_no, source_file"
+
+
+def _events():
+    with get_conn() as conn:
+        rows = conn.execute(f"SELECT {EVENT_COLS} FROM events ORDER BY (ts IS NULL), ts, id").fetchall()
+    return [tuple(r) for r in rows]
+
+
+def _line_count():
+    with get_conn() as conn:
+        return conn.execute("SELECT COUNT(*) c FROM normalized_lines").fetchone()["c"]
+
+
+def test_fused_build_matches_staged_build(loaded_db):
+    staged = _events()
+    lines = _line_count()
+    assert staged
+
+    stats = build_all(silent=True)
+    assert (stats["normalized"], stats["parsed"]) == (lines, len(staged))
+    assert _events() == staged
+    assert _line_count() == lines
+
+    # without normalized_lines the events are the same, and a later parse replays the raw logs
+    build_all(silent=True, keep_lines=False)
+    assert _line_count() == 0
+    assert _events() == staged
+    assert parse_events(silent=True) == 0
+    assert parse_events(silent=True, full=True) == len(staged)
+    assert _events() == staged
+
+
+def test_cli_parse_and_build_with_workers(loaded_db, capsys):
+    import json
+
+    from app.cli import main
+
+    staged = _events()
+    assert main(["parse", "--full", "workers=2"]) == 0
+    assert _events() == staged
+    assert main(["build", "--full", "workers=2"]) == 0
+    assert _events() == staged
+    assert main(["build", "workers=2", "--format", "json"]) == 0
+    assert json.loads(capsys.readouterr().out.strip().splitlines()[-1])["ok"] is True
+
+    for bad in ("workers=abc", "workers=", "workers=0"):
+        assert main(["parse", bad]) == 1
+        assert main(["build", bad]) == 1
+        assert "Usage:" in capsys.readouterr().out
+        assert main(["parse", bad, "--format", "json"]) == 1
+        assert json.loads(capsys.readouterr().out)["ok"] is False
+    assert _events() == staged
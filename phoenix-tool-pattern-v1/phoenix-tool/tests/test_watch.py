@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+from app.db import get_conn
+from app.evidence import iter_raw_chunks
+from app.watch import Watcher
+
+
+def test_watch_ingests_only_new_lines(temp_db, tmp_path):
+    export = tmp_path / "live_20.12.2025.txt"
+    export.write_text(
+        "PHOENIX LOGS\n— 20.12.2025 18:32\nJucatorul Ion[101] a transferat 5$ lui Maria[202].\n",
+        encoding="utf-8",
+    )
+    watcher = Watcher(str(tmp_path), interval=0)
+
+    first = watcher.poll()
+    assert (first["raw_logs"], first["normalized"], first["parsed"]) == (1, 1, 1)
+    assert watcher.poll()["raw_logs"] == 0
+
+    with export.open("a", encoding="utf-8") as f:
+        # the unterminated last line waits for the next cycle
+        f.write("Jucatorul Maria[202] a transferat 7$ lui Ion[101].\nJucatorul Ion[101] a trans")
+    second = watcher.poll()
+    assert (second["raw_logs"], second["normalized"], second["parsed"]) == (1, 1, 1)
+
+    with get_conn() as conn:
+        raws = conn.execute("SELECT id, parent_id FROM raw_logs ORDER BY id").fetchall()
+        tail = "".join(iter_raw_chunks(conn, raws[1]["id"]))
+        events = conn.execute("SELECT ts, src_id, dst_id, money FROM events ORDER BY id").fetchall()
+
+    assert raws[1]["parent_id"] == raws[0]["id"]
+    assert tail == "Jucatorul Maria[202] a transferat 7$ lui Ion[101].\n"
+    assert [tuple(e) for e in events] == [
+        ("2025-12-20T18:32:00Z", "101", "202", 5),
+        ("2025-12-20T18:32:00Z", "202", "101", 7),
+    ]
+
+
+def test_clear_parsed_skips_new_raw_logs_and_uses_index(loaded_db):
+    from app.parse import clear_parsed
+
+    with get_conn() as conn:
+        plan = " ".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN SELECT id FROM events WHERE raw_log_id IN (1, 2)"))
+        assert "idx_events_raw" in plan
+        cur = conn.cursor()
+        cur.execute("INSERT INTO raw_logs(source_file, content, content_hash, loaded_at) VALUES ('new.txt', '', 'h', 'now')")
+        new_id = cur.lastrowid
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            clear_parsed(cur, [new_id])
+        finally:
+            conn.set_trace_callback(None)
+        conn.rollback()
+    # only the lookup that finds nothing to clear
+    assert len(statements) == 1
+
+
+def test_watch_keeps_running_after_a_failed_cycle(temp_db, tmp_path, monkeypatch):
+    import threading
+
+    from app import watch
+
+    stop = threading.Event()
+    calls = []
+
+    def parse_raw_logs(raw_ids, silent=False):
+        calls.append(list(raw_ids))
+        if len(calls) == 1:
+            raise ValueError("boom")
+        stop.set()
+        return 0
+
+    monkeypatch.setattr(watch, "parse_raw_logs", parse_raw_logs)
+    (tmp_path / "live_20.12.2025.txt").write_text("— 20.12.2025 18:32\nIon[101] a depozitat 5$.\n", encoding="utf-8")
+    watcher = Watcher(str(tmp_path), interval=0)
+    watcher.run(stop_event=stop, silent=True)
+
+    assert watcher.last_error["error"] == "ValueError: boom"
+    # the raw log of the failed cycle is handed to the parser again
+    assert calls == [[1], [1]]
+    assert watcher.cycles == 1